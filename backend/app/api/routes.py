@@ -1,46 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Query, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
 import json
+import csv
+import hashlib
+import hmac
+import io
+import re
 
-from app.database import get_db
-from app import crud, schemas
+from app.database import SessionLocal, get_db
+from app import calendar_feed, crud, events, schemas
+from app.config import settings
 from app.email_service import email_service
 from app.auth import authenticate_admin, create_access_token, get_current_admin, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.models import Admin, Appointment
+from app.models import Admin
+from app.serialization import FastJSONResponse, dumps
 
 router = APIRouter()
 
+# Upper bound on rows accepted by the bulk import endpoints
+MAX_IMPORT_ROWS = 10000
+
+# Limits for the next-available and appointment searches
+MAX_SEARCH_DAYS = 60
+MAX_SEARCH_RESULTS = 50
+
+# Longest date window a waitlist entry may cover
+MAX_WAITLIST_DAYS = 31
+
+# Most appointments one recurring series may book (a year of weekly visits)
+MAX_SERIES_OCCURRENCES = 52
+
+# Largest party a group booking may seat at once
+MAX_PARTY_SIZE = 10
+
+# Days of availability the booking bootstrap may include
+MAX_BOOTSTRAP_DAYS = 7
+
+# Most change log entries returned per change feed page
+MAX_CHANGES_PAGE = 1000
+
 # Public routes for client booking
+@router.get("/shops", response_model=List[schemas.Shop])
+def get_shops(db: Session = Depends(get_db)):
+    """Get all active shops (locations)"""
+    return crud.get_shops(db)
+
 @router.get("/barbers", response_model=List[schemas.BarberWithServices])
-def get_barbers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all active barbers with their services"""
-    barbers = crud.get_barbers(db, skip=skip, limit=limit)
-    for barber in barbers:
-        barber.services = crud.get_services_by_barber(db, barber.id)
-    return barbers
+def get_barbers(skip: int = 0, limit: int = 100, shop_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """Get all active barbers with their services, optionally for one shop"""
+    return FastJSONResponse(crud.get_catalog_barbers(db, skip=skip, limit=limit, shop_id=shop_id))
 
 @router.get("/barbers/{barber_id}", response_model=schemas.BarberWithServices)
 def get_barber(barber_id: int, db: Session = Depends(get_db)):
     """Get a specific barber with services"""
-    barber = crud.get_barber(db, barber_id)
+    barber = crud.get_catalog_barber(db, barber_id)
     if not barber:
         raise HTTPException(status_code=404, detail="Barber not found")
-    barber.services = crud.get_services_by_barber(db, barber_id)
     return barber
 
 @router.get("/barbers/{barber_id}/services", response_model=List[schemas.Service])
 def get_barber_services(barber_id: int, include_inactive: bool = False, db: Session = Depends(get_db)):
     """Get all services for a specific barber"""
-    barber = crud.get_barber(db, barber_id)
+    barber = crud.get_catalog_barber(db, barber_id)
     if not barber:
         raise HTTPException(status_code=404, detail="Barber not found")
-    return crud.get_services_by_barber(db, barber_id, include_inactive)
+    return crud.get_catalog_services(db, barber_id, include_inactive, shop_id=barber["shop_id"])
+
+def _run_idempotent(db: Session, scope: str, key: Optional[str], payload: Any, handler: Callable[[], Any]):
+    """
+    Run handler() once per Idempotency-Key. The first request's JSON response (or its
+    4xx error) is stored and replayed to retries with the same key and payload, without
+    running the handler again; server errors release the key so a retry runs normally.
+    """
+    if not key:
+        return handler()
+    if len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+    request_hash = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    if crud.claim_idempotency_key(db, scope, key, request_hash):
+        try:
+            content = handler()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                crud.release_idempotency_key(db, scope, key)
+            else:
+                crud.complete_idempotency_key(db, scope, key, e.status_code, json.dumps({"detail": e.detail}))
+            raise
+        except Exception:
+            crud.release_idempotency_key(db, scope, key)
+            raise
+        crud.complete_idempotency_key(db, scope, key, 200, json.dumps(content))
+        return content
+
+    record = crud.get_idempotency_key(db, scope, key)
+    if record is None:
+        # The other request failed and released the key in the meantime
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key was interrupted; retry")
+    if record.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if record.status_code is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return JSONResponse(
+        content=json.loads(record.response_body),
+        status_code=record.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
 
 @router.post("/appointments", response_model=schemas.Appointment)
-def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db)):
-    """Create a new appointment"""
+def create_appointment(
+    appointment: schemas.AppointmentCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Create a new appointment; retries with the same Idempotency-Key get the original response"""
+    return _run_idempotent(
+        db, "POST /appointments", idempotency_key, appointment.model_dump(mode="json"),
+        lambda: schemas.Appointment.model_validate(_book_appointment(appointment, db)).model_dump(mode="json"),
+    )
+
+def _validate_booking(appointment: schemas.AppointmentCreate, db: Session):
+    """Return (barber, services) for a booking request, or raise if either is invalid"""
     # Validate barber exists
     barber = crud.get_barber(db, appointment.barber_id)
     if not barber:
@@ -52,9 +136,6 @@ def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Dep
     
     # Validate all services exist and belong to barber
     services = []
-    total_duration = 0
-    total_price = 0
-    
     for service_id in appointment.service_ids:
         service = crud.get_service(db, service_id)
         if not service:
@@ -62,15 +143,33 @@ def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Dep
         if service.barber_id != appointment.barber_id:
             raise HTTPException(status_code=400, detail=f"Service {service_id} does not belong to this barber")
         services.append(service)
-        total_duration += service.duration_minutes
-        total_price += service.price
+    return barber, services
+
+def _book_appointment(appointment: schemas.AppointmentCreate, db: Session):
+    """Validate, conflict-check and book an appointment, then send the confirmation email"""
+    barber, services = _validate_booking(appointment, db)
+    total_duration = sum(service.duration_minutes for service in services)
+    total_price = sum(service.price for service in services)
     
+    if appointment.hold_token:
+        # A live hold on exactly this slot was conflict-checked when it was taken
+        hold = crud.get_active_hold(db, appointment.hold_token)
+        if (
+            not hold
+            or hold.barber_id != appointment.barber_id
+            or hold.start_datetime != appointment.appointment_datetime.replace(tzinfo=None)
+            or hold.end_datetime < hold.start_datetime + timedelta(minutes=total_duration)
+        ):
+            raise HTTPException(status_code=400, detail="Slot hold expired or does not match this booking")
     # Check for appointment conflicts
-    if crud.check_appointment_conflict(db, appointment.barber_id, appointment.appointment_datetime, total_duration):
+    elif crud.check_appointment_conflict(db, appointment.barber_id, appointment.appointment_datetime, total_duration, shop_id=barber.shop_id):
         raise HTTPException(status_code=400, detail="Time slot not available")
     
     # Create appointment
     db_appointment = crud.create_appointment(db, appointment)
+    if not db_appointment:
+        # Another booking consumed the hold first, or it ran out in the meantime
+        raise HTTPException(status_code=409, detail="Slot hold was already used or has expired")
     
     # Send booking confirmation email
     try:
@@ -95,9 +194,138 @@ def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Dep
     
     return db_appointment
 
+@router.post("/appointments/series", response_model=schemas.AppointmentSeriesResult)
+def create_appointment_series(
+    series: schemas.AppointmentSeriesCreate,
+    atomic: bool = False,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Book the same slot every week or every other week, for a number of occurrences or
+    until a date. Free occurrences are booked together; conflicting ones are reported
+    (with atomic=true, any conflict books nothing).
+    """
+    return _run_idempotent(
+        db, "POST /appointments/series", idempotency_key, {"series": series.model_dump(mode="json"), "atomic": atomic},
+        lambda: schemas.AppointmentSeriesResult.model_validate(_book_series(series, atomic, db)).model_dump(mode="json"),
+    )
+
+def _book_series(series: schemas.AppointmentSeriesCreate, atomic: bool, db: Session) -> dict:
+    """Validate and book a recurring series, then send one confirmation listing every booked date"""
+    if series.frequency not in crud.SERIES_INTERVALS:
+        raise HTTPException(status_code=400, detail="frequency must be 'weekly' or 'biweekly'")
+    if (series.occurrences is None) == (series.until is None):
+        raise HTTPException(status_code=400, detail="Give either occurrences or until")
+    if series.occurrences is not None and not 1 <= series.occurrences <= MAX_SERIES_OCCURRENCES:
+        raise HTTPException(status_code=400, detail=f"occurrences must be between 1 and {MAX_SERIES_OCCURRENCES}")
+    first = series.appointment_datetime.replace(tzinfo=None)
+    if series.until is not None and series.until < first.date():
+        raise HTTPException(status_code=400, detail="until must not be before the first appointment")
+    if series.until is not None and len(crud.expand_series(first, series.frequency, until=series.until, limit=MAX_SERIES_OCCURRENCES + 1)) > MAX_SERIES_OCCURRENCES:
+        raise HTTPException(status_code=400, detail=f"A series can have at most {MAX_SERIES_OCCURRENCES} occurrences")
+    if series.hold_token:
+        raise HTTPException(status_code=400, detail="Slot holds cannot be used for a series")
+
+    barber, services = _validate_booking(series, db)
+    starts = crud.expand_series(first, series.frequency, series.occurrences, series.until, limit=MAX_SERIES_OCCURRENCES)
+    booked, conflicts = crud.create_appointment_series(db, series, starts, services, atomic=atomic)
+
+    if booked:
+        try:
+            total_duration = sum(service.duration_minutes for service in services)
+            email_service.send_series_confirmation({
+                'client_name': series.client_name,
+                'client_email': series.client_email,
+                'barber_name': barber.name,
+                'service_name': ", ".join(service.name for service in services),
+                'duration_minutes': total_duration,
+                'price': sum(service.price for service in services),
+                'notes': series.notes or '',
+                'occurrences': [
+                    {
+                        'appointment_datetime': appointment.appointment_datetime.strftime('%Y-%m-%d %H:%M'),
+                        'cancellation_url': f"http://localhost:3000/cancel/{appointment.cancellation_token}",
+                    }
+                    for appointment in booked
+                ],
+            })
+        except Exception as e:
+            # Log error but don't fail the booking
+            print(f"Failed to send series confirmation email: {e}")
+
+    return {
+        "requested": len(starts),
+        "booked": booked,
+        "conflicts": [{"appointment_datetime": start, "reason": reason} for start, reason in conflicts],
+    }
+
+@router.post("/appointments/group", response_model=schemas.GroupBookingResult)
+def create_group_booking(
+    booking: schemas.GroupBookingCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Book several barbers of one shop at the same time for a group, all or nothing"""
+    return _run_idempotent(
+        db, "POST /appointments/group", idempotency_key, booking.model_dump(mode="json"),
+        lambda: schemas.GroupBookingResult.model_validate(_book_group(booking, db)).model_dump(mode="json"),
+    )
+
+def _book_group(booking: schemas.GroupBookingCreate, db: Session) -> dict:
+    """Validate and book a group, then send one email covering every appointment"""
+    if not 1 <= booking.party_size <= MAX_PARTY_SIZE:
+        raise HTTPException(status_code=400, detail=f"party_size must be between 1 and {MAX_PARTY_SIZE}")
+    if not booking.service_names:
+        raise HTTPException(status_code=400, detail="At least one service must be selected")
+    if booking.barber_ids is not None and len(set(booking.barber_ids)) < booking.party_size:
+        raise HTTPException(status_code=400, detail="Choose at least party_size different barbers")
+
+    appointments, free = crud.create_group_booking(db, booking)
+    if not appointments:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Only {len(free)} matching barbers are free at that time; {booking.party_size} are needed",
+        )
+
+    try:
+        members = []
+        for appointment in appointments:
+            members.append({
+                'barber_name': appointment.barber.name,
+                'service_name': ", ".join(service.name for service in appointment.services),
+                'duration_minutes': sum(service.duration_minutes for service in appointment.services),
+                'price': sum(service.price for service in appointment.services),
+                'cancellation_url': f"http://localhost:3000/cancel/{appointment.cancellation_token}",
+            })
+        email_service.send_group_confirmation({
+            'client_name': booking.client_name,
+            'client_email': booking.client_email,
+            'appointment_datetime': appointments[0].appointment_datetime.strftime('%Y-%m-%d %H:%M'),
+            'party_size': len(appointments),
+            'notes': booking.notes or '',
+            'members': members,
+        })
+    except Exception as e:
+        # Log error but don't fail the booking
+        print(f"Failed to send group confirmation email: {e}")
+
+    return {"appointment_datetime": appointments[0].appointment_datetime, "appointments": appointments}
+
 @router.post("/appointments/cancel/{token}")
-def cancel_appointment(token: str, db: Session = Depends(get_db)):
+def cancel_appointment(
+    token: str,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """Cancel an appointment using the cancellation token"""
+    return _run_idempotent(
+        db, "POST /appointments/cancel", idempotency_key, {"token": token},
+        lambda: _cancel_appointment(token, db),
+    )
+
+def _cancel_appointment(token: str, db: Session):
+    """Cancel by token and send the cancellation email"""
     appointment = crud.cancel_appointment(db, token)
     if not appointment:
         raise HTTPException(
@@ -140,6 +368,79 @@ def check_appointment(token: str, db: Session = Depends(get_db)):
         "barber_name": appointment.barber.name
     }
 
+@router.post("/holds", response_model=schemas.SlotHold)
+def create_hold(hold: schemas.SlotHoldCreate, db: Session = Depends(get_db)):
+    """Hold a slot for a few minutes while the client fills in the booking form"""
+    barber = crud.get_barber(db, hold.barber_id)
+    if not barber or not barber.is_active:
+        raise HTTPException(status_code=404, detail="Barber not found")
+    if not hold.service_ids:
+        raise HTTPException(status_code=400, detail="At least one service must be selected")
+
+    total_duration = 0
+    for service_id in hold.service_ids:
+        service = crud.get_service(db, service_id)
+        if not service:
+            raise HTTPException(status_code=404, detail=f"Service {service_id} not found")
+        if service.barber_id != hold.barber_id:
+            raise HTTPException(status_code=400, detail=f"Service {service_id} does not belong to this barber")
+        total_duration += service.duration_minutes
+
+    start = hold.appointment_datetime.replace(tzinfo=None)
+    if start <= datetime.now():
+        raise HTTPException(status_code=400, detail="Time slot is in the past")
+    db_hold = crud.create_slot_hold(db, hold.barber_id, barber.shop_id, start, total_duration)
+    if not db_hold:
+        raise HTTPException(status_code=409, detail="Time slot not available")
+    return {
+        "token": db_hold.token,
+        "barber_id": db_hold.barber_id,
+        "appointment_datetime": db_hold.start_datetime,
+        "duration_minutes": total_duration,
+        "expires_at": db_hold.expires_at.replace(tzinfo=timezone.utc),
+    }
+
+@router.delete("/holds/{token}")
+def release_hold(token: str, db: Session = Depends(get_db)):
+    """Release a slot hold before it expires"""
+    if not crud.release_slot_hold(db, token):
+        raise HTTPException(status_code=404, detail="Hold not found or expired")
+    return {"message": "Hold released"}
+
+@router.post("/waitlist", response_model=schemas.WaitlistEntry)
+def join_waitlist(entry: schemas.WaitlistEntryCreate, db: Session = Depends(get_db)):
+    """Join the waitlist for a barber (or any barber of a shop) within a time window"""
+    if entry.barber_id is not None:
+        barber = crud.get_barber(db, entry.barber_id)
+        if not barber or not barber.is_active:
+            raise HTTPException(status_code=404, detail="Barber not found")
+        if entry.shop_id is not None and entry.shop_id != barber.shop_id:
+            raise HTTPException(status_code=400, detail="Barber does not work at this shop")
+        shop_id = barber.shop_id
+    elif entry.shop_id is not None:
+        if not crud.get_shop(db, entry.shop_id):
+            raise HTTPException(status_code=404, detail="Shop not found")
+        shop_id = entry.shop_id
+    else:
+        shop_id = crud.get_default_shop_id(db)
+
+    if entry.duration_minutes <= 0:
+        raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+    if entry.latest <= entry.earliest or entry.latest <= datetime.now():
+        raise HTTPException(status_code=400, detail="The waitlist window must end after it starts and in the future")
+    if (entry.latest.date() - entry.earliest.date()).days >= MAX_WAITLIST_DAYS:
+        raise HTTPException(status_code=400, detail=f"The waitlist window is limited to {MAX_WAITLIST_DAYS} days")
+
+    return crud.create_waitlist_entry(db, entry, shop_id)
+
+@router.delete("/waitlist/{token}")
+def leave_waitlist(token: str, db: Session = Depends(get_db)):
+    """Leave the waitlist using the token returned when joining"""
+    entry = crud.remove_waitlist_entry(db, token)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    return {"message": "Removed from the waitlist", "waitlist_entry_id": entry.id}
+
 @router.get("/barbers/{barber_id}/available-slots")
 def get_available_slots(
     barber_id: int, 
@@ -165,11 +466,161 @@ def get_available_slots(
         db, 
         barber_id, 
         selected_date, 
-        duration_minutes
+        duration_minutes,
+        shop_id=barber.shop_id
     )
     
     return {"date": date, "slots": available_slots}
 
+@router.get("/booking/bootstrap", response_model=schemas.BookingBootstrap)
+def get_booking_bootstrap(
+    request: Request,
+    barber_id: Optional[int] = None,
+    shop_id: Optional[int] = None,
+    days: int = Query(3, ge=1, le=MAX_BOOTSTRAP_DAYS),
+    duration_minutes: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Barbers with services and the first days of availability in one response, for the booking page"""
+    # The pool is created and shut down by the app's lifespan (main.py)
+    bootstrap = crud.get_booking_bootstrap(
+        db, SessionLocal, barber_id=barber_id, shop_id=shop_id, days=days, duration_minutes=duration_minutes,
+        executor=getattr(request.app.state, "bootstrap_pool", None),
+    )
+    if bootstrap is None:
+        raise HTTPException(status_code=404, detail="Barber not found")
+    return FastJSONResponse(bootstrap)
+
+@router.get("/availability/next")
+def get_next_available(
+    duration_minutes: Optional[int] = None,
+    services: Optional[List[str]] = Query(None),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 5,
+    shop_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Earliest open slots with any barber, for a duration or a list of service names"""
+    if not services and not duration_minutes:
+        raise HTTPException(status_code=400, detail="Provide duration_minutes or services")
+    if duration_minutes is not None and duration_minutes <= 0:
+        raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+
+    # Wall-clock shop time, like stored bookings; an offset from the client is dropped
+    now = datetime.now()
+    start = max(start.replace(tzinfo=None), now) if start else now
+    end = end.replace(tzinfo=None) if end else start + timedelta(days=14)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=MAX_SEARCH_DAYS):
+        raise HTTPException(status_code=400, detail=f"Search window is limited to {MAX_SEARCH_DAYS} days")
+
+    slots = crud.get_next_available_slots(
+        db, start, end, limit,
+        duration_minutes=duration_minutes, service_names=services, shop_id=shop_id
+    )
+    return {"slots": slots}
+
+@router.get("/availability/group")
+def get_group_availability(
+    party_size: int,
+    services: List[str] = Query(...),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 5,
+    shop_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Earliest starts where `party_size` barbers of one shop offering the services are free together"""
+    if not 1 <= party_size <= MAX_PARTY_SIZE:
+        raise HTTPException(status_code=400, detail=f"party_size must be between 1 and {MAX_PARTY_SIZE}")
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+
+    # Wall-clock shop time, like stored bookings; an offset from the client is dropped
+    now = datetime.now()
+    start = max(start.replace(tzinfo=None), now) if start else now
+    end = end.replace(tzinfo=None) if end else start + timedelta(days=14)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if end - start > timedelta(days=MAX_SEARCH_DAYS):
+        raise HTTPException(status_code=400, detail=f"Search window is limited to {MAX_SEARCH_DAYS} days")
+
+    return {"slots": crud.get_group_availability(db, party_size, start, end, services, limit=limit, shop_id=shop_id)}
+
+@router.get("/barbers/{barber_id}/slot-events")
+def stream_slot_events(barber_id: int, date: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Server-Sent Events stream of slot changes for a barber's day.
+
+    Each `slots` event is a delta: {"type": "taken" | "freed", "start", "end", ...}.
+    On "freed" or "resync" the client refetches available-slots for the day.
+    """
+    if not crud.get_barber(db, barber_id):
+        raise HTTPException(status_code=404, detail="Barber not found")
+    try:
+        selected_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    channel = events.slot_channel(barber_id, selected_date)
+
+    async def event_stream():
+        subscription = events.broker.subscribe(channel)
+        try:
+            yield b"retry: 3000\n: subscribed\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=settings.sse_heartbeat_seconds)
+                if event is None:
+                    yield b": keep-alive\n\n"  # keeps proxies from closing an idle stream
+                else:
+                    yield b"event: slots\ndata: " + dumps(event) + b"\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+@router.get("/barbers/{barber_id}/calendar.ics")
+def get_barber_calendar(barber_id: int, token: str, request: Request, db: Session = Depends(get_db)):
+    """
+    iCalendar feed of a barber's bookings, for subscribing from a phone calendar.
+    The token comes from GET /admin/barbers/{id}/calendar. Polls with If-None-Match
+    get a 304 until the barber's schedule changes.
+    """
+    barber = crud.get_calendar_barber(db, barber_id)
+    if not barber or not barber.calendar_token or not hmac.compare_digest(barber.calendar_token, token):
+        raise HTTPException(status_code=404, detail="Calendar not found")
+    _, shop_id, barber_name, _, schedule_version = barber
+
+    window_start = datetime.now().date() - timedelta(days=settings.calendar_past_days)
+    window_end = datetime.now().date() + timedelta(days=settings.calendar_future_days + 1)
+    etag = calendar_feed.feed_etag(barber_id, schedule_version, window_start)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if calendar_feed.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    def render():
+        # The request's session is closed once the route returns, so the stream has its own
+        stream_db = SessionLocal()
+        try:
+            appointments = crud.iter_calendar_appointments(
+                stream_db, barber_id, shop_id,
+                datetime.combine(window_start, datetime.min.time()), datetime.combine(window_end, datetime.min.time()),
+            )
+            for chunk in calendar_feed.render_feed(barber_name, appointments):
+                yield chunk.encode("utf-8")
+        finally:
+            stream_db.close()
+
+    headers["Content-Disposition"] = f'inline; filename="barber-{barber_id}.ics"'
+    return StreamingResponse(render(), media_type="text/calendar; charset=utf-8", headers=headers)
+
 # Authentication routes
 @router.post("/auth/login", response_model=schemas.Token)
 def login(login_data: schemas.AdminLogin, db: Session = Depends(get_db)):
@@ -199,24 +650,197 @@ def get_all_appointments(
     skip: int = 0, 
     limit: int = 100, 
     status: Optional[str] = None, 
+    shop_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_admin: Admin = Depends(get_current_admin)
 ):
-    """Admin: Get all appointments with details"""
-    from sqlalchemy.orm import joinedload
-    
-    # Use eager loading to fetch appointments with their relationships
-    query = db.query(Appointment).options(
-        joinedload(Appointment.barber),
-        joinedload(Appointment.services)
+    """Admin: Get all appointments with details, optionally for one shop"""
+    # Rows are built from column tuples and encoded with orjson, skipping response_model validation
+    return FastJSONResponse(
+        crud.get_appointments_with_details(db, skip=skip, limit=limit, status=status, shop_id=shop_id)
     )
-    
-    if status:
-        query = query.filter(Appointment.status == status)
-    
-    appointments = query.offset(skip).limit(limit).all()
-    
-    return appointments
+
+@router.get("/admin/changes", response_model=schemas.ChangeFeed)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES_PAGE),
+    shop_id: Optional[int] = None,
+    include_data: bool = True,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Appointment, barber and service changes after the `since` cursor; poll again with `next_cursor`"""
+    return FastJSONResponse(crud.get_changes(db, since=since, limit=limit, shop_id=shop_id, include_data=include_data))
+
+@router.get("/admin/stats", response_model=schemas.StatsResponse)
+def get_stats(
+    start: str,  # Format: YYYY-MM-DD
+    end: str,
+    group_by: str = "day",
+    shop_id: Optional[int] = None,
+    barber_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Revenue, booked minutes, utilization and cancellation rate from the daily rollups"""
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if group_by not in ("day", "barber"):
+        raise HTTPException(status_code=400, detail="group_by must be 'day' or 'barber'")
+    return crud.get_daily_stats(db, start_date, end_date, group_by=group_by, shop_id=shop_id, barber_id=barber_id)
+
+@router.get("/admin/waitlist", response_model=List[schemas.WaitlistEntry])
+def get_waitlist(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    shop_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: List waitlist entries"""
+    return crud.get_waitlist_entries(db, skip=skip, limit=limit, status=status, shop_id=shop_id)
+
+@router.get("/admin/appointments/history", response_model=List[schemas.AppointmentHistoryItem])
+def get_appointment_history(
+    skip: int = 0,
+    limit: int = 100,
+    shop_id: Optional[int] = None,
+    barber_id: Optional[int] = None,
+    status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    client_email: Optional[str] = None,
+    client_phone: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Report over current and archived appointments, newest first; filter by client for one client's history"""
+    return crud.get_appointment_history(
+        db, skip=skip, limit=limit, shop_id=shop_id, barber_id=barber_id, status=status, start=start, end=end,
+        client_email=client_email, client_phone=client_phone,
+    )
+
+@router.get("/admin/appointments/search", response_model=List[schemas.AppointmentWithDetails])
+def search_appointments(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(50, ge=1, le=MAX_SEARCH_RESULTS),
+    shop_id: Optional[int] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Find appointments by client name, email or phone; each word matches as a prefix"""
+    return FastJSONResponse(crud.search_appointments(db, q, limit=limit, shop_id=shop_id, status=status))
+
+def _import_appointment_rows(db: Session, raw_rows: List[Dict[str, Any]], atomic: bool, dry_run: bool) -> dict:
+    """Validate raw import rows and hand the valid ones to the bulk importer"""
+    if len(raw_rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_IMPORT_ROWS} rows can be imported at once")
+
+    parsed = []
+    errors = {}
+    for row_number, raw in enumerate(raw_rows, start=1):
+        try:
+            parsed.append((row_number, schemas.AppointmentImportRow.model_validate(raw)))
+        except ValidationError as e:
+            errors[row_number] = [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ]
+
+    # In atomic mode an invalid row aborts the import, but the rest is still checked for the report
+    created_ids, row_errors = crud.bulk_import_appointments(
+        db, parsed, atomic=atomic, dry_run=dry_run or (atomic and bool(errors))
+    )
+    errors.update(row_errors)
+
+    return {
+        "total_rows": len(raw_rows),
+        "imported": len(created_ids),
+        "failed": len(errors),
+        "dry_run": dry_run,
+        "appointment_ids": created_ids,
+        "errors": [{"row": row, "errors": messages} for row, messages in sorted(errors.items())],
+    }
+
+@router.post("/admin/appointments/import", response_model=schemas.AppointmentImportResult)
+def import_appointments(
+    rows: List[Dict[str, Any]],
+    atomic: bool = False,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Bulk import appointments from a JSON list, with a per-row error report"""
+    return _import_appointment_rows(db, rows, atomic, dry_run)
+
+@router.post("/admin/appointments/import/csv", response_model=schemas.AppointmentImportResult)
+def import_appointments_csv(
+    file: UploadFile = File(...),
+    atomic: bool = False,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """
+    Admin: Bulk import appointments from a CSV upload.
+    Columns match the JSON fields; service_ids are separated by semicolons (e.g. "4;7").
+    """
+    try:
+        content = file.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+
+    rows = []
+    for record in csv.DictReader(io.StringIO(content)):
+        row = {key.strip(): (value.strip() if value else None) for key, value in record.items() if key}
+        ids = row.get("service_ids") or ""
+        row["service_ids"] = [int(part) if part.isdigit() else part for part in re.split(r"[;,\s]+", ids) if part]
+        if not row.get("status"):
+            row.pop("status", None)
+        rows.append(row)
+    return _import_appointment_rows(db, rows, atomic, dry_run)
+
+@router.get("/admin/shops", response_model=List[schemas.Shop])
+def get_all_shops(
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Get all shops, including inactive ones"""
+    return crud.get_shops(db, include_inactive=True)
+
+@router.post("/admin/shops", response_model=schemas.Shop)
+def create_shop(
+    shop: schemas.ShopCreate,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Create a new shop (location)"""
+    if crud.get_shop_by_slug(db, shop.slug):
+        raise HTTPException(status_code=400, detail="A shop with this slug already exists")
+    return crud.create_shop(db, shop)
+
+@router.put("/admin/shops/{shop_id}", response_model=schemas.Shop)
+def update_shop(
+    shop_id: int,
+    shop_update: schemas.ShopUpdate,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Update a shop"""
+    if shop_update.slug is not None:
+        existing = crud.get_shop_by_slug(db, shop_update.slug)
+        if existing and existing.id != shop_id:
+            raise HTTPException(status_code=400, detail="A shop with this slug already exists")
+    updated_shop = crud.update_shop(db, shop_id, shop_update)
+    if not updated_shop:
+        raise HTTPException(status_code=404, detail="Shop not found")
+    return updated_shop
 
 @router.post("/admin/barbers", response_model=schemas.Barber)
 def create_barber(
@@ -225,6 +849,8 @@ def create_barber(
     current_admin: Admin = Depends(get_current_admin)
 ):
     """Admin: Create a new barber"""
+    if barber.shop_id is not None and not crud.get_shop(db, barber.shop_id):
+        raise HTTPException(status_code=404, detail="Shop not found")
     return crud.create_barber(db, barber)
 
 @router.put("/admin/barbers/{barber_id}", response_model=schemas.Barber)
@@ -235,11 +861,26 @@ def update_barber(
     current_admin: Admin = Depends(get_current_admin)
 ):
     """Admin: Update a barber"""
+    if barber_update.shop_id is not None and not crud.get_shop(db, barber_update.shop_id):
+        raise HTTPException(status_code=404, detail="Shop not found")
     updated_barber = crud.update_barber(db, barber_id, barber_update)
     if not updated_barber:
         raise HTTPException(status_code=404, detail="Barber not found")
     return updated_barber
 
+@router.get("/admin/barbers/{barber_id}/calendar", response_model=schemas.CalendarFeed)
+def get_barber_calendar_feed(
+    barber_id: int,
+    rotate: bool = False,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Subscription URL of a barber's calendar feed; rotate=true revokes the previous one"""
+    token = crud.get_calendar_token(db, barber_id, rotate=rotate)
+    if not token:
+        raise HTTPException(status_code=404, detail="Barber not found")
+    return {"barber_id": barber_id, "token": token, "feed_path": f"/api/barbers/{barber_id}/calendar.ics?token={token}"}
+
 @router.delete("/admin/barbers/{barber_id}")
 def delete_barber(
     barber_id: int, 
@@ -289,6 +930,21 @@ def delete_service(
         raise HTTPException(status_code=404, detail="Service not found")
     return {"message": "Service deleted successfully"}
 
+@router.put("/admin/catalog/bulk", response_model=schemas.CatalogBulkUpdateResult)
+def bulk_update_catalog(
+    catalog_update: schemas.CatalogBulkUpdate,
+    db: Session = Depends(get_db),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Admin: Update many barbers and services in one transaction"""
+    result = crud.bulk_update_catalog(db, catalog_update.barbers, catalog_update.services)
+    if "updated_barber_ids" not in result:
+        raise HTTPException(status_code=404, detail={
+            "message": "Some barbers, services or shops were not found; nothing was updated",
+            **result,
+        })
+    return result
+
 @router.put("/admin/appointments/{appointment_id}", response_model=schemas.Appointment)
 def update_appointment(
     appointment_id: int, 
@@ -0,0 +1,112 @@
+"""
+Archival job: moves finished appointments out of the hot `appointments` table.
+
+Appointments that started before the cutoff are copied into `appointments_archive`
+(with their service links) and deleted from the hot tables, one batch per
+transaction, so scheduling queries only ever scan recent and upcoming bookings.
+Anything older than the cutoff is finished: completed, cancelled or a no-show.
+Each run also purges change feed entries past their retention.
+
+Usage:
+    python -m app.archive --older-than-days 90
+    python -m app.archive --older-than-days 90 --interval 3600   # keep running hourly
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app import changes
+from app.config import settings
+from app.database import SessionLocal
+from app.init_db import init_db
+from app.models import Appointment, ArchivedAppointment, appointment_services, appointment_services_archive
+
+logger = logging.getLogger(__name__)
+
+# Never archive recent history, whatever cutoff is passed in
+MIN_ARCHIVE_AGE = timedelta(days=1)
+
+ARCHIVED_COLUMNS = [
+    "id", "shop_id", "barber_id", "client_name", "client_email", "client_phone",
+    "appointment_datetime", "status", "cancellation_token", "notes",
+    "booked_minutes", "booked_price", "created_at", "updated_at", "confirmed_at",
+]
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Move up to `batch_size` appointments older than the cutoff; returns the number moved"""
+    ids = list(db.scalars(
+        select(Appointment.id)
+        .where(Appointment.appointment_datetime < cutoff)
+        .order_by(Appointment.id)
+        .limit(batch_size)
+    ))
+    if not ids:
+        return 0
+
+    try:
+        db.execute(insert(ArchivedAppointment).from_select(
+            ARCHIVED_COLUMNS,
+            select(*(getattr(Appointment, column) for column in ARCHIVED_COLUMNS)).where(Appointment.id.in_(ids)),
+        ))
+        db.execute(insert(appointment_services_archive).from_select(
+            ["appointment_id", "service_id"],
+            select(appointment_services.c.appointment_id, appointment_services.c.service_id)
+            .where(appointment_services.c.appointment_id.in_(ids)),
+        ))
+        changes.record_from(db, changes.APPOINTMENT, "archived", Appointment, Appointment.id.in_(ids))
+        db.execute(delete(appointment_services).where(appointment_services.c.appointment_id.in_(ids)))
+        db.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(ids)
+
+
+def archive_appointments(db: Session, cutoff: datetime, batch_size: int = 1000, max_batches: int = None) -> int:
+    """Archive appointments that started before the cutoff, batch by batch"""
+    cutoff = min(cutoff, datetime.utcnow() - MIN_ARCHIVE_AGE)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(db, cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+        logger.info(f"Archived {total} appointments older than {cutoff.isoformat()}")
+    return total
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Move old appointments to the archive table")
+    parser.add_argument("--older-than-days", type=int, default=90, help="archive appointments older than this")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds (0 = run once)")
+    parser.add_argument("--change-log-days", type=int, default=settings.change_log_retention_days, help="keep change feed entries this long")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db(seed_sample_data=False)
+    while True:
+        db = SessionLocal()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+            moved = archive_appointments(db, cutoff, batch_size=args.batch_size)
+            logger.info(f"Archival run finished: {moved} appointments moved")
+            purged = changes.purge(db, datetime.utcnow() - timedelta(days=args.change_log_days))
+            logger.info(f"Purged {purged} change log entries")
+        finally:
+            db.close()
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+In-process caches for catalog and availability reads.
+
+Cache keys embed version counters, so invalidating a group of entries is a
+single counter bump; stale entries are never read again and age out through
+the LRU bound and TTL. Caches are per process: with several workers the TTL
+bounds how long another worker can serve a stale entry (bookings are still
+protected by the conflict check on write).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from app.config import settings
+from app.singleflight import Group
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheVersions:
+    """Named version counters used as cache key prefixes"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+versions = CacheVersions()
+catalog_cache = TTLCache(maxsize=settings.catalog_cache_size, ttl=settings.catalog_cache_ttl)
+availability_cache = TTLCache(maxsize=settings.availability_cache_size, ttl=settings.availability_cache_ttl)
+# Concurrent misses on the same availability key share one computation
+availability_flights = Group()
+
+
+def catalog_key(*parts: Hashable) -> tuple:
+    return (versions.get("catalog"),) + parts
+
+
+def availability_key(barber_id: int, *parts: Hashable) -> tuple:
+    return (versions.get(f"availability:{barber_id}"), barber_id) + parts
+
+
+def invalidate_catalog() -> None:
+    """Drop every cached catalog read (barbers and their services)"""
+    versions.bump("catalog")
+
+
+def invalidate_availability(barber_ids: Iterable[int]) -> None:
+    """Drop cached availability for the given barbers"""
+    versions.bump(*{f"availability:{barber_id}" for barber_id in barber_ids})
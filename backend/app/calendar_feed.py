@@ -0,0 +1,109 @@
+"""
+iCalendar (RFC 5545) rendering for the per-barber schedule feeds.
+
+GET /api/barbers/{id}/calendar.ics streams the text produced here. Appointment
+times are stored as shop-local wall-clock times, so events use floating local
+times (no "Z", no TZID) and show up at the same clock time in the barber's app.
+
+The feed's ETag comes from the barber's `schedule_version`, which crud bumps in
+the same transaction as every booking change, plus the first day of the window;
+calendar apps polling with If-None-Match get a 304 without any rendering.
+"""
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional
+
+PRODID = "-//Barbershop Appointment System//Barber Schedule//EN"
+
+# Events rendered per chunk written to the response
+EVENTS_PER_CHUNK = 100
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """Fold a content line to 75 octets per physical line, without splitting UTF-8 sequences"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _local(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def feed_etag(barber_id: int, schedule_version: int, window_start: date) -> str:
+    # Weak: DTSTAMP differs between renders of the same schedule
+    return f'W/"{barber_id}-{schedule_version}-{window_start.isoformat()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def render_event(appointment: tuple, stamp: str) -> str:
+    appointment_id, start, end, client_name, client_phone, notes, service_names = appointment
+    services = ", ".join(service_names) or "Appointment"
+    description = f"Client: {client_name}\nPhone: {client_phone}"
+    if notes:
+        description += f"\nNotes: {notes}"
+    lines: List[str] = [
+        "BEGIN:VEVENT",
+        f"UID:appointment-{appointment_id}@barbershop",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_local(start)}",
+        f"DTEND:{_local(end)}",
+        f"SUMMARY:{escape_text(f'{services} - {client_name}')}",
+        f"DESCRIPTION:{escape_text(description)}",
+        "END:VEVENT",
+    ]
+    return "".join(fold_line(line) for line in lines)
+
+
+def render_feed(barber_name: str, appointments: Iterable[tuple]) -> Iterator[str]:
+    """Yield the calendar in chunks of EVENTS_PER_CHUNK events"""
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    yield "".join(fold_line(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(f'{barber_name} - Appointments')}",
+    ])
+    chunk = []
+    for appointment in appointments:
+        chunk.append(render_event(appointment, stamp))
+        if len(chunk) >= EVENTS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("END:VCALENDAR\r\n")
+    yield "".join(chunk)
@@ -0,0 +1,63 @@
+"""
+Change log for incremental sync: GET /api/admin/changes?since=<cursor>.
+
+Every appointment, barber and service mutation appends (entity, id, action, shop)
+rows to `change_log` in the same transaction as the write itself, so the log
+never shows a change that was rolled back and never misses one that committed.
+Bulk writers append one executemany INSERT, or an INSERT ... SELECT over the
+rows they touched, instead of a statement per row.
+
+The row id is the cursor. Consumers keep the last `next_cursor` they saw and ask
+for what came after it; the feed only reads the log (by primary key, or the
+(shop_id, id) index), never the hot tables, apart from loading the current state
+of the entities in one page.
+
+Actions: created, updated, deleted (services are hard deleted; barbers are only
+deactivated, which is an update) and archived (moved to the archive table by
+app/archive.py). Entries older than CHANGE_LOG_RETENTION_DAYS are purged by
+the archive job.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models import ChangeLogEntry
+
+APPOINTMENT = "appointment"
+BARBER = "barber"
+SERVICE = "service"
+
+
+def record(db: Session, entity: str, action: str, rows: Iterable[Tuple[int, Optional[int]]]) -> None:
+    """Append (entity_id, shop_id) rows to the log; part of the caller's transaction"""
+    now = datetime.utcnow()
+    values = [
+        {"entity": entity, "entity_id": entity_id, "action": action, "shop_id": shop_id, "changed_at": now}
+        for entity_id, shop_id in rows
+    ]
+    if values:
+        db.execute(insert(ChangeLogEntry), values)
+
+
+def record_from(db: Session, entity: str, action: str, model, *criteria) -> None:
+    """Append one row per `model` row matching the criteria, with a single INSERT ... SELECT"""
+    db.execute(insert(ChangeLogEntry).from_select(
+        ["entity", "entity_id", "action", "shop_id", "changed_at"],
+        select(literal(entity), model.id, literal(action), model.shop_id, literal(datetime.utcnow())).where(*criteria),
+    ))
+
+
+def purge(db: Session, before: datetime, batch_size: int = 10000) -> int:
+    """Delete log entries older than `before`, oldest first, one batch per transaction"""
+    total = 0
+    while True:
+        ids = select(ChangeLogEntry.id).where(ChangeLogEntry.changed_at < before).order_by(ChangeLogEntry.id).limit(batch_size)
+        result = db.execute(
+            delete(ChangeLogEntry).where(ChangeLogEntry.id.in_(ids.scalar_subquery())).execution_options(synchronize_session=False)
+        )
+        db.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
@@ -14,14 +14,98 @@ class Settings:
     smtp_user: str = os.getenv("SMTP_USER", "test@example.com")
     smtp_password: str = os.getenv("SMTP_PASSWORD", "test-password")
     from_email: str = os.getenv("FROM_EMAIL", "test@example.com")
+    smtp_use_tls: bool = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
 
     # Application
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production-minimum-32-characters")
     frontend_url: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
     backend_url: str = os.getenv("BACKEND_URL", "http://localhost:8000")
     
+    # Caching (seconds / max entries per process)
+    catalog_cache_ttl: float = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+    catalog_cache_size: int = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+    availability_cache_ttl: float = float(os.getenv("AVAILABILITY_CACHE_TTL", "30"))
+    availability_cache_size: int = int(os.getenv("AVAILABILITY_CACHE_SIZE", "4096"))
+    # Threads computing uncached days of the booking bootstrap, per process
+    bootstrap_workers: int = int(os.getenv("BOOTSTRAP_WORKERS", "4"))
+
+    # Live slot events: "memory" or "package.module:factory" for a shared broker
+    event_broker: str = os.getenv("EVENT_BROKER", "memory")
+    event_queue_size: int = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+    sse_heartbeat_seconds: float = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+    # Window of appointments in the barber calendar feeds, relative to today
+    calendar_past_days: int = int(os.getenv("CALENDAR_PAST_DAYS", "30"))
+    calendar_future_days: int = int(os.getenv("CALENDAR_FUTURE_DAYS", "180"))
+
+    # Slot holds during checkout (seconds)
+    slot_hold_ttl: int = int(os.getenv("SLOT_HOLD_TTL", "300"))
+    hold_sweep_interval: float = float(os.getenv("HOLD_SWEEP_INTERVAL", "30"))
+
+    # Idempotency keys: how long responses are replayed, and how long a running request holds its key
+    idempotency_ttl: int = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+    idempotency_lock_seconds: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+
+    # Background jobs: how long a worker owns a job before another may take over (seconds)
+    job_lease_seconds: int = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+    # Change feed: days of entries kept, and how old an entry must be before it is served.
+    # On PostgreSQL ids can commit out of order; a few seconds of delay keeps cursors from skipping them.
+    # SQLite serializes writers, so ids commit in order there and no delay is needed.
+    change_log_retention_days: int = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+    change_feed_delay_seconds: float = float(os.getenv(
+        "CHANGE_FEED_DELAY_SECONDS", "5" if database_url.startswith("postgres") else "0"
+    ))
+
+    # Waitlist: how many waiting clients are offered each freed slot
+    waitlist_offers_per_slot: int = int(os.getenv("WAITLIST_OFFERS_PER_SLOT", "3"))
+    notification_queue_size: int = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "1000"))
+
+    # Rate limiting of expensive public endpoints (token buckets per client and route)
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    rate_limit_max_clients: int = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+    rate_limit_trust_proxy: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    rate_limit_availability_per_minute: float = float(os.getenv("RATE_LIMIT_AVAILABILITY_PER_MINUTE", "60"))
+    rate_limit_availability_burst: int = int(os.getenv("RATE_LIMIT_AVAILABILITY_BURST", "20"))
+    rate_limit_booking_per_minute: float = float(os.getenv("RATE_LIMIT_BOOKING_PER_MINUTE", "10"))
+    rate_limit_booking_burst: int = int(os.getenv("RATE_LIMIT_BOOKING_BURST", "5"))
+    # Holds are taken on every slot click while choosing a time, so they get more room than bookings
+    rate_limit_holds_per_minute: float = float(os.getenv("RATE_LIMIT_HOLDS_PER_MINUTE", "30"))
+    rate_limit_holds_burst: int = int(os.getenv("RATE_LIMIT_HOLDS_BURST", "15"))
+
+    # Response compression (bytes / zlib level 1-9 / brotli quality 0-11)
+    compression_enabled: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    gzip_level: int = int(os.getenv("GZIP_LEVEL", "6"))
+    brotli_enabled: bool = os.getenv("BROTLI_ENABLED", "true").lower() == "true"
+    brotli_quality: int = int(os.getenv("BROTLI_QUALITY", "4"))
+
+    # HTTP caching for public reads (seconds)
+    catalog_max_age: int = int(os.getenv("CATALOG_MAX_AGE", "300"))
+    catalog_stale_while_revalidate: int = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "60"))
+    availability_max_age: int = int(os.getenv("AVAILABILITY_MAX_AGE", "10"))
+    
+    # Request tracing: sampled or slow requests are exported as JSON lines, or to an OTLP/HTTP collector
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    tracing_sample_rate: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+    tracing_slow_ms: float = float(os.getenv("TRACING_SLOW_MS", "1000"))
+    tracing_file: str = os.getenv("TRACING_FILE", "traces.jsonl")
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "")
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "barbershop-api")
+    tracing_queue_size: int = int(os.getenv("TRACING_QUEUE_SIZE", "1000"))
+    
     # JWT Settings
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24  # 24 hours
 
 settings = Settings()
+
+# A zero rate would never refill a bucket; turn limiting off with RATE_LIMIT_ENABLED=false instead
+if settings.rate_limit_enabled:
+    for variable in ("RATE_LIMIT_AVAILABILITY_PER_MINUTE", "RATE_LIMIT_BOOKING_PER_MINUTE", "RATE_LIMIT_HOLDS_PER_MINUTE"):
+        if getattr(settings, variable.lower()) <= 0:
+            raise ValueError(f"{variable} must be greater than 0 (or set RATE_LIMIT_ENABLED=false)")
+    for variable in ("RATE_LIMIT_AVAILABILITY_BURST", "RATE_LIMIT_BOOKING_BURST", "RATE_LIMIT_HOLDS_BURST"):
+        if getattr(settings, variable.lower()) < 1:
+            raise ValueError(f"{variable} must be at least 1 (or set RATE_LIMIT_ENABLED=false)")
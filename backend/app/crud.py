@@ -1,44 +1,182 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
-from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, case, func, delete, insert, select, update, union_all, literal, Boolean
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from collections import defaultdict
+from concurrent.futures import Executor
+from bisect import bisect_left
+from itertools import groupby, islice
+import heapq
+import time as time_module
+import secrets
 import uuid
 
-from app.models import Barber, Service, Appointment
-from app.schemas import BarberCreate, BarberUpdate, ServiceCreate, ServiceUpdate, AppointmentCreate, AppointmentUpdate
+from app import cache, changes, events, notifications, search, tracing
+from app.config import settings
+from app.models import Shop, Barber, Service, Appointment, appointment_services
+from app.models import ArchivedAppointment, appointment_services_archive
+from app.models import WaitlistEntry, WaitlistDay, SlotHold, IdempotencyKey, DailyBarberStats, ChangeLogEntry
+from app.schemas import ShopCreate, ShopUpdate, BarberCreate, BarberUpdate, ServiceCreate, ServiceUpdate, AppointmentCreate, AppointmentUpdate, AppointmentImportRow
+from app.schemas import BarberBulkUpdate, ServiceBulkUpdate, WaitlistEntryCreate
+from app import schemas
+
+# Shop CRUD operations
+def get_shop(db: Session, shop_id: int, active_only: bool = True) -> Optional[Shop]:
+    query = db.query(Shop).filter(Shop.id == shop_id)
+    if active_only:
+        query = query.filter(Shop.is_active == True)
+    return query.first()
+
+def get_shop_by_slug(db: Session, slug: str) -> Optional[Shop]:
+    return db.query(Shop).filter(Shop.slug == slug).first()
+
+def get_shops(db: Session, include_inactive: bool = False) -> List[Shop]:
+    query = db.query(Shop)
+    if not include_inactive:
+        query = query.filter(Shop.is_active == True)
+    return query.order_by(Shop.id).all()
+
+def get_default_shop_id(db: Session) -> int:
+    """The main shop (the oldest one), used when a barber is created without a shop"""
+    return db.query(func.min(Shop.id)).scalar()
+
+def create_shop(db: Session, shop: ShopCreate) -> Shop:
+    db_shop = Shop(**shop.dict())
+    db.add(db_shop)
+    db.commit()
+    db.refresh(db_shop)
+    return db_shop
+
+def update_shop(db: Session, shop_id: int, shop_update: ShopUpdate) -> Optional[Shop]:
+    db_shop = get_shop(db, shop_id, active_only=False)
+    if db_shop:
+        update_data = shop_update.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_shop, field, value)
+        db.commit()
+        db.refresh(db_shop)
+        cache.invalidate_catalog()
+    return db_shop
 
 # Barber CRUD operations
 def get_barber(db: Session, barber_id: int) -> Optional[Barber]:
     return db.query(Barber).filter(Barber.id == barber_id, Barber.is_active == True).first()
 
-def get_barbers(db: Session, skip: int = 0, limit: int = 100) -> List[Barber]:
-    return db.query(Barber).filter(Barber.is_active == True).offset(skip).limit(limit).all()
+def get_barbers(db: Session, skip: int = 0, limit: int = 100, shop_id: Optional[int] = None) -> List[Barber]:
+    query = db.query(Barber)
+    if shop_id is not None:
+        query = query.filter(Barber.shop_id == shop_id)
+    return query.filter(Barber.is_active == True).offset(skip).limit(limit).all()
+
+def _move_barber_rows(db: Session, barber_id: int, shop_id: int) -> None:
+    """Keep the denormalized shop_id of a barber's services and appointments in step"""
+    db.execute(update(Service).where(Service.barber_id == barber_id).values(shop_id=shop_id))
+    db.execute(update(DailyBarberStats).where(DailyBarberStats.barber_id == barber_id).values(shop_id=shop_id))
+    db.execute(update(Appointment).where(Appointment.barber_id == barber_id).values(shop_id=shop_id))
+    changes.record_from(db, changes.SERVICE, "updated", Service, Service.barber_id == barber_id)
+    changes.record_from(db, changes.APPOINTMENT, "updated", Appointment, Appointment.barber_id == barber_id)
+
+def _bump_schedule_version(db: Session, barber_ids) -> None:
+    """Change the calendar feed ETag of these barbers; part of the caller's transaction"""
+    db.execute(
+        update(Barber)
+        .where(Barber.id.in_(list(barber_ids)))
+        # updated_at is left alone: it tracks edits to the barber itself
+        .values(schedule_version=func.coalesce(Barber.schedule_version, 0) + 1, updated_at=Barber.updated_at)
+        .execution_options(synchronize_session=False)
+    )
 
 def create_barber(db: Session, barber: BarberCreate) -> Barber:
     db_barber = Barber(**barber.dict())
+    if db_barber.shop_id is None:
+        db_barber.shop_id = get_default_shop_id(db)
     db.add(db_barber)
+    db.flush()
+    changes.record(db, changes.BARBER, "created", [(db_barber.id, db_barber.shop_id)])
     db.commit()
     db.refresh(db_barber)
+    cache.invalidate_catalog()
     return db_barber
 
 def update_barber(db: Session, barber_id: int, barber_update: BarberUpdate) -> Optional[Barber]:
     db_barber = get_barber(db, barber_id)
     if db_barber:
         update_data = barber_update.dict(exclude_unset=True)
+        # A null shop_id leaves the barber where it is
+        if "shop_id" in update_data and update_data["shop_id"] is None:
+            del update_data["shop_id"]
         for field, value in update_data.items():
             setattr(db_barber, field, value)
+        if "shop_id" in update_data:
+            _move_barber_rows(db, barber_id, db_barber.shop_id)
+        if "name" in update_data:
+            db_barber.schedule_version = (db_barber.schedule_version or 0) + 1
+        changes.record(db, changes.BARBER, "updated", [(db_barber.id, db_barber.shop_id)])
         db.commit()
         db.refresh(db_barber)
+        cache.invalidate_catalog()
     return db_barber
 
 def delete_barber(db: Session, barber_id: int) -> bool:
     db_barber = get_barber(db, barber_id)
     if db_barber:
         db_barber.is_active = False
+        changes.record(db, changes.BARBER, "updated", [(db_barber.id, db_barber.shop_id)])
         db.commit()
+        cache.invalidate_catalog()
         return True
     return False
 
+def get_calendar_token(db: Session, barber_id: int, rotate: bool = False) -> Optional[str]:
+    """The barber's calendar feed secret, created on first use; rotate=True revokes the old URL"""
+    db_barber = get_barber(db, barber_id)
+    if not db_barber:
+        return None
+    if rotate or not db_barber.calendar_token:
+        db_barber.calendar_token = secrets.token_urlsafe(32)
+        db.commit()
+    return db_barber.calendar_token
+
+def get_calendar_barber(db: Session, barber_id: int) -> Optional[tuple]:
+    """(id, shop_id, name, calendar_token, schedule_version) without loading the ORM object"""
+    return db.execute(
+        select(Barber.id, Barber.shop_id, Barber.name, Barber.calendar_token, func.coalesce(Barber.schedule_version, 0))
+        .where(Barber.id == barber_id)
+    ).first()
+
+def iter_calendar_appointments(db: Session, barber_id: int, shop_id: int, start: datetime, end: datetime, batch_size: int = 500):
+    """
+    Stream the barber's booked appointments starting in [start, end) in start order,
+    as (id, start, end, client_name, client_phone, notes, service names), fetching
+    `batch_size` rows at a time. Uses ix_appointments_shop_barber_status_datetime.
+    """
+    rows = db.execute(
+        select(
+            Appointment.id, Appointment.appointment_datetime, Appointment.client_name,
+            Appointment.client_phone, Appointment.notes, Service.name, Service.duration_minutes,
+        )
+        .outerjoin(appointment_services, appointment_services.c.appointment_id == Appointment.id)
+        .outerjoin(Service, Service.id == appointment_services.c.service_id)
+        .where(
+            Appointment.shop_id == shop_id,
+            Appointment.barber_id == barber_id,
+            Appointment.status.in_(BOOKED_STATUSES),
+            Appointment.appointment_datetime >= start,
+            Appointment.appointment_datetime < end,
+        )
+        .order_by(Appointment.appointment_datetime, Appointment.id)
+        .execution_options(yield_per=batch_size)
+    )
+    # One row per service; consecutive rows of an appointment are folded together
+    for appointment_id, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        _, apt_start, client_name, client_phone, notes, _, _ = group[0]
+        names = [row[5] for row in group if row[5] is not None]
+        minutes = sum(row[6] or 0 for row in group)
+        yield appointment_id, apt_start, apt_start + timedelta(minutes=minutes), client_name, client_phone, notes, names
+
 # Service CRUD operations
 def get_service(db: Session, service_id: int, active_only: bool = True) -> Optional[Service]:
     """Get a service by ID. By default only returns active services."""
@@ -47,17 +185,83 @@ def get_service(db: Session, service_id: int, active_only: bool = True) -> Optio
         query = query.filter(Service.is_active == True)
     return query.first()
 
-def get_services_by_barber(db: Session, barber_id: int, include_inactive: bool = False) -> List[Service]:
-    query = db.query(Service).filter(Service.barber_id == barber_id)
+def get_services_by_barber(db: Session, barber_id: int, include_inactive: bool = False, shop_id: Optional[int] = None) -> List[Service]:
+    query = db.query(Service)
+    if shop_id is not None:
+        query = query.filter(Service.shop_id == shop_id)
+    query = query.filter(Service.barber_id == barber_id)
     if not include_inactive:
         query = query.filter(Service.is_active == True)
     return query.all()
 
+# Cached catalog reads: plain dicts built from column tuples, shaped like the response schemas
+BARBER_FIELDS = list(schemas.Barber.model_fields)
+SERVICE_FIELDS = list(schemas.Service.model_fields)
+APPOINTMENT_FIELDS = list(schemas.Appointment.model_fields)
+
+def _columns(model, fields: List[str]) -> list:
+    return [getattr(model, field) for field in fields]
+
+def _service_rows(db: Session, *criteria) -> List[dict]:
+    return [dict(row) for row in db.execute(
+        select(*_columns(Service, SERVICE_FIELDS)).where(*criteria).order_by(Service.id)
+    ).mappings()]
+
+def get_catalog_barbers(db: Session, skip: int = 0, limit: int = 100, shop_id: Optional[int] = None) -> List[dict]:
+    """Active barbers with their active services, optionally for one shop"""
+    def load():
+        query = select(*_columns(Barber, BARBER_FIELDS)).where(Barber.is_active == True)
+        if shop_id is not None:
+            query = query.where(Barber.shop_id == shop_id)
+        barbers = [dict(row) for row in db.execute(query.order_by(Barber.id).offset(skip).limit(limit)).mappings()]
+        if not barbers:
+            return []
+
+        criteria = [Service.barber_id.in_([barber["id"] for barber in barbers]), Service.is_active == True]
+        if shop_id is not None:
+            criteria.append(Service.shop_id == shop_id)
+        services = defaultdict(list)
+        for service in _service_rows(db, *criteria):
+            services[service["barber_id"]].append(service)
+        for barber in barbers:
+            barber["services"] = services[barber["id"]]
+        return barbers
+    return cache.catalog_cache.get_or_set(cache.catalog_key("barbers", shop_id, skip, limit), load)
+
+def get_catalog_barber(db: Session, barber_id: int) -> Optional[dict]:
+    """An active barber with active services, or None"""
+    def load():
+        row = db.execute(
+            select(*_columns(Barber, BARBER_FIELDS)).where(Barber.id == barber_id, Barber.is_active == True)
+        ).mappings().first()
+        if not row:
+            return None
+        barber = dict(row)
+        barber["services"] = _service_rows(
+            db, Service.shop_id == barber["shop_id"], Service.barber_id == barber_id, Service.is_active == True
+        )
+        return barber
+    return cache.catalog_cache.get_or_set(cache.catalog_key("barber", barber_id), load)
+
+def get_catalog_services(db: Session, barber_id: int, include_inactive: bool = False, shop_id: Optional[int] = None) -> List[dict]:
+    def load():
+        criteria = [Service.barber_id == barber_id]
+        if shop_id is not None:
+            criteria.append(Service.shop_id == shop_id)
+        if not include_inactive:
+            criteria.append(Service.is_active == True)
+        return _service_rows(db, *criteria)
+    return cache.catalog_cache.get_or_set(cache.catalog_key("services", barber_id, include_inactive), load)
+
 def create_service(db: Session, service: ServiceCreate) -> Service:
     db_service = Service(**service.dict())
+    db_service.shop_id = db.query(Barber.shop_id).filter(Barber.id == service.barber_id).scalar()
     db.add(db_service)
+    db.flush()
+    changes.record(db, changes.SERVICE, "created", [(db_service.id, db_service.shop_id)])
     db.commit()
     db.refresh(db_service)
+    cache.invalidate_catalog()
     return db_service
 
 def update_service(db: Session, service_id: int, service_update: ServiceUpdate) -> Optional[Service]:
@@ -67,16 +271,29 @@ def update_service(db: Session, service_id: int, service_update: ServiceUpdate)
         update_data = service_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_service, field, value)
+        if "name" in update_data or "duration_minutes" in update_data:
+            # Feed events show service names and end times of existing bookings
+            _bump_schedule_version(db, [db_service.barber_id])
+        changes.record(db, changes.SERVICE, "updated", [(db_service.id, db_service.shop_id)])
         db.commit()
         db.refresh(db_service)
+        cache.invalidate_catalog()
+        # Existing bookings take their length from the current service durations
+        if "duration_minutes" in update_data:
+            cache.invalidate_availability([db_service.barber_id])
     return db_service
 
 def delete_service(db: Session, service_id: int) -> bool:
     """Delete a service (hard delete)"""
     db_service = get_service(db, service_id, active_only=False)
     if db_service:
+        barber_id = db_service.barber_id
+        changes.record(db, changes.SERVICE, "deleted", [(db_service.id, db_service.shop_id)])
         db.delete(db_service)
+        _bump_schedule_version(db, [barber_id])
         db.commit()
+        cache.invalidate_catalog()
+        cache.invalidate_availability([barber_id])
         return True
     return False
 
@@ -87,16 +304,308 @@ def get_appointment(db: Session, appointment_id: int) -> Optional[Appointment]:
 def get_appointment_by_cancellation_token(db: Session, token: str) -> Optional[Appointment]:
     return db.query(Appointment).filter(Appointment.cancellation_token == token).first()
 
-def get_appointments(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None) -> List[Appointment]:
+def get_appointments(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None, shop_id: Optional[int] = None) -> List[Appointment]:
     query = db.query(Appointment)
+    if shop_id is not None:
+        query = query.filter(Appointment.shop_id == shop_id)
     if status:
         query = query.filter(Appointment.status == status)
     return query.offset(skip).limit(limit).all()
 
-def create_appointment(db: Session, appointment: AppointmentCreate) -> Appointment:
+def get_appointments_with_details(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None, shop_id: Optional[int] = None) -> List[dict]:
+    """
+    A page of appointments with barber and services, shaped like AppointmentWithDetails.
+    Three column-only queries (appointments, their barbers, their services), no ORM objects.
+    """
+    query = select(*_columns(Appointment, APPOINTMENT_FIELDS))
+    if shop_id is not None:
+        query = query.where(Appointment.shop_id == shop_id)
+    if status:
+        query = query.where(Appointment.status == status)
+    appointments = [dict(row) for row in db.execute(query.order_by(Appointment.id).offset(skip).limit(limit)).mappings()]
+    return _with_details(db, appointments)
+
+def search_appointments(db: Session, query: str, limit: int = 50, shop_id: Optional[int] = None, status: Optional[str] = None) -> List[dict]:
+    """Appointments whose client name, email or phone matches the query, newest first, shaped like AppointmentWithDetails"""
+    ids = search.search_appointment_ids(db, query, limit=limit, shop_id=shop_id, status=status)
+    if not ids:
+        return []
+    rows = {
+        row["id"]: dict(row) for row in db.execute(
+            select(*_columns(Appointment, APPOINTMENT_FIELDS)).where(Appointment.id.in_(ids))
+        ).mappings()
+    }
+    return _with_details(db, [rows[appointment_id] for appointment_id in ids if appointment_id in rows])
+
+def _with_details(db: Session, appointments: List[dict]) -> List[dict]:
+    """Attach barber and services to appointment rows, two queries for the whole list"""
+    if not appointments:
+        return []
+
+    # Inactive barbers and services are included: history must stay complete
+    barbers = {
+        row["id"]: dict(row) for row in db.execute(
+            select(*_columns(Barber, BARBER_FIELDS)).where(Barber.id.in_({a["barber_id"] for a in appointments}))
+        ).mappings()
+    }
+    services = defaultdict(list)
+    for row in db.execute(
+        select(appointment_services.c.appointment_id, *_columns(Service, SERVICE_FIELDS))
+        .join(Service, Service.id == appointment_services.c.service_id)
+        .where(appointment_services.c.appointment_id.in_([a["id"] for a in appointments]))
+        .order_by(Service.id)
+    ).mappings():
+        service = dict(row)
+        services[service.pop("appointment_id")].append(service)
+
+    for appointment in appointments:
+        appointment["barber"] = barbers[appointment["barber_id"]]
+        appointment["services"] = services[appointment["id"]]
+    return appointments
+
+HISTORY_COLUMNS = [
+    "id", "shop_id", "barber_id", "client_name", "client_email", "client_phone",
+    "appointment_datetime", "status", "notes", "created_at", "confirmed_at",
+]
+
+def get_appointment_history(db: Session, skip: int = 0, limit: int = 100, shop_id: Optional[int] = None, barber_id: Optional[int] = None, status: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None, client_email: Optional[str] = None, client_phone: Optional[str] = None) -> List[dict]:
+    """
+    Appointments from both the hot and the archive table, newest first.
+    A client's history (client_email or client_phone) is read from the per-client indexes of both tables.
+    """
+    def select_from(model, archived: bool):
+        query = select(
+            *(getattr(model, column) for column in HISTORY_COLUMNS),
+            literal(archived, Boolean).label("archived"),
+        )
+        if shop_id is not None:
+            query = query.where(model.shop_id == shop_id)
+        if barber_id is not None:
+            query = query.where(model.barber_id == barber_id)
+        if client_email:
+            query = query.where(model.client_email == client_email)
+        if client_phone:
+            query = query.where(model.client_phone == client_phone)
+        if status:
+            query = query.where(model.status == status)
+        if start:
+            query = query.where(model.appointment_datetime >= start)
+        if end:
+            query = query.where(model.appointment_datetime < end)
+        return query
+
+    history = union_all(select_from(Appointment, False), select_from(ArchivedAppointment, True)).subquery()
+    rows = [
+        dict(row) for row in db.execute(
+            select(history)
+            .order_by(history.c.appointment_datetime.desc(), history.c.id.desc())
+            .offset(skip).limit(limit)
+        ).mappings()
+    ]
+
+    # Service links for the page, one query per table
+    service_ids = defaultdict(list)
+    for archived, links in ((False, appointment_services), (True, appointment_services_archive)):
+        ids = [row["id"] for row in rows if bool(row["archived"]) == archived]
+        if ids:
+            for appointment_id, service_id in db.execute(
+                select(links.c.appointment_id, links.c.service_id).where(links.c.appointment_id.in_(ids))
+            ):
+                service_ids[(archived, appointment_id)].append(service_id)
+    for row in rows:
+        row["archived"] = bool(row["archived"])
+        row["service_ids"] = sorted(service_ids[(row["archived"], row["id"])])
+    return rows
+
+# Daily stats rollups: (booked_count, cancelled_count, booked_minutes, revenue) per (barber, shop, day)
+BOOKED_STATUSES = ("confirmed", "completed")
+STATS_COLUMNS = ("booked_count", "cancelled_count", "booked_minutes", "revenue")
+
+def _new_stats_deltas() -> Dict[Tuple[int, int, date], list]:
+    return defaultdict(lambda: [0, 0, 0, 0.0])
+
+def _add_stats(deltas: Dict[Tuple[int, int, date], list], barber_id: int, shop_id: int, when: datetime, status: str, minutes: int, price: float, sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) one appointment's contribution"""
+    row = deltas[(barber_id, shop_id, when.date())]
+    if status in BOOKED_STATUSES:
+        row[0] += sign
+        row[2] += sign * minutes
+        row[3] += sign * price
+    elif status == "cancelled":
+        row[1] += sign
+
+def _apply_stats_deltas(db: Session, deltas: Dict[Tuple[int, int, date], list]) -> None:
+    """Upsert deltas into daily_barber_stats inside the caller's transaction"""
+    rows = [
+        {"barber_id": barber_id, "shop_id": shop_id, "day": day, **dict(zip(STATS_COLUMNS, values))}
+        for (barber_id, shop_id, day), values in deltas.items() if any(values)
+    ]
+    if not rows:
+        return
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(DailyBarberStats)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["barber_id", "day"],
+            set_={column: getattr(DailyBarberStats, column) + getattr(statement.excluded, column) for column in STATS_COLUMNS},
+        ),
+        rows,
+    )
+
+def rebuild_daily_stats(db: Session, start: Optional[date] = None, end: Optional[date] = None, batch_size: int = 10000) -> int:
+    """
+    Recompute daily_barber_stats for [start, end] (inclusive; default everything) from
+    the hot and archived appointments, at the totals they were booked at. Used for
+    backfills and after bulk loads that bypass crud. Returns the number of rollup rows written.
+    """
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    shops = {}
+    for model, links in ((Appointment, appointment_services), (ArchivedAppointment, appointment_services_archive)):
+        per_appointment = (
+            select(
+                links.c.appointment_id,
+                func.sum(Service.duration_minutes).label("minutes"),
+                func.sum(Service.price).label("price"),
+            )
+            .join(Service, Service.id == links.c.service_id)
+            .group_by(links.c.appointment_id)
+            .subquery()
+        )
+        booked = model.status.in_(BOOKED_STATUSES)
+        day = func.date(model.appointment_datetime)
+        query = (
+            select(
+                model.barber_id, model.shop_id, day,
+                func.sum(case((booked, 1), else_=0)),
+                func.sum(case((model.status == "cancelled", 1), else_=0)),
+                func.sum(case((booked, func.coalesce(model.booked_minutes, per_appointment.c.minutes, 0)), else_=0)),
+                func.sum(case((booked, func.coalesce(model.booked_price, per_appointment.c.price, 0.0)), else_=0.0)),
+            )
+            .outerjoin(per_appointment, per_appointment.c.appointment_id == model.id)
+            .group_by(model.barber_id, model.shop_id, day)
+        )
+        if start is not None:
+            query = query.where(model.appointment_datetime >= datetime.combine(start, time()))
+        if end is not None:
+            query = query.where(model.appointment_datetime < datetime.combine(end + timedelta(days=1), time()))
+        for barber_id, shop_id, row_day, *values in db.execute(query):
+            row_day = row_day if isinstance(row_day, date) else date.fromisoformat(str(row_day)[:10])
+            row = totals[(barber_id, row_day)]
+            for index, value in enumerate(values):
+                row[index] += value or 0
+            if shop_id is not None:
+                shops[barber_id] = shop_id
+
+    # Archived rows from before shops existed take the barber's current shop
+    missing = {barber_id for barber_id, _ in totals} - set(shops)
+    if missing:
+        shops.update(db.execute(select(Barber.id, Barber.shop_id).where(Barber.id.in_(missing))).all())
+
+    try:
+        clear = delete(DailyBarberStats)
+        if start is not None:
+            clear = clear.where(DailyBarberStats.day >= start)
+        if end is not None:
+            clear = clear.where(DailyBarberStats.day <= end)
+        db.execute(clear)
+        rows = [
+            {"barber_id": barber_id, "shop_id": shops.get(barber_id), "day": row_day, **dict(zip(STATS_COLUMNS, values))}
+            for (barber_id, row_day), values in totals.items() if shops.get(barber_id) is not None
+        ]
+        for offset in range(0, len(rows), batch_size):
+            db.execute(insert(DailyBarberStats), rows[offset:offset + batch_size])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+def get_daily_stats(db: Session, start: date, end: date, group_by: str = "day", shop_id: Optional[int] = None, barber_id: Optional[int] = None) -> dict:
+    """
+    Revenue, booked minutes, utilization and cancellation rate for [start, end],
+    grouped by day or by barber, read from the rollups only. Utilization is booked
+    minutes over working minutes of the barbers in scope.
+    """
+    filters = [DailyBarberStats.day >= start, DailyBarberStats.day <= end]
+    if shop_id is not None:
+        filters.append(DailyBarberStats.shop_id == shop_id)
+    if barber_id is not None:
+        filters.append(DailyBarberStats.barber_id == barber_id)
+    key = DailyBarberStats.day if group_by == "day" else DailyBarberStats.barber_id
+    sums = [func.sum(getattr(DailyBarberStats, column)) for column in STATS_COLUMNS]
+    grouped = db.execute(select(key, *sums).where(*filters).group_by(key).order_by(key)).all()
+
+    if barber_id is not None:
+        barber_count = 1
+    else:
+        barber_query = select(func.count(Barber.id)).where(Barber.is_active == True)
+        if shop_id is not None:
+            barber_query = barber_query.where(Barber.shop_id == shop_id)
+        barber_count = db.execute(barber_query).scalar() or 0
+    days = (end - start).days + 1
+    workday_minutes = (datetime.combine(start, WORK_END) - datetime.combine(start, WORK_START)).seconds // 60
+
+    def metrics(values, capacity_minutes):
+        booked, cancelled, minutes, revenue = (value or 0 for value in values)
+        return {
+            "booked_count": booked,
+            "cancelled_count": cancelled,
+            "booked_minutes": minutes,
+            "revenue": round(revenue, 2),
+            "utilization": round(minutes / capacity_minutes, 4) if capacity_minutes else None,
+            "cancellation_rate": round(cancelled / (booked + cancelled), 4) if booked + cancelled else None,
+        }
+
+    names = {}
+    if group_by == "barber" and grouped:
+        names = dict(db.execute(select(Barber.id, Barber.name).where(Barber.id.in_([row[0] for row in grouped]))).all())
+    rows = []
+    for group, *values in grouped:
+        if group_by == "day":
+            group = group if isinstance(group, date) else date.fromisoformat(str(group)[:10])
+            rows.append({"day": group, **metrics(values, barber_count * workday_minutes)})
+        else:
+            rows.append({"barber_id": group, "barber_name": names.get(group), **metrics(values, days * workday_minutes)})
+
+    totals = [sum(row[index + 1] or 0 for row in grouped) for index in range(len(STATS_COLUMNS))]
+    return {
+        "start": start,
+        "end": end,
+        "group_by": group_by,
+        "totals": metrics(totals, barber_count * days * workday_minutes),
+        "rows": rows,
+    }
+
+def _appointment_totals(appointment: Appointment) -> Tuple[int, float]:
+    """Minutes and price the appointment was booked at, for the daily stats"""
+    if appointment.booked_minutes is not None:
+        return appointment.booked_minutes, appointment.booked_price or 0.0
+    return (
+        sum(service.duration_minutes for service in appointment.services),
+        sum(service.price for service in appointment.services),
+    )
+
+def _appointment_interval(appointment: Appointment) -> Tuple[datetime, datetime]:
+    duration = sum(service.duration_minutes for service in appointment.services)
+    return appointment.appointment_datetime, appointment.appointment_datetime + timedelta(minutes=duration)
+
+def create_appointment(db: Session, appointment: AppointmentCreate) -> Optional[Appointment]:
+    if appointment.hold_token:
+        # Deleting the hold claims the slot: of two bookings racing for one hold only one
+        # removes the row, and the other gets None back before anything is inserted
+        consumed = db.execute(
+            delete(SlotHold)
+            .where(SlotHold.token == appointment.hold_token, SlotHold.expires_at > datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if consumed.rowcount != 1:
+            db.rollback()
+            return None
+
     # Extract service_ids and create appointment without them
-    appointment_data = appointment.dict(exclude={'service_ids'})
+    appointment_data = appointment.dict(exclude={'service_ids', 'hold_token'})
     db_appointment = Appointment(**appointment_data)
+    db_appointment.shop_id = db.query(Barber.shop_id).filter(Barber.id == appointment.barber_id).scalar()
     db_appointment.cancellation_token = str(uuid.uuid4())
     db_appointment.status = "confirmed"  # Automatically confirm
     db_appointment.confirmed_at = datetime.utcnow()
@@ -106,22 +615,51 @@ def create_appointment(db: Session, appointment: AppointmentCreate) -> Appointme
         service = get_service(db, service_id)
         if service:
             db_appointment.services.append(service)
+    db_appointment.booked_minutes, db_appointment.booked_price = _appointment_totals(db_appointment)
     
     db.add(db_appointment)
+    deltas = _new_stats_deltas()
+    _add_stats(deltas, db_appointment.barber_id, db_appointment.shop_id, db_appointment.appointment_datetime, "confirmed", *_appointment_totals(db_appointment))
+    _apply_stats_deltas(db, deltas)
+    _bump_schedule_version(db, [db_appointment.barber_id])
+    db.flush()
+    changes.record(db, changes.APPOINTMENT, "created", [(db_appointment.id, db_appointment.shop_id)])
     db.commit()
     db.refresh(db_appointment)
+    cache.invalidate_availability([db_appointment.barber_id])
+    events.publish_slot_change("taken", db_appointment.barber_id, *_appointment_interval(db_appointment), db_appointment.id)
     return db_appointment
 
 def update_appointment(db: Session, appointment_id: int, appointment_update: AppointmentUpdate) -> Optional[Appointment]:
     db_appointment = get_appointment(db, appointment_id)
     if db_appointment:
+        was_busy = db_appointment.status == "confirmed"
+        old_start, old_end = _appointment_interval(db_appointment)
+        minutes, price = _appointment_totals(db_appointment)
+        deltas = _new_stats_deltas()
+        _add_stats(deltas, db_appointment.barber_id, db_appointment.shop_id, old_start, db_appointment.status, minutes, price, sign=-1)
         update_data = appointment_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_appointment, field, value)
         if appointment_update.status == "confirmed":
             db_appointment.confirmed_at = datetime.utcnow()
+        _add_stats(deltas, db_appointment.barber_id, db_appointment.shop_id, db_appointment.appointment_datetime, db_appointment.status, minutes, price)
+        _apply_stats_deltas(db, deltas)
+        _bump_schedule_version(db, [db_appointment.barber_id])
+        changes.record(db, changes.APPOINTMENT, "updated", [(db_appointment.id, db_appointment.shop_id)])
         db.commit()
         db.refresh(db_appointment)
+        cache.invalidate_availability([db_appointment.barber_id])
+
+        # Reschedules and status changes reach live clients as freed/taken intervals
+        is_busy = db_appointment.status == "confirmed"
+        new_start, new_end = _appointment_interval(db_appointment)
+        moved = (old_start, old_end) != (new_start, new_end)
+        if was_busy and (not is_busy or moved):
+            events.publish_slot_change("freed", db_appointment.barber_id, old_start, old_end, db_appointment.id)
+            offer_freed_slot(db, db_appointment.barber_id, db_appointment.shop_id, old_start, old_end)
+        if is_busy and (not was_busy or moved):
+            events.publish_slot_change("taken", db_appointment.barber_id, new_start, new_end, db_appointment.id)
     return db_appointment
 
 def cancel_appointment(db: Session, token: str) -> Optional[Appointment]:
@@ -133,18 +671,31 @@ def cancel_appointment(db: Session, token: str) -> Optional[Appointment]:
         time_until_appointment = db_appointment.appointment_datetime - now
         if time_until_appointment.total_seconds() >= 7200:  # 2 hours = 7200 seconds
             db_appointment.status = "cancelled"
+            deltas = _new_stats_deltas()
+            _add_stats(deltas, db_appointment.barber_id, db_appointment.shop_id, db_appointment.appointment_datetime, "confirmed", *_appointment_totals(db_appointment), sign=-1)
+            _add_stats(deltas, db_appointment.barber_id, db_appointment.shop_id, db_appointment.appointment_datetime, "cancelled", 0, 0.0)
+            _apply_stats_deltas(db, deltas)
+            _bump_schedule_version(db, [db_appointment.barber_id])
+            changes.record(db, changes.APPOINTMENT, "updated", [(db_appointment.id, db_appointment.shop_id)])
             db.commit()
             db.refresh(db_appointment)
+            cache.invalidate_availability([db_appointment.barber_id])
+            freed_start, freed_end = _appointment_interval(db_appointment)
+            events.publish_slot_change("freed", db_appointment.barber_id, freed_start, freed_end, db_appointment.id)
+            offer_freed_slot(db, db_appointment.barber_id, db_appointment.shop_id, freed_start, freed_end)
             return db_appointment
     return None
 
-def check_appointment_conflict(db: Session, barber_id: int, appointment_datetime: datetime, duration_minutes: int, exclude_id: Optional[int] = None) -> bool:
+def check_appointment_conflict(db: Session, barber_id: int, appointment_datetime: datetime, duration_minutes: int, exclude_id: Optional[int] = None, shop_id: Optional[int] = None) -> bool:
     """Check if there's a conflicting appointment for the barber at the given time"""
     start_time = appointment_datetime
     end_time = appointment_datetime + timedelta(minutes=duration_minutes)
 
     # Get all appointments for this barber that might conflict
-    existing_appointments = db.query(Appointment).filter(
+    query = db.query(Appointment)
+    if shop_id is not None:
+        query = query.filter(Appointment.shop_id == shop_id)
+    existing_appointments = query.filter(
         Appointment.barber_id == barber_id,
         Appointment.status == "confirmed"
     ).all()
@@ -163,18 +714,113 @@ def check_appointment_conflict(db: Session, barber_id: int, appointment_datetime
         if (start_time < existing_end and end_time > existing_start):
             return True
 
-    return False
+    # Slots held by clients who are still checking out
+    return db.query(SlotHold.id).filter(
+        SlotHold.barber_id == barber_id,
+        SlotHold.start_datetime < end_time,
+        SlotHold.end_datetime > start_time,
+        SlotHold.expires_at > datetime.utcnow(),
+    ).first() is not None
 
-def get_available_time_slots(db: Session, barber_id: int, date, duration_minutes: int) -> List[dict]:
-    """Generate available time slots for a barber on a specific date"""
-    from datetime import datetime, time, timedelta
-    
-    # Define working hours (9 AM to 6 PM)
-    work_start = time(9, 0)
-    work_end = time(18, 0)
-    
-    # Slot interval in minutes (every 30 minutes)
-    slot_interval = 30
+def get_available_time_slots(db: Session, barber_id: int, date, duration_minutes: int, shop_id: Optional[int] = None) -> List[dict]:
+    """Available time slots for a barber on a specific date, served from the availability cache"""
+    sweep_expired_holds(db)
+    return _cached_time_slots(db, barber_id, date, duration_minutes, shop_id)
+
+def _cached_time_slots(db: Session, barber_id: int, date, duration_minutes: int, shop_id: Optional[int] = None) -> List[dict]:
+    """get_available_time_slots without the hold sweep; reads only"""
+    key = cache.availability_key(barber_id, date, duration_minutes)
+    slot_times = cache.availability_cache.get(key)
+    if slot_times is None:
+        # The key embeds the barber's version, so a booking made meanwhile starts a new flight
+        slot_times, _ = cache.availability_flights.do(key, lambda: cache.availability_cache.get_or_set(
+            key, lambda: compute_available_time_slots(db, barber_id, date, duration_minutes, shop_id),
+        ))
+
+    # Past slots are dropped at read time so a cached entry stays valid all day
+    now = datetime.now()
+    return [
+        {
+            "time": slot.strftime("%H:%M"),
+            "datetime": slot.isoformat(),
+            "available": True
+        }
+        for slot in slot_times if slot > now
+    ]
+
+def get_booking_bootstrap(db: Session, session_factory, barber_id: Optional[int] = None, shop_id: Optional[int] = None, days: int = 3, duration_minutes: Optional[int] = None, executor: Optional[Executor] = None) -> Optional[dict]:
+    """
+    The booking page's first screen, shaped like BookingBootstrap: the cached catalog plus
+    availability from today for `days` days, for one barber or every listed barber.
+    Slots are for `duration_minutes`, or else each barber's shortest service. Days already
+    in the availability cache are read inline; with an `executor`, the others are computed
+    concurrently, each in its own read-only session from `session_factory`. Expired holds
+    are swept once up front, in `db`. Returns None for an unknown barber.
+    """
+    barbers = get_catalog_barbers(db, shop_id=shop_id)
+    if barber_id is None:
+        chosen = barbers
+    else:
+        barber = get_catalog_barber(db, barber_id)
+        if not barber:
+            return None
+        chosen = [barber]
+
+    # (barber_id, shop_id, day, duration) per barber and day, barbers without services skipped
+    today = datetime.now().date()
+    requests = [
+        (barber["id"], barber["shop_id"], today + timedelta(days=offset),
+         duration_minutes or min(service["duration_minutes"] for service in barber["services"]))
+        for barber in chosen if barber["services"] or duration_minutes
+        for offset in range(days)
+    ]
+
+    def slots_for(session: Session, request: tuple) -> List[dict]:
+        request_barber_id, request_shop_id, day, duration = request
+        return _cached_time_slots(session, request_barber_id, day, duration, shop_id=request_shop_id)
+
+    def compute(request: tuple) -> List[dict]:
+        session = session_factory()
+        try:
+            return slots_for(session, request)
+        finally:
+            session.close()
+
+    # The only write of the request; the workers below just read
+    sweep_expired_holds(db)
+    slots = {}
+    missing = []
+    for request in requests:
+        request_barber_id, _, day, duration = request
+        if cache.availability_cache.get(cache.availability_key(request_barber_id, day, duration)) is None:
+            missing.append(request)
+        else:
+            slots[request] = slots_for(db, request)
+    if executor is not None and len(missing) > 1:
+        slots.update(zip(missing, executor.map(tracing.bind_context(compute), missing)))
+    else:
+        slots.update((request, slots_for(db, request)) for request in missing)
+
+    availability = []
+    for request_barber_id, barber_requests in groupby(requests, key=lambda request: request[0]):
+        barber_requests = list(barber_requests)
+        availability.append({
+            "barber_id": request_barber_id,
+            "duration_minutes": barber_requests[0][3],
+            "days": [{"date": request[2].isoformat(), "slots": slots[request]} for request in barber_requests],
+        })
+    return {"barbers": barbers, "availability": availability}
+
+# Working hours (9 AM to 6 PM) and the grid slots start on
+WORK_START = time(9, 0)
+WORK_END = time(18, 0)
+SLOT_INTERVAL_MINUTES = 30
+
+def compute_available_time_slots(db: Session, barber_id: int, date, duration_minutes: int, shop_id: Optional[int] = None) -> List[datetime]:
+    """Generate conflict-free slot start times for a barber on a specific date (uncached)"""
+    work_start = WORK_START
+    work_end = WORK_END
+    slot_interval = SLOT_INTERVAL_MINUTES
     
     # Combine date with work start time
     current_slot = datetime.combine(date, work_start)
@@ -189,16 +835,927 @@ def get_available_time_slots(db: Session, barber_id: int, date, duration_minutes
         
         if slot_end.time() <= work_end:
             # Check if the slot is available (no conflicts)
-            if not check_appointment_conflict(db, barber_id, current_slot, duration_minutes):
-                # Check if the slot is not in the past
-                if current_slot > datetime.now():
-                    available_slots.append({
-                        "time": current_slot.strftime("%H:%M"),
-                        "datetime": current_slot.isoformat(),
-                        "available": True
-                    })
+            if not check_appointment_conflict(db, barber_id, current_slot, duration_minutes, shop_id=shop_id):
+                available_slots.append(current_slot)
         
         # Move to next slot
         current_slot += timedelta(minutes=slot_interval)
     
     return available_slots
+
+# Longest booking the interval queries look back for; the slot engine keeps bookings within one working day
+MAX_APPOINTMENT_MINUTES = 24 * 60
+
+def get_busy_intervals(db: Session, barber_ids: List[int], start: datetime, end: datetime, shop_ids: Optional[List[int]] = None) -> Dict[int, List[Tuple[datetime, datetime, int]]]:
+    """
+    Load confirmed appointments overlapping [start, end) for several barbers in one query.
+    Returns {barber_id: [(start, end, appointment_id), ...]} sorted by start.
+    """
+    shop_filter = [Appointment.shop_id.in_(shop_ids)] if shop_ids is not None else []
+    durations = (
+        select(
+            Appointment.id,
+            Appointment.barber_id,
+            Appointment.appointment_datetime,
+            func.coalesce(func.sum(Service.duration_minutes), 0),
+        )
+        .outerjoin(appointment_services, appointment_services.c.appointment_id == Appointment.id)
+        .outerjoin(Service, Service.id == appointment_services.c.service_id)
+        .where(
+            *shop_filter,
+            Appointment.barber_id.in_(barber_ids),
+            Appointment.status == "confirmed",
+            Appointment.appointment_datetime < end,
+            Appointment.appointment_datetime >= start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+        )
+        .group_by(Appointment.id, Appointment.barber_id, Appointment.appointment_datetime)
+        .order_by(Appointment.appointment_datetime)
+    )
+    intervals = defaultdict(list)
+    for appointment_id, barber_id, apt_start, duration in db.execute(durations):
+        apt_end = apt_start + timedelta(minutes=int(duration))
+        if apt_end > start:
+            intervals[barber_id].append((apt_start, apt_end, appointment_id))
+    return intervals
+
+def _overlapping_interval(intervals: List[Tuple[datetime, datetime, int]], max_ends: List[datetime], starts: List[datetime], start: datetime, end: datetime) -> Optional[int]:
+    """Return the id of an interval overlapping [start, end), using sorted starts and running max ends"""
+    index = bisect_left(starts, end) - 1
+    if index < 0 or max_ends[index] <= start:
+        return None
+    # Walk back to the interval responsible for the overlap
+    while index >= 0:
+        if intervals[index][1] > start:
+            return intervals[index][2]
+        index -= 1
+    return None
+
+def _merge_intervals(intervals: List[Tuple[datetime, datetime, int]]) -> List[Tuple[datetime, datetime]]:
+    """Collapse start-sorted intervals into disjoint busy blocks"""
+    merged = []
+    for start, end, _ in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def _free_slot_starts(barber_id: int, busy: List[Tuple[datetime, datetime]], start: datetime, end: datetime, duration_minutes: int):
+    """
+    Yield (slot_start, barber_id) for every free grid slot starting in [start, end), in order.
+    `busy` are disjoint blocks sorted by start; the walk jumps over each block instead of
+    testing every slot against it.
+    """
+    step = timedelta(minutes=SLOT_INTERVAL_MINUTES)
+    length = timedelta(minutes=duration_minutes)
+    index = 0
+    day = start.date()
+    while datetime.combine(day, WORK_START) < end:
+        day_start = datetime.combine(day, WORK_START)
+        day_end = datetime.combine(day, WORK_END)
+        slot = day_start if start <= day_start else day_start + step * -(-(start - day_start) // step)
+        while slot < end and slot + length <= day_end:
+            while index < len(busy) and busy[index][1] <= slot:
+                index += 1
+            if index < len(busy) and busy[index][0] < slot + length:
+                # Next candidate is the first grid slot after this busy block
+                slot = day_start + step * -(-(busy[index][1] - day_start) // step)
+                continue
+            yield slot, barber_id
+            slot += step
+        day += timedelta(days=1)
+
+def get_matching_services(db: Session, barber_ids: List[int], service_names: List[str]) -> Dict[int, List[Tuple[int, int, float]]]:
+    """
+    Each barber's own active services with the given names (case-insensitive), as
+    {barber_id: [(service_id, duration_minutes, price), ...]}; barbers missing one are left out.
+    """
+    wanted = {name.strip().lower() for name in service_names}
+    matches = defaultdict(dict)
+    for service_id, barber_id, name, duration, price in db.execute(
+        select(Service.id, Service.barber_id, Service.name, Service.duration_minutes, Service.price).where(
+            Service.barber_id.in_(barber_ids), Service.is_active == True,
+            func.lower(Service.name).in_(wanted),
+        ).order_by(Service.id)
+    ):
+        matches[barber_id].setdefault(name.lower(), (service_id, duration, price))
+    return {
+        barber_id: list(found.values())
+        for barber_id, found in matches.items() if len(found) == len(wanted)
+    }
+
+def get_next_available_slots(db: Session, start: datetime, end: datetime, limit: int = 5, duration_minutes: Optional[int] = None, service_names: Optional[List[str]] = None, shop_id: Optional[int] = None) -> List[dict]:
+    """
+    The `limit` earliest free slots across all active barbers within [start, end).
+
+    The booking length is either `duration_minutes` or, with `service_names`, the sum of
+    each barber's own services of those names (barbers missing one are skipped). Each
+    barber's free slots come from a generator over their merged busy blocks; the
+    generators are merged with a heap, and the window is loaded a chunk at a time
+    (1, 2, 4, then 7 days) so the search stops as soon as enough slots are found.
+    """
+    barber_query = select(Barber.id, Barber.name).where(Barber.is_active == True)
+    if shop_id is not None:
+        barber_query = barber_query.where(Barber.shop_id == shop_id)
+    barber_names = dict(db.execute(barber_query).all())
+    if not barber_names:
+        return []
+
+    if service_names:
+        durations = {
+            barber_id: sum(duration for _, duration, _ in services)
+            for barber_id, services in get_matching_services(db, list(barber_names), service_names).items()
+        }
+    else:
+        durations = dict.fromkeys(barber_names, duration_minutes)
+    if not durations:
+        return []
+
+    longest = timedelta(minutes=max(durations.values()))
+    shop_ids = [shop_id] if shop_id is not None else None
+    results = []
+    chunk_start, chunk_days = start, 1
+    while chunk_start < end and len(results) < limit:
+        chunk_end = min(end, datetime.combine(chunk_start.date() + timedelta(days=chunk_days), time()))
+        # Slots starting near the chunk end may run past it, so load a little further
+        busy = get_unavailable_intervals(db, list(durations), chunk_start, chunk_end + longest, shop_ids=shop_ids)
+        generators = [
+            _free_slot_starts(barber_id, _merge_intervals(busy.get(barber_id, [])), chunk_start, chunk_end, duration)
+            for barber_id, duration in durations.items()
+        ]
+        results.extend(islice(heapq.merge(*generators), limit - len(results)))
+        chunk_start, chunk_days = chunk_end, min(chunk_days * 2, 7)
+
+    return [
+        {
+            "barber_id": barber_id,
+            "barber_name": barber_names[barber_id],
+            "datetime": slot.isoformat(),
+            "date": slot.date().isoformat(),
+            "time": slot.strftime("%H:%M"),
+            "duration_minutes": durations[barber_id],
+        }
+        for slot, barber_id in results
+    ]
+
+def _group_candidates(db: Session, service_names: List[str], shop_id: Optional[int], barber_ids: Optional[List[int]] = None) -> Tuple[Dict[int, tuple], Dict[int, List[Tuple[int, int, float]]]]:
+    """Active barbers offering every named service: ({barber_id: (name, shop_id)}, {barber_id: services})"""
+    barber_query = select(Barber.id, Barber.name, Barber.shop_id).where(Barber.is_active == True)
+    if shop_id is not None:
+        barber_query = barber_query.where(Barber.shop_id == shop_id)
+    if barber_ids is not None:
+        barber_query = barber_query.where(Barber.id.in_(barber_ids))
+    barbers = {barber_id: (name, barber_shop) for barber_id, name, barber_shop in db.execute(barber_query.order_by(Barber.id))}
+    if not barbers:
+        return {}, {}
+    services = get_matching_services(db, list(barbers), service_names)
+    return {barber_id: barbers[barber_id] for barber_id in services}, services
+
+def get_group_availability(db: Session, party_size: int, start: datetime, end: datetime, service_names: List[str], limit: int = 5, shop_id: Optional[int] = None) -> List[dict]:
+    """
+    The `limit` earliest starts in [start, end) where at least `party_size` barbers of
+    one shop, each offering all `service_names`, are free for their own booking length.
+
+    Every barber's free grid slots come from a generator over their merged busy blocks;
+    the generators are merged into one time-ordered stream and swept slot by slot,
+    counting free barbers per shop. Windows are loaded in chunks as in next-available.
+    """
+    barbers, services = _group_candidates(db, service_names, shop_id)
+    durations = {barber_id: sum(duration for _, duration, _ in rows) for barber_id, rows in services.items()}
+    if len(durations) < party_size:
+        return []
+
+    longest = timedelta(minutes=max(durations.values()))
+    results = []
+    chunk_start, chunk_days = start, 1
+    while chunk_start < end and len(results) < limit:
+        chunk_end = min(end, datetime.combine(chunk_start.date() + timedelta(days=chunk_days), time()))
+        busy = get_unavailable_intervals(db, list(durations), chunk_start, chunk_end + longest)
+        generators = [
+            _free_slot_starts(barber_id, _merge_intervals(busy.get(barber_id, [])), chunk_start, chunk_end, duration)
+            for barber_id, duration in durations.items()
+        ]
+        for slot, free in groupby(heapq.merge(*generators), key=lambda item: item[0]):
+            per_shop = defaultdict(list)
+            for _, barber_id in free:
+                per_shop[barbers[barber_id][1]].append(barber_id)
+            for group_shop, free_ids in sorted(per_shop.items()):
+                if len(free_ids) >= party_size:
+                    results.append((slot, group_shop, sorted(free_ids)))
+            if len(results) >= limit:
+                break
+        chunk_start, chunk_days = chunk_end, min(chunk_days * 2, 7)
+
+    return [
+        {
+            "datetime": slot.isoformat(),
+            "date": slot.date().isoformat(),
+            "time": slot.strftime("%H:%M"),
+            "shop_id": group_shop,
+            "barbers": [
+                {"barber_id": barber_id, "barber_name": barbers[barber_id][0], "duration_minutes": durations[barber_id]}
+                for barber_id in free_ids
+            ],
+        }
+        for slot, group_shop, free_ids in results[:limit]
+    ]
+
+def create_group_booking(db: Session, booking: schemas.GroupBookingCreate) -> Tuple[List[Appointment], List[int]]:
+    """
+    Book `party_size` barbers of one shop at the same start, all or nothing.
+
+    Candidates are booking.barber_ids (in that order) or every barber of the shop
+    offering the services; the first free ones are taken, checked against bookings and
+    holds from one range query. Returns (appointments, booked barber ids), or
+    ([], free barber ids) when too few are free.
+    """
+    start = booking.appointment_datetime.replace(tzinfo=None)
+    barbers, services = _group_candidates(db, booking.service_names, booking.shop_id, booking.barber_ids)
+    order = [barber_id for barber_id in (booking.barber_ids or sorted(barbers)) if barber_id in barbers]
+    if not order:
+        return [], []
+
+    longest = timedelta(minutes=max(sum(duration for _, duration, _ in services[barber_id]) for barber_id in order))
+    busy = get_unavailable_intervals(db, order, start, start + longest)
+    free = []
+    for barber_id in order:
+        end = start + timedelta(minutes=sum(duration for _, duration, _ in services[barber_id]))
+        if datetime.combine(start.date(), WORK_START) <= start and end <= datetime.combine(start.date(), WORK_END) \
+                and not any(busy_start < end and busy_end > start for busy_start, busy_end, _ in busy.get(barber_id, [])):
+            free.append(barber_id)
+    # The whole party is served in one shop
+    per_shop = defaultdict(list)
+    for barber_id in free:
+        per_shop[barbers[barber_id][1]].append(barber_id)
+    chosen = next((ids[:booking.party_size] for ids in per_shop.values() if len(ids) >= booking.party_size), None)
+    if chosen is None:
+        return [], free
+
+    client = booking.dict(include={"client_name", "client_email", "client_phone", "notes"})
+    appointments = _insert_bookings(db, [
+        {**client, "barber_id": barber_id, "shop_id": barbers[barber_id][1], "start": start, "services": services[barber_id]}
+        for barber_id in chosen
+    ])
+    return appointments, chosen
+
+# Slot holds
+_last_hold_sweep = 0.0
+
+def get_held_intervals(db: Session, barber_ids: List[int], start: datetime, end: datetime) -> Dict[int, List[Tuple[datetime, datetime, None]]]:
+    """Unexpired holds overlapping [start, end), in the get_busy_intervals shape (id is None)"""
+    intervals = defaultdict(list)
+    for barber_id, hold_start, hold_end in db.execute(
+        select(SlotHold.barber_id, SlotHold.start_datetime, SlotHold.end_datetime)
+        .where(
+            SlotHold.barber_id.in_(barber_ids),
+            SlotHold.start_datetime < end,
+            SlotHold.start_datetime >= start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+            SlotHold.expires_at > datetime.utcnow(),
+        )
+        .order_by(SlotHold.start_datetime)
+    ):
+        if hold_end > start:
+            intervals[barber_id].append((hold_start, hold_end, None))
+    return intervals
+
+def get_unavailable_intervals(db: Session, barber_ids: List[int], start: datetime, end: datetime, shop_ids: Optional[List[int]] = None) -> Dict[int, List[Tuple[datetime, datetime, Optional[int]]]]:
+    """Confirmed bookings plus active holds, sorted by start per barber"""
+    busy = get_busy_intervals(db, barber_ids, start, end, shop_ids=shop_ids)
+    for barber_id, held in get_held_intervals(db, barber_ids, start, end).items():
+        busy[barber_id] = sorted(busy.get(barber_id, []) + held, key=lambda interval: interval[0])
+    return busy
+
+def get_active_hold(db: Session, token: str) -> Optional[SlotHold]:
+    return db.query(SlotHold).filter(SlotHold.token == token, SlotHold.expires_at > datetime.utcnow()).first()
+
+def create_slot_hold(db: Session, barber_id: int, shop_id: int, start: datetime, duration_minutes: int) -> Optional[SlotHold]:
+    """Hold a slot for settings.slot_hold_ttl seconds; None when it is booked or held already"""
+    sweep_expired_holds(db)
+    if check_appointment_conflict(db, barber_id, start, duration_minutes, shop_id=shop_id):
+        return None
+    end = start + timedelta(minutes=duration_minutes)
+    db_hold = SlotHold(
+        token=str(uuid.uuid4()),
+        shop_id=shop_id,
+        barber_id=barber_id,
+        start_datetime=start,
+        end_datetime=end,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.slot_hold_ttl),
+    )
+    db.add(db_hold)
+    db.commit()
+    db.refresh(db_hold)
+    cache.invalidate_availability([barber_id])
+    events.publish_slot_change("taken", barber_id, start, end)
+    return db_hold
+
+def release_slot_hold(db: Session, token: str) -> bool:
+    db_hold = get_active_hold(db, token)
+    if not db_hold:
+        return False
+    barber_id, start, end = db_hold.barber_id, db_hold.start_datetime, db_hold.end_datetime
+    db.delete(db_hold)
+    db.commit()
+    cache.invalidate_availability([barber_id])
+    events.publish_slot_change("freed", barber_id, start, end)
+    return True
+
+def sweep_expired_holds(db: Session, force: bool = False) -> int:
+    """
+    Delete expired holds through the expires_at index, at most once per
+    settings.hold_sweep_interval unless forced. Reads already ignore expired holds;
+    the sweep keeps the table small and tells live clients the time is free again.
+    """
+    global _last_hold_sweep
+    now = time_module.monotonic()
+    if not force and now - _last_hold_sweep < settings.hold_sweep_interval:
+        return 0
+    _last_hold_sweep = now
+
+    expired = db.execute(
+        select(SlotHold.id, SlotHold.barber_id, SlotHold.start_datetime, SlotHold.end_datetime)
+        .where(SlotHold.expires_at <= datetime.utcnow())
+    ).all()
+    if not expired:
+        return 0
+    db.execute(delete(SlotHold).where(SlotHold.id.in_([hold.id for hold in expired])))
+    db.commit()
+    cache.invalidate_availability({hold.barber_id for hold in expired})
+    for hold in expired:
+        events.publish_slot_change("freed", hold.barber_id, hold.start_datetime, hold.end_datetime)
+    return len(expired)
+
+# Idempotency keys
+_last_idempotency_purge = 0.0
+
+def get_idempotency_key(db: Session, scope: str, key: str) -> Optional[IdempotencyKey]:
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > datetime.utcnow(),
+    ).first()
+
+def claim_idempotency_key(db: Session, scope: str, key: str, request_hash: str) -> bool:
+    """
+    Insert an in-progress record for the key. Returns False when another request
+    holds it already (finished or still running); the primary key makes this safe
+    across workers.
+    """
+    purge_expired_idempotency_keys(db)
+    now = datetime.utcnow()
+    db.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.expires_at <= now
+    ))
+    db.add(IdempotencyKey(
+        scope=scope,
+        key=key,
+        request_hash=request_hash,
+        expires_at=now + timedelta(seconds=settings.idempotency_lock_seconds),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def complete_idempotency_key(db: Session, scope: str, key: str, status_code: int, response_body: str) -> None:
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(
+            status_code=status_code,
+            response_body=response_body,
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl),
+        )
+    )
+    db.commit()
+
+def release_idempotency_key(db: Session, scope: str, key: str) -> None:
+    """Forget an in-progress key after a failure, so the client's retry runs again"""
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key))
+    db.commit()
+
+def purge_expired_idempotency_keys(db: Session, force: bool = False) -> int:
+    """Delete expired keys through the expires_at index, at most once a minute unless forced"""
+    global _last_idempotency_purge
+    now = time_module.monotonic()
+    if not force and now - _last_idempotency_purge < 60:
+        return 0
+    _last_idempotency_purge = now
+    deleted = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())).rowcount
+    db.commit()
+    return deleted
+
+# Waitlist
+def create_waitlist_entry(db: Session, entry: WaitlistEntryCreate, shop_id: int) -> WaitlistEntry:
+    """Store a waitlist entry with one index row per day of its window"""
+    db_entry = WaitlistEntry(**entry.dict(exclude={'shop_id'}), shop_id=shop_id)
+    db_entry.status = "waiting"
+    db_entry.token = str(uuid.uuid4())
+    day = entry.earliest.date()
+    while day <= entry.latest.date():
+        db_entry.days.append(WaitlistDay(day=day, shop_id=shop_id, barber_id=entry.barber_id))
+        day += timedelta(days=1)
+    db.add(db_entry)
+    db.commit()
+    db.refresh(db_entry)
+    return db_entry
+
+def get_waitlist_entry_by_token(db: Session, token: str) -> Optional[WaitlistEntry]:
+    return db.query(WaitlistEntry).filter(WaitlistEntry.token == token).first()
+
+def get_waitlist_entries(db: Session, skip: int = 0, limit: int = 100, status: Optional[str] = None, shop_id: Optional[int] = None) -> List[WaitlistEntry]:
+    query = db.query(WaitlistEntry)
+    if shop_id is not None:
+        query = query.filter(WaitlistEntry.shop_id == shop_id)
+    if status:
+        query = query.filter(WaitlistEntry.status == status)
+    return query.order_by(WaitlistEntry.id.desc()).offset(skip).limit(limit).all()
+
+def remove_waitlist_entry(db: Session, token: str) -> Optional[WaitlistEntry]:
+    """Take an entry off the waitlist; its day rows are dropped so matching never sees it again"""
+    db_entry = get_waitlist_entry_by_token(db, token)
+    if db_entry and db_entry.status != "removed":
+        db_entry.status = "removed"
+        db_entry.days = []
+        db.commit()
+        db.refresh(db_entry)
+        return db_entry
+    return None
+
+def _free_gaps(db: Session, barber_id: int, shop_id: int, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Free stretches of the barber's working day that overlap [start, end)"""
+    day_start = datetime.combine(start.date(), WORK_START)
+    day_end = datetime.combine(start.date(), WORK_END)
+    busy = get_unavailable_intervals(db, [barber_id], day_start, day_end, shop_ids=[shop_id]).get(barber_id, [])
+    gaps, cursor = [], day_start
+    for busy_start, busy_end in _merge_intervals(busy) + [(day_end, day_end)]:
+        if busy_start > cursor and busy_start > start and cursor < end:
+            gaps.append((cursor, min(busy_start, day_end)))
+        cursor = max(cursor, busy_end)
+    return gaps
+
+def match_waitlist(db: Session, barber_id: int, shop_id: int, start: datetime, end: datetime, limit: int = 3) -> List[Tuple[WaitlistEntry, datetime]]:
+    """
+    Waiting entries that fit the free time around a freed interval, oldest first,
+    as (entry, offered slot start). Candidates come from the (barber, day) and
+    (shop, day) indexes; the exact fit is checked per candidate.
+    """
+    gaps = _free_gaps(db, barber_id, shop_id, start, end)
+    if not gaps:
+        return []
+    day = start.date()
+    longest = max(int((gap_end - gap_start).total_seconds() // 60) for gap_start, gap_end in gaps)
+    candidates = (
+        db.query(WaitlistEntry)
+        .join(WaitlistDay, WaitlistDay.entry_id == WaitlistEntry.id)
+        .filter(
+            WaitlistDay.day == day,
+            or_(
+                WaitlistDay.barber_id == barber_id,
+                and_(WaitlistDay.barber_id.is_(None), WaitlistDay.shop_id == shop_id),
+            ),
+            WaitlistEntry.status == "waiting",
+            WaitlistEntry.duration_minutes <= longest,
+            WaitlistEntry.earliest < gaps[-1][1],
+            WaitlistEntry.latest > gaps[0][0],
+        )
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+    )
+
+    step = timedelta(minutes=SLOT_INTERVAL_MINUTES)
+    day_start = datetime.combine(day, WORK_START)
+    now = datetime.now()
+    matches = []
+    for entry in candidates:
+        length = timedelta(minutes=entry.duration_minutes)
+        for gap_start, gap_end in gaps:
+            # First grid slot inside both the gap and the client's window
+            earliest = max(gap_start, entry.earliest, now)
+            slot = day_start + step * -(-(earliest - day_start) // step)
+            if slot + length <= min(gap_end, entry.latest):
+                matches.append((entry, slot))
+                break
+        if len(matches) >= limit:
+            break
+    return matches
+
+def offer_freed_slot(db: Session, barber_id: int, shop_id: int, start: datetime, end: datetime) -> int:
+    """Notify matching waitlisted clients about a freed interval; returns the number notified"""
+    matches = match_waitlist(db, barber_id, shop_id, start, end, limit=settings.waitlist_offers_per_slot)
+    if not matches:
+        return 0
+    notified_at = datetime.utcnow()
+    for entry, _ in matches:
+        entry.status = "notified"
+        entry.notified_at = notified_at
+    db.commit()
+
+    barber_name = db.query(Barber.name).filter(Barber.id == barber_id).scalar()
+    for entry, slot in matches:
+        notifications.queue_waitlist_offer({
+            'client_name': entry.client_name,
+            'client_email': entry.client_email,
+            'barber_name': barber_name,
+            'appointment_datetime': slot.strftime('%Y-%m-%d %H:%M'),
+            'duration_minutes': entry.duration_minutes,
+            'booking_url': f"{settings.frontend_url}/book",
+        })
+    return len(matches)
+
+def bulk_import_appointments(db: Session, rows: List[Tuple[int, AppointmentImportRow]], atomic: bool = False, dry_run: bool = False) -> Tuple[List[int], Dict[int, List[str]]]:
+    """
+    Validate and insert many appointments in one transaction.
+
+    `rows` are (row_number, row) pairs. Services and barbers are validated with one
+    query each, conflicts are detected against existing bookings, active holds and within
+    the batch by a sort-and-sweep per barber. Returns (created appointment ids, {row_number: errors}).
+    """
+    errors = defaultdict(list)
+
+    # Times are shop-local wall clock, like single bookings: an offset is dropped, not converted
+    rows = [
+        (row_number, row.model_copy(update={"appointment_datetime": row.appointment_datetime.replace(tzinfo=None)}))
+        for row_number, row in rows
+    ]
+
+    barber_ids = {row.barber_id for _, row in rows}
+    service_ids = {service_id for _, row in rows for service_id in row.service_ids}
+    barber_shops = dict(db.execute(
+        select(Barber.id, Barber.shop_id).where(Barber.id.in_(barber_ids), Barber.is_active == True)
+    ).all()) if barber_ids else {}
+    services = {
+        service.id: service for service in db.execute(
+            select(Service.id, Service.barber_id, Service.duration_minutes, Service.price, Service.is_active).where(Service.id.in_(service_ids))
+        )
+    } if service_ids else {}
+
+    # Per-row validation; collect the intervals that still need a conflict check
+    durations = {}
+    for row_number, row in rows:
+        if row.barber_id not in barber_shops:
+            errors[row_number].append(f"Barber {row.barber_id} not found")
+        if not row.service_ids:
+            errors[row_number].append("At least one service must be selected")
+        for service_id in row.service_ids:
+            service = services.get(service_id)
+            if not service or not service.is_active:
+                errors[row_number].append(f"Service {service_id} not found")
+            elif service.barber_id != row.barber_id:
+                errors[row_number].append(f"Service {service_id} does not belong to this barber")
+        if row.status not in ("confirmed", "cancelled"):
+            errors[row_number].append(f"Unsupported status '{row.status}'")
+        if row_number not in errors:
+            # A service listed twice is linked (and counted in the stats) once
+            durations[row_number] = sum(services[service_id].duration_minutes for service_id in dict.fromkeys(row.service_ids))
+
+    candidates = defaultdict(list)
+    for row_number, row in rows:
+        if row_number in durations and row.status == "confirmed":
+            start = row.appointment_datetime
+            candidates[row.barber_id].append((start, start + timedelta(minutes=durations[row_number]), row_number))
+
+    if candidates:
+        window_start = min(start for items in candidates.values() for start, _, _ in items)
+        window_end = max(end for items in candidates.values() for _, end, _ in items)
+        existing = get_unavailable_intervals(
+            db, list(candidates), window_start, window_end,
+            shop_ids=list({barber_shops[barber_id] for barber_id in candidates}),
+        )
+
+        for barber_id, items in candidates.items():
+            booked = existing.get(barber_id, [])
+            starts = [start for start, _, _ in booked]
+            max_ends = []
+            for _, end, _ in booked:
+                max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+            # Sweep the batch in start order; earlier rows win overlaps within the batch
+            accepted_end, accepted_row = None, None
+            for start, end, row_number in sorted(items):
+                index = bisect_left(starts, end) - 1
+                if index >= 0 and max_ends[index] > start:
+                    # Holds carry no appointment id
+                    conflict_id = _overlapping_interval(booked, max_ends, starts, start, end)
+                    errors[row_number].append(
+                        f"Conflicts with existing appointment {conflict_id}" if conflict_id else "Slot is being held by another client"
+                    )
+                elif accepted_end is not None and start < accepted_end:
+                    errors[row_number].append(f"Overlaps row {accepted_row}")
+                else:
+                    accepted_end, accepted_row = end, row_number
+
+    valid_rows = [(row_number, row) for row_number, row in rows if row_number not in errors]
+    if dry_run or not valid_rows or (atomic and errors):
+        return [], dict(errors)
+
+    now = datetime.utcnow()
+    appointment_rows = [
+        {
+            "shop_id": barber_shops[row.barber_id],
+            "barber_id": row.barber_id,
+            "client_name": row.client_name,
+            "client_email": row.client_email,
+            "client_phone": row.client_phone,
+            "appointment_datetime": row.appointment_datetime,
+            "notes": row.notes,
+            "status": row.status,
+            "cancellation_token": str(uuid.uuid4()),
+            "confirmed_at": now if row.status == "confirmed" else None,
+            "booked_minutes": durations[row_number],
+            "booked_price": sum(services[service_id].price for service_id in dict.fromkeys(row.service_ids)),
+        }
+        for row_number, row in valid_rows
+    ]
+    try:
+        created_ids = list(db.scalars(
+            insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+            appointment_rows,
+        ))
+        db.execute(insert(appointment_services), [
+            {"appointment_id": appointment_id, "service_id": service_id}
+            for appointment_id, (_, row) in zip(created_ids, valid_rows)
+            for service_id in dict.fromkeys(row.service_ids)
+        ])
+        deltas = _new_stats_deltas()
+        for row in appointment_rows:
+            _add_stats(deltas, row["barber_id"], row["shop_id"], row["appointment_datetime"], row["status"], row["booked_minutes"], row["booked_price"])
+        _apply_stats_deltas(db, deltas)
+        _bump_schedule_version(db, {row.barber_id for _, row in valid_rows})
+        changes.record(db, changes.APPOINTMENT, "created", [
+            (appointment_id, barber_shops[row.barber_id]) for appointment_id, (_, row) in zip(created_ids, valid_rows)
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    cache.invalidate_availability({row.barber_id for _, row in valid_rows})
+    for appointment_id, (row_number, row) in zip(created_ids, valid_rows):
+        if row.status == "confirmed":
+            start = row.appointment_datetime
+            events.publish_slot_change("taken", row.barber_id, start, start + timedelta(minutes=durations[row_number]), appointment_id)
+    return created_ids, dict(errors)
+
+SERIES_INTERVALS = {"weekly": timedelta(weeks=1), "biweekly": timedelta(weeks=2)}
+
+def expand_series(first: datetime, frequency: str, occurrences: Optional[int] = None, until: Optional[date] = None, limit: int = 52) -> List[datetime]:
+    """Occurrence start times: `occurrences` of them, or every one up to and including `until`, at most `limit`"""
+    step = SERIES_INTERVALS[frequency]
+    count = limit if occurrences is None else min(occurrences, limit)
+    starts = []
+    current = first
+    while len(starts) < count and (until is None or current.date() <= until):
+        starts.append(current)
+        current += step
+    return starts
+
+def create_appointment_series(db: Session, appointment: AppointmentCreate, starts: List[datetime], services: List[Service], atomic: bool = False) -> Tuple[List[Appointment], List[Tuple[datetime, str]]]:
+    """
+    Book one appointment per start time in a single transaction.
+
+    Every occurrence is checked against the barber's bookings and holds loaded with
+    one range query, sweeping both lists in start order. Conflicting occurrences are
+    skipped (or, when atomic, nothing is booked). Returns (booked, [(start, reason)]).
+    """
+    duration = timedelta(minutes=sum(service.duration_minutes for service in services))
+    price = sum(service.price for service in services)
+    shop_id = db.query(Barber.shop_id).filter(Barber.id == appointment.barber_id).scalar()
+
+    busy = get_unavailable_intervals(
+        db, [appointment.barber_id], starts[0], starts[-1] + duration, shop_ids=[shop_id]
+    ).get(appointment.barber_id, [])
+    busy_starts = [start for start, _, _ in busy]
+    max_ends = []
+    for _, end, _ in busy:
+        max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    accepted, conflicts = [], []
+    for start in starts:
+        index = bisect_left(busy_starts, start + duration) - 1
+        if index >= 0 and max_ends[index] > start:
+            # Holds carry no appointment id
+            conflict_id = _overlapping_interval(busy, max_ends, busy_starts, start, start + duration)
+            conflicts.append((start, f"Conflicts with existing appointment {conflict_id}" if conflict_id else "Slot is being held by another client"))
+        else:
+            accepted.append(start)
+
+    if not accepted or (atomic and conflicts):
+        return [], conflicts
+
+    client = appointment.dict(include={"client_name", "client_email", "client_phone", "notes"})
+    service_rows = [(service.id, service.duration_minutes, service.price) for service in services]
+    booked = _insert_bookings(db, [
+        {**client, "barber_id": appointment.barber_id, "shop_id": shop_id, "start": start, "services": service_rows}
+        for start in accepted
+    ])
+    return booked, conflicts
+
+def _insert_bookings(db: Session, bookings: List[dict]) -> List[Appointment]:
+    """
+    Insert confirmed appointments in one transaction, with their service links, stats
+    and schedule versions; then invalidate availability and publish the taken slots.
+    Each booking has the client fields, barber_id, shop_id, start and services as
+    (id, duration_minutes, price) tuples. Returns the appointments in booking order.
+    """
+    now = datetime.utcnow()
+    appointment_rows = [
+        {
+            "shop_id": booking["shop_id"],
+            "barber_id": booking["barber_id"],
+            "client_name": booking["client_name"],
+            "client_email": booking["client_email"],
+            "client_phone": booking["client_phone"],
+            "notes": booking.get("notes"),
+            "appointment_datetime": booking["start"],
+            "status": "confirmed",
+            "cancellation_token": str(uuid.uuid4()),
+            "confirmed_at": now,
+            "booked_minutes": sum(duration for _, duration, _ in booking["services"]),
+            "booked_price": sum(price for _, _, price in booking["services"]),
+        }
+        for booking in bookings
+    ]
+    try:
+        created_ids = list(db.scalars(
+            insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+            appointment_rows,
+        ))
+        db.execute(insert(appointment_services), [
+            {"appointment_id": appointment_id, "service_id": service_id}
+            for appointment_id, booking in zip(created_ids, bookings)
+            for service_id, _, _ in booking["services"]
+        ])
+        deltas = _new_stats_deltas()
+        for row in appointment_rows:
+            _add_stats(deltas, row["barber_id"], row["shop_id"], row["appointment_datetime"], "confirmed", row["booked_minutes"], row["booked_price"])
+        _apply_stats_deltas(db, deltas)
+        _bump_schedule_version(db, {booking["barber_id"] for booking in bookings})
+        changes.record(db, changes.APPOINTMENT, "created", [
+            (appointment_id, booking["shop_id"]) for appointment_id, booking in zip(created_ids, bookings)
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    cache.invalidate_availability({booking["barber_id"] for booking in bookings})
+    for appointment_id, booking in zip(created_ids, bookings):
+        duration = sum(duration for _, duration, _ in booking["services"])
+        events.publish_slot_change("taken", booking["barber_id"], booking["start"], booking["start"] + timedelta(minutes=duration), appointment_id)
+    appointments = {
+        appointment.id: appointment
+        for appointment in db.query(Appointment).filter(Appointment.id.in_(created_ids))
+    }
+    return [appointments[appointment_id] for appointment_id in created_ids]
+
+def bulk_update_catalog(db: Session, barber_updates: List[BarberBulkUpdate], service_updates: List[ServiceBulkUpdate]) -> Dict[str, List[int]]:
+    """
+    Apply many barber and service updates in one transaction.
+
+    Updates are merged per id and written as executemany UPDATEs, one statement per
+    distinct set of columns. Caches are invalidated once at the end. If any id is
+    unknown nothing is written and the missing ids are returned instead.
+    """
+    def merge(updates) -> Dict[int, dict]:
+        merged = defaultdict(dict)
+        for item in updates:
+            merged[item.id].update(item.dict(exclude_unset=True, exclude={"id"}))
+        return merged
+
+    barber_changes = merge(barber_updates)
+    service_changes = merge(service_updates)
+
+    # Same visibility rules as the single-row updates: only active barbers, any service
+    found_barbers = {
+        barber_id for (barber_id,) in db.execute(
+            select(Barber.id).where(Barber.id.in_(barber_changes), Barber.is_active == True)
+        )
+    } if barber_changes else set()
+    # Only an explicit shop move counts; a null shop_id leaves the barber where it is
+    for fields in barber_changes.values():
+        if "shop_id" in fields and fields["shop_id"] is None:
+            del fields["shop_id"]
+    moved_barbers = {barber_id: fields["shop_id"] for barber_id, fields in barber_changes.items() if "shop_id" in fields}
+    target_shops = set(moved_barbers.values())
+    found_shops = {
+        shop_id for (shop_id,) in db.execute(select(Shop.id).where(Shop.id.in_(target_shops)))
+    } if target_shops else set()
+    service_barbers = dict(db.execute(
+        select(Service.id, Service.barber_id).where(Service.id.in_(service_changes))
+    ).all()) if service_changes else {}
+
+    missing_barbers = sorted(set(barber_changes) - found_barbers)
+    missing_services = sorted(set(service_changes) - set(service_barbers))
+    missing_shops = sorted(target_shops - found_shops)
+    if missing_barbers or missing_services or missing_shops:
+        return {"missing_barber_ids": missing_barbers, "missing_service_ids": missing_services, "missing_shop_ids": missing_shops}
+
+    def write(model, changes: Dict[int, dict]) -> None:
+        groups = defaultdict(list)
+        for row_id, fields in changes.items():
+            if fields:
+                groups[tuple(sorted(fields))].append({"id": row_id, **fields})
+        for rows in groups.values():
+            db.execute(update(model), rows)
+
+    # Calendar feeds show barber names, service names and end times of existing bookings
+    feed_barbers = {barber_id for barber_id, fields in barber_changes.items() if "name" in fields}
+    feed_barbers.update(
+        service_barbers[service_id] for service_id, fields in service_changes.items()
+        if "name" in fields or "duration_minutes" in fields
+    )
+
+    try:
+        write(Barber, barber_changes)
+        write(Service, service_changes)
+        for barber_id, shop_id in moved_barbers.items():
+            _move_barber_rows(db, barber_id, shop_id)
+        if feed_barbers:
+            _bump_schedule_version(db, feed_barbers)
+        if barber_changes:
+            changes.record_from(db, changes.BARBER, "updated", Barber, Barber.id.in_(list(barber_changes)))
+        if service_changes:
+            changes.record_from(db, changes.SERVICE, "updated", Service, Service.id.in_(list(service_changes)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    cache.invalidate_catalog()
+    cache.invalidate_availability({
+        service_barbers[service_id] for service_id, fields in service_changes.items() if "duration_minutes" in fields
+    })
+    return {"updated_barber_ids": sorted(barber_changes), "updated_service_ids": sorted(service_changes)}
+
+CHANGE_ENTITIES = {
+    changes.APPOINTMENT: (Appointment, APPOINTMENT_FIELDS),
+    changes.BARBER: (Barber, BARBER_FIELDS),
+    changes.SERVICE: (Service, SERVICE_FIELDS),
+}
+
+def get_changes(db: Session, since: int = 0, limit: int = 500, shop_id: Optional[int] = None, include_data: bool = True) -> dict:
+    """
+    The change log after the `since` cursor, compacted to the latest change per entity.
+    With include_data, each change carries the entity's current row (None once it is gone),
+    loaded with one query per entity type; appointments also get their service_ids.
+    """
+    query = select(
+        ChangeLogEntry.id, ChangeLogEntry.entity, ChangeLogEntry.entity_id,
+        ChangeLogEntry.action, ChangeLogEntry.shop_id, ChangeLogEntry.changed_at,
+    ).where(ChangeLogEntry.id > since)
+    if shop_id is not None:
+        query = query.where(ChangeLogEntry.shop_id == shop_id)
+    if settings.change_feed_delay_seconds:
+        query = query.where(ChangeLogEntry.changed_at <= datetime.utcnow() - timedelta(seconds=settings.change_feed_delay_seconds))
+    rows = db.execute(query.order_by(ChangeLogEntry.id).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # A later change supersedes earlier ones: consumers only need the final state
+    latest = {}
+    for row in rows:
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row
+
+    current = {}
+    if include_data:
+        for entity, (model, fields) in CHANGE_ENTITIES.items():
+            ids = [entity_id for kind, entity_id in latest if kind == entity]
+            if not ids:
+                continue
+            for data in db.execute(select(*_columns(model, fields)).where(model.id.in_(ids))).mappings():
+                current[(entity, data["id"])] = dict(data)
+        service_ids = defaultdict(list)
+        appointment_ids = [entity_id for kind, entity_id in latest if kind == changes.APPOINTMENT]
+        if appointment_ids:
+            for appointment_id, service_id in db.execute(
+                select(appointment_services.c.appointment_id, appointment_services.c.service_id)
+                .where(appointment_services.c.appointment_id.in_(appointment_ids))
+            ):
+                service_ids[appointment_id].append(service_id)
+        for (kind, entity_id), data in current.items():
+            if kind == changes.APPOINTMENT:
+                data["service_ids"] = sorted(service_ids[entity_id])
+
+    return {
+        "changes": [
+            {
+                "cursor": row.id,
+                "entity": row.entity,
+                "id": row.entity_id,
+                "action": row.action,
+                "shop_id": row.shop_id,
+                "changed_at": row.changed_at,
+                "data": current.get(key),
+            }
+            for key, row in latest.items()
+        ],
+        "next_cursor": rows[-1].id if rows else since,
+        "has_more": has_more,
+    }
+
+# One span per public crud call while a request is traced (see app/tracing.py)
+if settings.tracing_enabled:
+    tracing.instrument(globals(), __name__)
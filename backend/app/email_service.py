@@ -2,10 +2,11 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from jinja2 import Template
-from typing import Optional
+from typing import Optional, Tuple
 import logging
 
 from app.config import settings
+from app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +17,9 @@ class EmailService:
         self.smtp_user = settings.smtp_user
         self.smtp_password = settings.smtp_password
         self.from_email = settings.from_email
+        self.smtp_use_tls = settings.smtp_use_tls
 
+    @traced("smtp.send")
     def send_email(self, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bool:
         """Send an email using SMTP"""
         try:
@@ -37,8 +40,11 @@ class EmailService:
 
             # Send email
             with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+                if self.smtp_use_tls:
+                    server.starttls()
+                # Local relays and test sinks accept mail without authentication
+                if self.smtp_user:
+                    server.login(self.smtp_user, self.smtp_password)
                 server.send_message(msg)
 
             logger.info(f"Email sent successfully to {to_email}")
@@ -48,10 +54,9 @@ class EmailService:
             logger.error(f"Failed to send email to {to_email}: {str(e)}")
             return False
 
-    def send_booking_confirmation(self, appointment_data: dict) -> bool:
-        """Send booking confirmation email with cancellation link"""
-        cancellation_url = f"{settings.frontend_url}/cancel/{appointment_data['cancellation_token']}"
-        
+    @traced()
+    def render_booking_confirmation(self, appointment_data: dict) -> Tuple[str, str]:
+        """Render the booking confirmation email as (html, text)"""
         html_template = Template("""
         <!DOCTYPE html>
         <html>
@@ -150,6 +155,11 @@ class EmailService:
 
         html_content = html_template.render(**appointment_data)
         text_content = text_template.render(**appointment_data)
+        return html_content, text_content
+
+    def send_booking_confirmation(self, appointment_data: dict) -> bool:
+        """Send booking confirmation email with cancellation link"""
+        html_content, text_content = self.render_booking_confirmation(appointment_data)
 
         return self.send_email(
             to_email=appointment_data['client_email'],
@@ -158,8 +168,182 @@ class EmailService:
             text_content=text_content
         )
     
-    def send_cancellation_confirmation(self, appointment_data: dict) -> bool:
-        """Send email confirming appointment cancellation"""
+    @traced()
+    def render_series_confirmation(self, series_data: dict) -> Tuple[str, str]:
+        """Render the recurring series confirmation email as (html, text)"""
+        html_template = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Recurring Appointments Confirmed</title>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #2c3e50; color: white; padding: 20px; text-align: center; }
+                .content { padding: 20px; background-color: #f9f9f9; }
+                .appointment-details { background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }
+                .footer { text-align: center; padding: 20px; color: #666; font-size: 12px; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>💈 Barbershop Appointment</h1>
+                </div>
+                <div class="content">
+                    <h2>Hello {{ client_name }}!</h2>
+                    <p>Your recurring appointments have been confirmed! We look forward to seeing you.</p>
+                    
+                    <div class="appointment-details">
+                        <h3>Appointment Details:</h3>
+                        <p><strong>Barber:</strong> {{ barber_name }}</p>
+                        <p><strong>Service:</strong> {{ service_name }}</p>
+                        <p><strong>Duration:</strong> {{ duration_minutes }} minutes</p>
+                        <p><strong>Price:</strong> ${{ price }} per visit</p>
+                        {% if notes %}
+                        <p><strong>Notes:</strong> {{ notes }}</p>
+                        {% endif %}
+                        <h3>Dates:</h3>
+                        <ul>
+                        {% for occurrence in occurrences %}
+                            <li>{{ occurrence.appointment_datetime }} (<a href="{{ occurrence.cancellation_url }}">cancel</a>)</li>
+                        {% endfor %}
+                        </ul>
+                    </div>
+                    
+                    <p><strong>Need to cancel?</strong> Each appointment can be cancelled separately up to 2 hours before the scheduled time.</p>
+                </div>
+                <div class="footer">
+                    <p>If you didn't book these appointments, please contact us immediately.</p>
+                    <p>© 2024 Barbershop Appointment System</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+        text_template = Template("""
+        Barbershop Recurring Appointments Confirmed
+        
+        Hello {{ client_name }}!
+        
+        Your recurring appointments have been confirmed! We look forward to seeing you.
+        
+        Appointment Details:
+        - Barber: {{ barber_name }}
+        - Service: {{ service_name }}
+        - Duration: {{ duration_minutes }} minutes
+        - Price: ${{ price }} per visit
+        {% if notes %}- Notes: {{ notes }}{% endif %}
+        
+        Dates (cancel each one up to 2 hours before it starts):
+        {% for occurrence in occurrences %}- {{ occurrence.appointment_datetime }}: {{ occurrence.cancellation_url }}
+        {% endfor %}
+        If you didn't book these appointments, please contact us immediately.
+        """)
+
+        html_content = html_template.render(**series_data)
+        text_content = text_template.render(**series_data)
+        return html_content, text_content
+
+    def send_series_confirmation(self, series_data: dict) -> bool:
+        """Send one confirmation for every appointment of a recurring series"""
+        html_content, text_content = self.render_series_confirmation(series_data)
+
+        return self.send_email(
+            to_email=series_data['client_email'],
+            subject="Your Recurring Barbershop Appointments are Confirmed!",
+            html_content=html_content,
+            text_content=text_content
+        )
+    
+    @traced()
+    def render_group_confirmation(self, group_data: dict) -> Tuple[str, str]:
+        """Render the group booking confirmation email as (html, text)"""
+        html_template = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Group Appointment Confirmed</title>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #2c3e50; color: white; padding: 20px; text-align: center; }
+                .content { padding: 20px; background-color: #f9f9f9; }
+                .appointment-details { background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }
+                .footer { text-align: center; padding: 20px; color: #666; font-size: 12px; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>💈 Barbershop Appointment</h1>
+                </div>
+                <div class="content">
+                    <h2>Hello {{ client_name }}!</h2>
+                    <p>Your group appointment for {{ party_size }} on {{ appointment_datetime }} has been confirmed! We look forward to seeing you.</p>
+                    
+                    {% for member in members %}
+                    <div class="appointment-details">
+                        <p><strong>Barber:</strong> {{ member.barber_name }}</p>
+                        <p><strong>Service:</strong> {{ member.service_name }}</p>
+                        <p><strong>Duration:</strong> {{ member.duration_minutes }} minutes</p>
+                        <p><strong>Price:</strong> ${{ member.price }}</p>
+                        <p><a href="{{ member.cancellation_url }}">Cancel this appointment</a></p>
+                    </div>
+                    {% endfor %}
+                    {% if notes %}
+                    <p><strong>Notes:</strong> {{ notes }}</p>
+                    {% endif %}
+                    
+                    <p><strong>Need to cancel?</strong> Each appointment can be cancelled separately up to 2 hours before the scheduled time.</p>
+                </div>
+                <div class="footer">
+                    <p>If you didn't book these appointments, please contact us immediately.</p>
+                    <p>© 2024 Barbershop Appointment System</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+        text_template = Template("""
+        Barbershop Group Appointment Confirmed
+        
+        Hello {{ client_name }}!
+        
+        Your group appointment for {{ party_size }} on {{ appointment_datetime }} has been confirmed! We look forward to seeing you.
+        {% for member in members %}
+        - Barber: {{ member.barber_name }}, {{ member.service_name }} ({{ member.duration_minutes }} minutes, ${{ member.price }})
+          Cancel: {{ member.cancellation_url }}
+        {% endfor %}
+        {% if notes %}Notes: {{ notes }}{% endif %}
+        
+        Each appointment can be cancelled separately up to 2 hours before the scheduled time.
+        
+        If you didn't book these appointments, please contact us immediately.
+        """)
+
+        html_content = html_template.render(**group_data)
+        text_content = text_template.render(**group_data)
+        return html_content, text_content
+
+    def send_group_confirmation(self, group_data: dict) -> bool:
+        """Send one confirmation covering every appointment of a group booking"""
+        html_content, text_content = self.render_group_confirmation(group_data)
+
+        return self.send_email(
+            to_email=group_data['client_email'],
+            subject="Your Barbershop Group Appointment is Confirmed!",
+            html_content=html_content,
+            text_content=text_content
+        )
+    
+    @traced()
+    def render_cancellation_confirmation(self, appointment_data: dict) -> Tuple[str, str]:
+        """Render the cancellation confirmation email as (html, text)"""
         html_template = Template("""
         <!DOCTYPE html>
         <html>
@@ -228,6 +412,11 @@ class EmailService:
 
         html_content = html_template.render(**appointment_data)
         text_content = text_template.render(**appointment_data)
+        return html_content, text_content
+
+    def send_cancellation_confirmation(self, appointment_data: dict) -> bool:
+        """Send email confirming appointment cancellation"""
+        html_content, text_content = self.render_cancellation_confirmation(appointment_data)
 
         return self.send_email(
             to_email=appointment_data['client_email'],
@@ -236,5 +425,92 @@ class EmailService:
             text_content=text_content
         )
 
+    @traced()
+    def render_waitlist_offer(self, offer_data: dict) -> Tuple[str, str]:
+        """Render the waitlist slot offer email as (html, text)"""
+        html_template = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>A Slot Opened Up</title>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #2c3e50; color: white; padding: 20px; text-align: center; }
+                .content { padding: 20px; background-color: #f9f9f9; }
+                .appointment-details { background-color: white; padding: 15px; margin: 15px 0; border-radius: 5px; }
+                .book-button {
+                    display: inline-block;
+                    background-color: #27ae60;
+                    color: white;
+                    padding: 12px 24px;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    margin: 20px 0;
+                }
+                .footer { text-align: center; padding: 20px; color: #666; font-size: 12px; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>💈 Barbershop Appointment</h1>
+                </div>
+                <div class="content">
+                    <h2>Hello {{ client_name }}!</h2>
+                    <p>A slot matching your waitlist request has just opened up.</p>
+                    
+                    <div class="appointment-details">
+                        <h3>Available Slot:</h3>
+                        <p><strong>Barber:</strong> {{ barber_name }}</p>
+                        <p><strong>Date & Time:</strong> {{ appointment_datetime }}</p>
+                        <p><strong>Duration:</strong> {{ duration_minutes }} minutes</p>
+                    </div>
+                    
+                    <p>Slots are offered to several people on the waitlist, so book soon:</p>
+                    <div style="text-align: center;">
+                        <a href="{{ booking_url }}" class="book-button">Book Now</a>
+                    </div>
+                </div>
+                <div class="footer">
+                    <p>© 2024 Barbershop Appointment System</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+        text_template = Template("""
+        Barbershop Waitlist: A Slot Opened Up
+        
+        Hello {{ client_name }}!
+        
+        A slot matching your waitlist request has just opened up.
+        
+        Available Slot:
+        - Barber: {{ barber_name }}
+        - Date & Time: {{ appointment_datetime }}
+        - Duration: {{ duration_minutes }} minutes
+        
+        Slots are offered to several people on the waitlist, so book soon:
+        {{ booking_url }}
+        """)
+
+        html_content = html_template.render(**offer_data)
+        text_content = text_template.render(**offer_data)
+        return html_content, text_content
+
+    def send_waitlist_offer(self, offer_data: dict) -> bool:
+        """Tell a waitlisted client that a matching slot is free"""
+        html_content, text_content = self.render_waitlist_offer(offer_data)
+
+        return self.send_email(
+            to_email=offer_data['client_email'],
+            subject="A Barbershop Slot Opened Up",
+            html_content=html_content,
+            text_content=text_content
+        )
+
 # Create email service instance
 email_service = EmailService()
@@ -0,0 +1,145 @@
+"""
+Slot change events for live availability updates.
+
+crud publishes a delta after every committed booking change: "taken" when an
+interval of a barber's day becomes busy, "freed" when it is released. Events go
+to the channel of (barber, date), which the booking page follows over
+Server-Sent Events (GET /api/barbers/{id}/slot-events).
+
+The default broker fans events out inside this process. With several workers,
+set EVENT_BROKER to "package.module:factory" returning a Broker that relays
+through a shared bus (Redis pub/sub, Postgres LISTEN/NOTIFY, ...) and delivers
+to local subscribers; crud and the endpoint only use the Broker interface.
+"""
+import asyncio
+import importlib
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of the dropped events when a slow subscriber's queue overflows
+RESYNC = {"type": "resync"}
+
+
+def slot_channel(barber_id: int, day: date) -> str:
+    return f"slots:{barber_id}:{day.isoformat()}"
+
+
+class Subscription:
+    """One subscriber's queue, fed from any thread and read on its event loop"""
+
+    def __init__(self, broker: "Broker", channel: str, maxsize: int):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event: dict) -> None:
+        """Thread-safe: hand an event to the subscriber's loop"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # loop closed: the client went away
+            self.close()
+
+    def _put(self, event: dict) -> None:
+        if self.queue.full():
+            # The client will refetch the day anyway, so drop the backlog
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None when nothing arrived within the timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Publish/subscribe interface used by crud and the event stream endpoint"""
+
+    def subscribe(self, channel: str) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        raise NotImplementedError
+
+    def publish(self, channel: str, event: dict) -> None:
+        raise NotImplementedError
+
+
+class InProcessBroker(Broker):
+    """Fan-out to subscribers of this process; publish may be called from any thread"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel: str, event: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def subscriber_count(self, channel: Optional[str] = None) -> int:
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def _load_broker(spec: str) -> Broker:
+    if spec in ("", "memory"):
+        return InProcessBroker(settings.event_queue_size)
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+broker: Broker = _load_broker(settings.event_broker)
+
+
+def set_broker(new_broker: Broker) -> None:
+    global broker
+    broker = new_broker
+
+
+def publish_slot_change(kind: str, barber_id: int, start: datetime, end: datetime, appointment_id: Optional[int] = None) -> None:
+    """Publish a "taken" or "freed" interval; never lets a broker failure break the write"""
+    event = {
+        "type": kind,
+        "barber_id": barber_id,
+        "date": start.date().isoformat(),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "appointment_id": appointment_id,
+    }
+    try:
+        broker.publish(slot_channel(barber_id, start.date()), event)
+    except Exception as e:
+        logger.warning(f"Failed to publish slot event for barber {barber_id}: {e}")
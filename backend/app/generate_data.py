@@ -0,0 +1,294 @@
+"""
+Synthetic data generator for testing at scale.
+
+Creates realistic barbers, services and appointments (with service associations)
+using bulk inserts: batched Core executemany on SQLite and COPY on PostgreSQL.
+Primary keys are allocated up front so association rows never need a round trip.
+
+Usage:
+    python -m app.generate_data --barbers 1000 --services-per-barber 20 --appointments 5000000
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import date, datetime, time as dtime, timedelta
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Connection
+
+from app.crud import rebuild_daily_stats
+from app.database import SessionLocal, engine
+from app.init_db import init_db
+from app.models import Shop, Barber, Service, Appointment, appointment_services
+
+logger = logging.getLogger(__name__)
+
+FIRST_NAMES = ["Mike", "Sarah", "Tony", "Aisha", "Luca", "Mei", "Omar", "Elena", "Jamal", "Priya",
+               "Diego", "Hana", "Noah", "Zara", "Ivan", "Leila", "Kofi", "Anya", "Mateo", "Yuki"]
+LAST_NAMES = ["Johnson", "Williams", "Rodriguez", "Khan", "Rossi", "Chen", "Haddad", "Petrova", "Brooks",
+              "Patel", "Garcia", "Sato", "Miller", "Ahmed", "Novak", "Karimi", "Mensah", "Ivanova", "Silva", "Tanaka"]
+
+# (name, description, base price, duration in minutes)
+SERVICE_CATALOG = [
+    ("Classic Haircut", "Traditional men's haircut with styling", 25.0, 30),
+    ("Beard Trim", "Professional beard shaping and trimming", 15.0, 20),
+    ("Haircut + Beard Combo", "Complete grooming package", 35.0, 45),
+    ("Hot Towel Shave", "Traditional straight razor shave with hot towel", 30.0, 40),
+    ("Modern Cut & Style", "Contemporary haircut with modern styling", 30.0, 35),
+    ("Hair Wash & Cut", "Shampoo, cut, and blow dry", 35.0, 45),
+    ("Styling Only", "Hair styling without cutting", 20.0, 25),
+    ("Hair Treatment", "Deep conditioning and scalp treatment", 40.0, 50),
+    ("Fade Cut", "Professional fade haircut (low, mid, or high)", 28.0, 35),
+    ("Buzz Cut", "Clean, simple buzz cut", 18.0, 15),
+    ("Beard Design", "Creative beard shaping and design", 25.0, 30),
+    ("Full Service", "Haircut, beard trim, and hot towel treatment", 45.0, 60),
+    ("Kids Cut", "Haircut for children under 12", 15.0, 20),
+    ("Line Up", "Sharp edge-up of the hairline", 12.0, 15),
+    ("Grey Blending", "Subtle colour to blend grey hair", 38.0, 40),
+    ("Eyebrow Trim", "Eyebrow shaping and trim", 8.0, 10),
+]
+
+WORKING_HOURS = json.dumps({
+    "monday": "09:00-17:00",
+    "tuesday": "09:00-17:00",
+    "wednesday": "09:00-17:00",
+    "thursday": "09:00-17:00",
+    "friday": "09:00-17:00",
+    "saturday": "09:00-15:00",
+    "sunday": "closed"
+})
+
+WORK_START = dtime(9, 0)
+WORK_END = dtime(18, 0)
+
+APPOINTMENT_COLUMNS = ["id", "shop_id", "barber_id", "client_name", "client_email", "client_phone",
+                       "appointment_datetime", "status", "cancellation_token", "notes", "confirmed_at"]
+
+
+def _next_id(conn: Connection, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _write_rows(conn: Connection, table, columns, rows) -> None:
+    """Bulk insert rows (list of dicts): COPY on PostgreSQL, executemany elsewhere"""
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        cursor.close()
+    else:
+        conn.execute(insert(table), rows)
+
+
+def _reset_sequences(conn: Connection) -> None:
+    """Move PostgreSQL id sequences past explicitly inserted ids"""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in ("shops", "barbers", "services", "appointments"):
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def _client(rng: random.Random, client_pool: int):
+    client_id = rng.randrange(client_pool)
+    first = FIRST_NAMES[client_id % len(FIRST_NAMES)]
+    last = LAST_NAMES[(client_id // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return (
+        f"{first} {last}",
+        f"{first.lower()}.{last.lower()}{client_id}@example.com",
+        f"+1 555-{client_id % 10000000:07d}",
+    )
+
+
+def generate(
+    shops: int = 1,
+    barbers: int = 1000,
+    services_per_barber: int = 20,
+    appointments: int = 5_000_000,
+    max_services_per_appointment: int = 3,
+    past_days: int = 365,
+    cancelled_ratio: float = 0.1,
+    client_pool: int = 200_000,
+    batch_size: int = 50_000,
+    seed: int = 42,
+) -> dict:
+    """
+    Generate a synthetic data set and return row counts per table.
+
+    Appointments are laid out per barber on a timeline starting `past_days` ago,
+    never overlapping, so the data is valid input for the availability engine.
+    """
+    rng = random.Random(seed)
+    counts = {"shops": 0, "barbers": 0, "services": 0, "appointments": 0, "appointment_services": 0}
+    today = date.today()
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+        first_shop_id = _next_id(conn, Shop)
+        shop_rows = [
+            {
+                "id": first_shop_id + i,
+                "name": f"{rng.choice(LAST_NAMES)}'s Barbershop",
+                "slug": f"generated-{first_shop_id + i}",
+                "address": f"{rng.randint(1, 999)} Main Street",
+                "is_active": True,
+            }
+            for i in range(shops)
+        ]
+        _write_rows(conn, Shop.__table__, ["id", "name", "slug", "address", "is_active"], shop_rows)
+        counts["shops"] = len(shop_rows)
+
+        first_barber_id = _next_id(conn, Barber)
+        first_service_id = _next_id(conn, Service)
+        appointment_id = _next_id(conn, Appointment)
+
+        barber_rows = [
+            {
+                "id": first_barber_id + i,
+                "shop_id": shop_rows[i % len(shop_rows)]["id"],
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "description": "Generated barber for scale testing",
+                "working_hours": WORKING_HOURS,
+                "is_active": True,
+            }
+            for i in range(barbers)
+        ]
+        _write_rows(conn, Barber.__table__, ["id", "shop_id", "name", "description", "working_hours", "is_active"], barber_rows)
+        counts["barbers"] = len(barber_rows)
+
+        # services[barber_id] = [(service_id, duration), ...]
+        services = {}
+        service_rows = []
+        service_id = first_service_id
+        for barber in barber_rows:
+            offered = rng.sample(SERVICE_CATALOG, k=min(services_per_barber, len(SERVICE_CATALOG)))
+            while len(offered) < services_per_barber:
+                offered.append(rng.choice(SERVICE_CATALOG))
+            services[barber["id"]] = []
+            for index, (name, description, price, duration) in enumerate(offered):
+                variant = f"{name} #{index // len(SERVICE_CATALOG) + 1}" if index >= len(SERVICE_CATALOG) else name
+                service_rows.append({
+                    "id": service_id,
+                    "shop_id": barber["shop_id"],
+                    "barber_id": barber["id"],
+                    "name": variant,
+                    "description": description,
+                    "price": round(price * rng.uniform(0.9, 1.3), 2),
+                    "duration_minutes": duration,
+                    "is_active": rng.random() > 0.05,
+                })
+                services[barber["id"]].append((service_id, duration))
+                service_id += 1
+        for start in range(0, len(service_rows), batch_size):
+            _write_rows(conn, Service.__table__,
+                        ["id", "shop_id", "barber_id", "name", "description", "price", "duration_minutes", "is_active"],
+                        service_rows[start:start + batch_size])
+        counts["services"] = len(service_rows)
+
+        appointment_rows, association_rows = [], []
+
+        def flush():
+            _write_rows(conn, Appointment.__table__, APPOINTMENT_COLUMNS, appointment_rows)
+            _write_rows(conn, appointment_services, ["appointment_id", "service_id"], association_rows)
+            counts["appointments"] += len(appointment_rows)
+            counts["appointment_services"] += len(association_rows)
+            appointment_rows.clear()
+            association_rows.clear()
+
+        per_barber, remainder = divmod(appointments, max(barbers, 1))
+        for index, barber in enumerate(barber_rows):
+            offered = services[barber["id"]]
+            cursor = datetime.combine(today - timedelta(days=past_days), WORK_START)
+            for _ in range(per_barber + (1 if index < remainder else 0)):
+                chosen = rng.sample(offered, k=rng.randint(1, min(max_services_per_appointment, len(offered))))
+                duration = sum(d for _, d in chosen)
+                # Random idle time between bookings, on a 15 minute grid
+                cursor += timedelta(minutes=15 * rng.choice((0, 0, 0, 1, 2, 4)))
+                if datetime.combine(cursor.date(), WORK_END) < cursor + timedelta(minutes=duration):
+                    cursor = datetime.combine(cursor.date() + timedelta(days=1), WORK_START)
+
+                status = "cancelled" if rng.random() < cancelled_ratio else "confirmed"
+                client_name, client_email, client_phone = _client(rng, client_pool)
+                appointment_rows.append({
+                    "id": appointment_id,
+                    "shop_id": barber["shop_id"],
+                    "barber_id": barber["id"],
+                    "client_name": client_name,
+                    "client_email": client_email,
+                    "client_phone": client_phone,
+                    "appointment_datetime": cursor,
+                    "status": status,
+                    "cancellation_token": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                    "notes": None,
+                    "confirmed_at": cursor - timedelta(days=rng.randint(1, 30)),
+                })
+                association_rows.extend({"appointment_id": appointment_id, "service_id": sid} for sid, _ in chosen)
+                appointment_id += 1
+                cursor += timedelta(minutes=-(-duration // 15) * 15)
+
+                if len(appointment_rows) >= batch_size:
+                    flush()
+                    logger.info("Inserted %d appointments", counts["appointments"])
+        flush()
+        _reset_sequences(conn)
+
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic barbershop data at scale")
+    parser.add_argument("--shops", type=int, default=1, help="barbers are spread evenly over the shops")
+    parser.add_argument("--barbers", type=int, default=1000)
+    parser.add_argument("--services-per-barber", type=int, default=20)
+    parser.add_argument("--appointments", type=int, default=5_000_000)
+    parser.add_argument("--max-services-per-appointment", type=int, default=3)
+    parser.add_argument("--past-days", type=int, default=365, help="start the booking history this many days ago")
+    parser.add_argument("--cancelled-ratio", type=float, default=0.1)
+    parser.add_argument("--clients", type=int, default=200_000, help="number of distinct clients")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db(seed_sample_data=False)
+
+    started = time.perf_counter()
+    counts = generate(
+        shops=args.shops,
+        barbers=args.barbers,
+        services_per_barber=args.services_per_barber,
+        appointments=args.appointments,
+        max_services_per_appointment=args.max_services_per_appointment,
+        past_days=args.past_days,
+        cancelled_ratio=args.cancelled_ratio,
+        client_pool=args.clients,
+        batch_size=args.batch_size,
+        seed=args.seed,
+    )
+    db = SessionLocal()
+    try:
+        counts["daily stats rows"] = rebuild_daily_stats(db)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    logger.info("Generated %s in %.1fs", ", ".join(f"{n} {t}" for t, n in counts.items()), elapsed)
+
+
+if __name__ == "__main__":
+    main()
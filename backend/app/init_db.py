@@ -2,10 +2,12 @@
 Database initialization and migrations
 Creates all tables and seeds initial data idempotently
 """
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 from app.database import engine, SessionLocal
-from app.models import Base, Admin, Barber, Service
+from app.models import Base, Admin, Shop, Barber, Service, Appointment, DailyBarberStats
 from app.auth import get_password_hash
+from app.search import setup_search
 import logging
 import json
 
@@ -21,17 +23,104 @@ def init_db(seed_sample_data: bool = True) -> None:
     """
     # Create all tables if they don't exist
     Base.metadata.create_all(bind=engine)
+    migrate_schema()
+    setup_search(engine)
     logger.info("Database tables created/verified")
     
     # Seed initial data
     db = SessionLocal()
     try:
         seed_admin_user(db)
+        shop = seed_default_shop(db)
+        backfill_shop_ids(db, shop.id)
+        backfill_booked_totals(db)
+        backfill_daily_stats(db)
         if seed_sample_data:
             seed_sample_barbers_and_services(db)
     finally:
         db.close()
 
+def migrate_schema() -> None:
+    """
+    Add columns and indexes introduced after a table was first created.
+    create_all only creates missing tables, so existing databases are upgraded here.
+    Added columns are nullable; backfills run during seeding.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    logger.info(f"Added column {table.name}.{column.name}")
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            table_sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'appointments'")
+            ).scalar()
+        if table_sql and "AUTOINCREMENT" not in table_sql.upper():
+            # SQLite cannot add AUTOINCREMENT in place; the table has to be rebuilt (see README)
+            logger.warning("appointments was created without AUTOINCREMENT; archiving the newest booking can reuse its id")
+
+def seed_default_shop(db: Session) -> Shop:
+    """
+    Create the default shop if no shop exists yet.
+    Idempotent: returns the first shop when one is already present.
+    """
+    shop = db.query(Shop).order_by(Shop.id).first()
+    if shop:
+        return shop
+    
+    shop = Shop(name="Main Shop", slug="main", is_active=True)
+    db.add(shop)
+    db.commit()
+    db.refresh(shop)
+    logger.info("Default shop created")
+    return shop
+
+def backfill_shop_ids(db: Session, default_shop_id: int) -> None:
+    """Assign rows created before multi-location support to their shop"""
+    db.execute(text("UPDATE barbers SET shop_id = :shop_id WHERE shop_id IS NULL"), {"shop_id": default_shop_id})
+    db.execute(text(
+        "UPDATE services SET shop_id = (SELECT shop_id FROM barbers WHERE barbers.id = services.barber_id) "
+        "WHERE shop_id IS NULL"
+    ))
+    db.execute(text(
+        "UPDATE appointments SET shop_id = (SELECT shop_id FROM barbers WHERE barbers.id = appointments.barber_id) "
+        "WHERE shop_id IS NULL"
+    ))
+    db.commit()
+
+def backfill_booked_totals(db: Session) -> None:
+    """Record booked minutes and price on appointments made before they were stored, from their services"""
+    for table, links in (("appointments", "appointment_services"), ("appointments_archive", "appointment_services_archive")):
+        db.execute(text(
+            f"UPDATE {table} SET "
+            f"booked_minutes = (SELECT COALESCE(SUM(services.duration_minutes), 0) FROM {links} "
+            f"JOIN services ON services.id = {links}.service_id WHERE {links}.appointment_id = {table}.id), "
+            f"booked_price = (SELECT COALESCE(SUM(services.price), 0) FROM {links} "
+            f"JOIN services ON services.id = {links}.service_id WHERE {links}.appointment_id = {table}.id) "
+            f"WHERE booked_minutes IS NULL"
+        ))
+    db.commit()
+
+def backfill_daily_stats(db: Session) -> None:
+    """Build the daily rollups once for databases that had appointments before they existed"""
+    from app.crud import rebuild_daily_stats
+
+    if db.query(DailyBarberStats).first() is None and db.query(Appointment.id).first() is not None:
+        rows = rebuild_daily_stats(db)
+        logger.info(f"Built {rows} daily barber stats rows")
+
 def seed_admin_user(db: Session) -> None:
     """
     Create default admin user if it doesn't exist.
@@ -69,6 +158,8 @@ def seed_sample_barbers_and_services(db: Session) -> None:
         logger.info("Sample barbers already exist, skipping creation")
         return
     
+    shop = seed_default_shop(db)
+    
     # Sample working hours
     working_hours = json.dumps({
         "monday": "09:00-17:00",
@@ -84,19 +175,22 @@ def seed_sample_barbers_and_services(db: Session) -> None:
     barber1 = Barber(
         name="Mike Johnson",
         description="Senior barber with 10+ years experience. Specializes in classic cuts and beard styling.",
-        working_hours=working_hours
+        working_hours=working_hours,
+        shop_id=shop.id
     )
     
     barber2 = Barber(
         name="Sarah Williams", 
         description="Expert in modern styling and hair treatments. Great with all hair types.",
-        working_hours=working_hours
+        working_hours=working_hours,
+        shop_id=shop.id
     )
     
     barber3 = Barber(
         name="Tony Rodriguez",
         description="Master barber specializing in fades, beard trims, and traditional hot towel shaves.",
-        working_hours=working_hours
+        working_hours=working_hours,
+        shop_id=shop.id
     )
     
     db.add_all([barber1, barber2, barber3])
@@ -125,6 +219,7 @@ def seed_sample_barbers_and_services(db: Session) -> None:
     
     for service_data in services_data:
         service = Service(
+            shop_id=shop.id,
             barber_id=service_data["barber"].id,
             name=service_data["name"],
             description=service_data["description"],
@@ -0,0 +1,199 @@
+"""
+Lifecycle job: marks confirmed appointments from previous days as completed.
+
+Each batch is one set-based UPDATE of at most `batch_size` rows, found through
+ix_appointments_shop_status_datetime, so a run never holds long locks. Progress
+is kept per shop in `job_checkpoints`: a run only scans from the previous run's
+cutoff, which keeps frequent runs cheap. Rows moved into the past afterwards (a
+reschedule or import with an old date) are picked up by a --full run.
+
+Several workers can run the job at once. A worker leases a shop's checkpoint row
+before touching it and renews the lease in the same transaction as every batch,
+so a batch commits only while its worker still owns the shop; other workers skip
+leased shops. No-shows are still recorded by hand from the admin dashboard.
+
+Usage:
+    python -m app.lifecycle
+    python -m app.lifecycle --interval 600   # keep running every 10 minutes
+    python -m app.lifecycle --full            # ignore the checkpoints once
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import changes
+from app.config import settings
+from app.database import SessionLocal
+from app.init_db import init_db
+from app.models import Appointment, JobCheckpoint, Shop
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "complete_past_appointments"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _lease_filter(name: str, owner: str, now: datetime):
+    return (
+        JobCheckpoint.name == name,
+        or_(JobCheckpoint.lease_owner.is_(None), JobCheckpoint.lease_owner == owner, JobCheckpoint.lease_expires_at < now),
+    )
+
+
+def acquire_lease(db: Session, name: str, owner: str, seconds: int) -> Optional[JobCheckpoint]:
+    """Take or renew the lease on a job's checkpoint row; returns the row, or None when another worker holds it"""
+    try:
+        db.execute(insert(JobCheckpoint).values(name=name))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # the row already exists
+
+    now = datetime.utcnow()
+    result = db.execute(
+        update(JobCheckpoint)
+        .where(*_lease_filter(name, owner, now))
+        .values(lease_owner=owner, lease_expires_at=now + timedelta(seconds=seconds))
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return None
+    return db.get(JobCheckpoint, name, populate_existing=True)
+
+
+def release_lease(db: Session, name: str, owner: str) -> None:
+    db.execute(
+        update(JobCheckpoint)
+        .where(JobCheckpoint.name == name, JobCheckpoint.lease_owner == owner)
+        .values(lease_owner=None, lease_expires_at=None)
+    )
+    db.commit()
+
+
+def complete_batch(db: Session, shop_id: int, since: Optional[datetime], cutoff: datetime, batch_size: int, name: str, owner: str, lease_seconds: int) -> int:
+    """
+    Complete up to `batch_size` confirmed appointments of the shop that started in
+    [since, cutoff), renewing the lease in the same transaction. Returns the number of
+    rows updated, or -1 when the lease was lost and nothing was written.
+    """
+    criteria = [
+        Appointment.shop_id == shop_id,
+        Appointment.status == "confirmed",
+        Appointment.appointment_datetime < cutoff,
+    ]
+    if since is not None:
+        criteria.append(Appointment.appointment_datetime >= since)
+    batch = (
+        select(Appointment.id)
+        .where(*criteria)
+        .order_by(Appointment.appointment_datetime, Appointment.id)
+        .limit(batch_size)
+    )
+    now = datetime.utcnow()
+    try:
+        renewed = db.execute(
+            update(JobCheckpoint)
+            .where(*_lease_filter(name, owner, now))
+            .values(lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds))
+        )
+        if renewed.rowcount != 1:
+            db.rollback()
+            return -1
+        # Completed bookings still count as booked, so the daily stats are unchanged
+        completed = db.execute(
+            update(Appointment)
+            .where(Appointment.id.in_(batch.scalar_subquery()), Appointment.status == "confirmed")
+            .values(status="completed")
+            .returning(Appointment.id, Appointment.shop_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        changes.record(db, changes.APPOINTMENT, "updated", completed)
+        if len(completed) < batch_size:
+            # Nothing is left before the cutoff: the next run starts there
+            db.execute(
+                update(JobCheckpoint)
+                .where(JobCheckpoint.name == name, or_(JobCheckpoint.position.is_(None), JobCheckpoint.position < cutoff))
+                .values(position=cutoff)
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(completed)
+
+
+def complete_past_appointments(
+    db: Session,
+    cutoff: Optional[datetime] = None,
+    batch_size: int = 1000,
+    full: bool = False,
+    owner: Optional[str] = None,
+    lease_seconds: Optional[int] = None,
+) -> int:
+    """
+    Complete confirmed appointments that started before the cutoff (default: today's
+    midnight, so today's schedule is untouched), shop by shop. Returns the number completed.
+    """
+    cutoff = cutoff or datetime.combine(datetime.now().date(), datetime.min.time())
+    owner = owner or worker_id()
+    lease_seconds = lease_seconds or settings.job_lease_seconds
+    total = 0
+    for shop_id in db.scalars(select(Shop.id).order_by(Shop.id)).all():
+        name = f"{JOB_NAME}:{shop_id}"
+        checkpoint = acquire_lease(db, name, owner, lease_seconds)
+        if checkpoint is None:
+            logger.info(f"Shop {shop_id} is being processed by another worker, skipping")
+            continue
+        since = None if full else checkpoint.position
+        try:
+            while True:
+                completed = complete_batch(db, shop_id, since, cutoff, batch_size, name, owner, lease_seconds)
+                if completed < 0:
+                    logger.warning(f"Lost the lease on shop {shop_id}, stopping")
+                    break
+                total += completed
+                if completed < batch_size:
+                    break
+                logger.info(f"Completed {total} past appointments so far")
+        finally:
+            release_lease(db, name, owner)
+    return total
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mark past confirmed appointments as completed")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--full", action="store_true", help="rescan from the beginning instead of the checkpoints")
+    parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db(seed_sample_data=False)
+    owner = worker_id()
+    full = args.full
+    while True:
+        db = SessionLocal()
+        try:
+            completed = complete_past_appointments(db, batch_size=args.batch_size, full=full, owner=owner)
+            logger.info(f"Lifecycle run finished: {completed} appointments completed")
+        finally:
+            db.close()
+        full = False
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+HTTP middleware: response compression and per-route caching headers.
+
+CompressionMiddleware gzips (or brotli-compresses, when the `brotli` package is
+installed and the client accepts it) response bodies above a size threshold.
+Streaming responses are compressed chunk by chunk; event streams are left alone.
+
+CacheControlMiddleware sets Cache-Control from CACHE_POLICIES, so the CDN can
+cache public catalog reads for minutes and availability for seconds, while admin,
+auth and token endpoints are never stored anywhere. Reads the admin UI repeats
+after an edit (one barber, inactive services, any authorized request) are
+revalidated every time instead; catalog responses carry an ETag, so a matching
+If-None-Match gets an empty 304.
+
+RateLimitMiddleware applies the token buckets of app/ratelimit.py to the
+expensive public endpoints and answers 429 with Retry-After.
+
+TracingMiddleware opens the root span of app/tracing.py for each request and
+returns its id in X-Trace-Id.
+"""
+import hashlib
+import math
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import ratelimit, tracing
+from app.calendar_feed import etag_matches
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is used instead
+    brotli = None
+
+# Never worth compressing: already compressed or meant to be read incrementally
+UNCOMPRESSED_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Codings listed in an Accept-Encoding header, minus those refused with q=0"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and settings.brotli_enabled and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=settings.brotli_quality)
+        else:
+            # wbits=31: zlib stream wrapped in a gzip header and trailer
+            self._gz = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._gz.flush()
+
+
+def _add_vary(headers: MutableHeaders, value: str) -> None:
+    existing = headers.get("vary")
+    if not existing:
+        headers["vary"] = value
+    elif value.lower() not in (v.strip().lower() for v in existing.split(",")):
+        headers["vary"] = f"{existing}, {value}"
+
+
+class CompressionMiddleware:
+    """Compress responses of at least `minimum_size` bytes with gzip or brotli"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = settings.compression_min_size if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or content_type.startswith(UNCOMPRESSED_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk tells us the size
+                    start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["content-encoding"] = encoding
+                _add_vary(headers, "Accept-Encoding")
+                if more_body:
+                    del headers["content-length"]
+                    body = compressor.compress(body)
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["content-length"] = str(len(body))
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+# First matching rule wins: (path pattern, policy name). Paths include the /api prefix.
+CACHE_POLICIES: List[Tuple[str, str]] = [
+    (r"^/api/admin(/|$)", "private"),
+    (r"^/api/auth(/|$)", "private"),
+    # Token endpoints: cancellation and booking lookups carry a secret in the URL
+    (r"^/api/appointments(/|$)", "private"),
+    (r"^/api/waitlist(/|$)", "private"),
+    (r"^/api/holds(/|$)", "private"),
+    (r"^/api/barbers/\d+/available-slots$", "availability"),
+    (r"^/api/availability(/|$)", "availability"),
+    (r"^/api/booking/bootstrap$", "availability"),
+    (r"^/api/barbers/\d+/slot-events$", "stream"),
+    # Calendar feeds carry their token in the URL and set their own revalidation header
+    (r"^/api/barbers/\d+/calendar\.ics$", "private"),
+    # Single barber reads back the admin edit pages, so they are never served stale
+    (r"^/api/barbers/\d+(/services)?$", "revalidate"),
+    (r"^/api/(shops|barbers)(/|$)", "catalog"),
+]
+
+# Policies whose GET responses get an ETag and answer a matching If-None-Match with 304
+ETAG_POLICIES = ("catalog", "revalidate")
+
+
+def body_etag(body: bytes) -> str:
+    # Weak: the compressed bytes on the wire differ per Content-Encoding
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def policy_headers() -> dict:
+    """Cache-Control value for each policy name, from settings"""
+    return {
+        "catalog": (
+            f"public, max-age={settings.catalog_max_age}, "
+            f"stale-while-revalidate={settings.catalog_stale_while_revalidate}"
+        ),
+        "availability": f"public, max-age={settings.availability_max_age}",
+        "revalidate": "private, no-cache",
+        "stream": "no-cache",
+        "private": "no-store",
+    }
+
+
+class CacheControlMiddleware:
+    """Set Cache-Control and Vary on responses according to CACHE_POLICIES"""
+
+    def __init__(self, app: ASGIApp, rules: List[Tuple[str, str]] = None):
+        self.app = app
+        self.rules = [(re.compile(pattern), policy) for pattern, policy in (rules or CACHE_POLICIES)]
+        self.policies = policy_headers()
+
+    def policy_for(self, method: str, path: str, query: str = "", authorized: bool = False) -> Optional[str]:
+        if method == "OPTIONS":
+            return None  # CORS preflight caching is governed by Access-Control-Max-Age
+        for pattern, policy in self.rules:
+            if pattern.match(path):
+                # Only safe reads are cacheable; writes under public paths are never stored
+                if policy != "private" and method not in ("GET", "HEAD"):
+                    return "private"
+                # Admin reads of the catalog must see their own edits at once
+                if policy == "catalog" and (authorized or "include_inactive=" in query):
+                    return "revalidate"
+                return policy
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        policy = self.policy_for(
+            scope["method"],
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            "authorization" in request_headers,
+        )
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+        tag_body = policy in ETAG_POLICIES and scope["method"] == "GET"
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+
+        async def send_with_policy(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                # Errors and routes that set their own header are left as they are
+                if "cache-control" not in headers:
+                    if policy == "private" or message["status"] == 200:
+                        headers["cache-control"] = self.policies[policy]
+                    else:
+                        headers["cache-control"] = "no-cache"
+                if policy != "private":
+                    _add_vary(headers, "Accept-Encoding")
+                if policy == "catalog":
+                    _add_vary(headers, "Authorization")
+                if tag_body and message["status"] == 200 and "etag" not in headers:
+                    # Hold the headers until the whole body is known
+                    start = message
+                    return
+            elif message["type"] == "http.response.body" and start is not None:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                body = b"".join(chunks)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["etag"] = body_etag(body)
+                if etag_matches(request_headers.get("if-none-match"), headers["etag"]):
+                    del headers["content-length"]
+                    del headers["content-type"]
+                    start["status"] = 304
+                    body = b""
+                await send(start)
+                start = None
+                await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_with_policy)
+
+
+class RateLimitMiddleware:
+    """Reject requests once the client's bucket for the matching rule is empty"""
+
+    def __init__(self, app: ASGIApp, rules: List[ratelimit.RateLimitRule] = None, backend=None):
+        self.app = app
+        self.rules = [(re.compile(rule.path_pattern), rule) for rule in (rules or ratelimit.default_rules())]
+        self.backend = backend or ratelimit.load_backend(settings.rate_limit_backend)
+
+    @staticmethod
+    def client_id(scope: Scope) -> str:
+        if settings.rate_limit_trust_proxy:
+            forwarded = Headers(scope=scope).get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            for pattern, rule in self.rules:
+                if scope["method"] == rule.method and pattern.match(scope["path"]):
+                    retry_after = self.backend.consume((rule.name, self.client_id(scope)), rule.per_minute / 60, rule.burst)
+                    if retry_after:
+                        response = JSONResponse(
+                            {"detail": "Too many requests, please retry later"},
+                            status_code=429,
+                            headers={"Retry-After": str(math.ceil(retry_after))},
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+class TracingMiddleware:
+    """Trace each HTTP request; event streams are never exported, they last as long as the client stays"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        root, token = tracing.start_trace(
+            f"{scope['method']} {scope['path']}",
+            Headers(scope=scope).get("traceparent"),
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        )
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                headers["x-trace-id"] = root.trace.trace_id
+                root.attributes["http.status_code"] = message["status"]
+                if headers.get("content-type", "").startswith("text/event-stream"):
+                    root.trace.discard = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            tracing.finish_trace(root, token)
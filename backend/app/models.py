@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Table
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Boolean, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from datetime import datetime
 import uuid
 
 # Association table for many-to-many relationship between appointments and services
@@ -23,25 +24,52 @@ class Admin(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class Shop(Base):
+    __tablename__ = "shops"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    slug = Column(String(100), unique=True, nullable=False, index=True)
+    address = Column(Text, nullable=True)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    barbers = relationship("Barber", back_populates="shop")
+
 class Barber(Base):
     __tablename__ = "barbers"
+    __table_args__ = (
+        # Catalog listing: active barbers of one shop
+        Index("ix_barbers_shop_active", "shop_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     working_hours = Column(String(200), nullable=True)  # JSON string: {"monday": "09:00-17:00", ...}
     is_active = Column(Boolean, default=True)
+    calendar_token = Column(String(64), unique=True, index=True, nullable=True)  # secret in the .ics feed URL
+    schedule_version = Column(Integer, default=0, nullable=True)  # bumped with every change to the barber's bookings
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
+    shop = relationship("Shop", back_populates="barbers")
     services = relationship("Service", back_populates="barber", cascade="all, delete-orphan")
     appointments = relationship("Appointment", back_populates="barber")
 
 class Service(Base):
     __tablename__ = "services"
+    __table_args__ = (
+        # Services of barbers within one shop (shop_id is denormalized from the barber)
+        Index("ix_services_shop_barber_active", "shop_id", "barber_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
     barber_id = Column(Integer, ForeignKey("barbers.id"), nullable=False)
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
@@ -57,8 +85,20 @@ class Service(Base):
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # Conflict checks and availability: one barber's bookings in a time range
+        Index("ix_appointments_shop_barber_status_datetime", "shop_id", "barber_id", "status", "appointment_datetime"),
+        # Admin listings of one shop
+        Index("ix_appointments_shop_status_datetime", "shop_id", "status", "appointment_datetime"),
+        # One client's booking history
+        Index("ix_appointments_client_email_datetime", "client_email", "appointment_datetime"),
+        Index("ix_appointments_client_phone_datetime", "client_phone", "appointment_datetime"),
+        # Archived ids stay in appointments_archive: SQLite must not hand out the newest one again
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
     barber_id = Column(Integer, ForeignKey("barbers.id"), nullable=False)
     
     # Client information
@@ -71,6 +111,9 @@ class Appointment(Base):
     status = Column(String(20), default="confirmed")  # confirmed, cancelled
     cancellation_token = Column(String(100), unique=True, nullable=False)
     notes = Column(Text, nullable=True)
+    # Totals of the services when booked; the daily stats count these, not later catalog prices
+    booked_minutes = Column(Integer, nullable=True)
+    booked_price = Column(Float, nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -84,3 +127,158 @@ class Appointment(Base):
     def generate_cancellation_token(self):
         """Generate a unique cancellation token"""
         self.cancellation_token = str(uuid.uuid4())
+
+# Cold storage for finished appointments, filled in batches by app/archive.py
+appointment_services_archive = Table(
+    'appointment_services_archive',
+    Base.metadata,
+    Column('appointment_id', Integer, ForeignKey('appointments_archive.id', ondelete='CASCADE'), primary_key=True),
+    Column('service_id', Integer, primary_key=True)
+)
+
+class ArchivedAppointment(Base):
+    __tablename__ = "appointments_archive"
+    __table_args__ = (
+        Index("ix_appointments_archive_shop_datetime", "shop_id", "appointment_datetime"),
+        Index("ix_appointments_archive_barber_datetime", "barber_id", "appointment_datetime"),
+        Index("ix_appointments_archive_client_email_datetime", "client_email", "appointment_datetime"),
+        Index("ix_appointments_archive_client_phone_datetime", "client_phone", "appointment_datetime"),
+    )
+    
+    # Same id as the original row in appointments
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    shop_id = Column(Integer, nullable=True)
+    barber_id = Column(Integer, nullable=False)
+    
+    client_name = Column(String(100), nullable=False)
+    client_email = Column(String(100), nullable=False)
+    client_phone = Column(String(20), nullable=False)
+    
+    appointment_datetime = Column(DateTime, nullable=False)
+    status = Column(String(20))
+    cancellation_token = Column(String(100), nullable=False)
+    notes = Column(Text, nullable=True)
+    booked_minutes = Column(Integer, nullable=True)
+    booked_price = Column(Float, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    confirmed_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    barber_id = Column(Integer, ForeignKey("barbers.id"), nullable=True)  # NULL = any barber of the shop
+    
+    client_name = Column(String(100), nullable=False)
+    client_email = Column(String(100), nullable=False)
+    client_phone = Column(String(20), nullable=False)
+    
+    # Acceptable appointment window and the time needed
+    earliest = Column(DateTime, nullable=False)
+    latest = Column(DateTime, nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    
+    status = Column(String(20), default="waiting")  # waiting, notified, removed
+    token = Column(String(100), unique=True, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    notified_at = Column(DateTime(timezone=True), nullable=True)
+    
+    days = relationship("WaitlistDay", back_populates="entry", cascade="all, delete-orphan")
+
+class WaitlistDay(Base):
+    """One row per day of a waiting entry's window, so a freed slot is matched by (barber, day) lookups"""
+    __tablename__ = "waitlist_days"
+    __table_args__ = (
+        Index("ix_waitlist_days_barber_day", "barber_id", "day"),
+        # Entries for any barber are found through the shop
+        Index("ix_waitlist_days_shop_day", "shop_id", "day"),
+    )
+    
+    entry_id = Column(Integer, ForeignKey("waitlist_entries.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    shop_id = Column(Integer, nullable=False)
+    barber_id = Column(Integer, nullable=True)
+    
+    entry = relationship("WaitlistEntry", back_populates="days")
+
+class SlotHold(Base):
+    """A short reservation of a barber's time while the client completes the booking form"""
+    __tablename__ = "slot_holds"
+    __table_args__ = (
+        Index("ix_slot_holds_barber_start", "barber_id", "start_datetime"),
+        # Sweeping expired holds
+        Index("ix_slot_holds_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    token = Column(String(100), unique=True, nullable=False)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False)
+    barber_id = Column(Integer, ForeignKey("barbers.id"), nullable=False)
+    start_datetime = Column(DateTime, nullable=False)
+    end_datetime = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # UTC
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key header, replayed on retries"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    
+    scope = Column(String(100), primary_key=True)  # endpoint, e.g. "POST /appointments"
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)  # UTC
+
+class DailyBarberStats(Base):
+    """Per barber and day rollup, kept current by crud on every appointment write"""
+    __tablename__ = "daily_barber_stats"
+    __table_args__ = (
+        Index("ix_daily_barber_stats_shop_day", "shop_id", "day"),
+        Index("ix_daily_barber_stats_day", "day"),
+    )
+    
+    barber_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    shop_id = Column(Integer, nullable=False)
+    booked_count = Column(Integer, nullable=False, default=0)  # confirmed and completed
+    cancelled_count = Column(Integer, nullable=False, default=0)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+class JobCheckpoint(Base):
+    """Progress and lease of a background job, one row per job and shop (see app/lifecycle.py)"""
+    __tablename__ = "job_checkpoints"
+    
+    name = Column(String(100), primary_key=True)  # e.g. "complete_past_appointments:1"
+    position = Column(DateTime, nullable=True)  # everything before this has been processed
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # UTC
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ChangeLogEntry(Base):
+    """One appointment, barber or service mutation, appended in the writer's transaction (see app/changes.py)"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        # Feeds scoped to one shop
+        Index("ix_change_log_shop_id", "shop_id", "id"),
+        # Retention purge
+        Index("ix_change_log_changed_at", "changed_at"),
+        # Ids are cursors: SQLite must never reuse one, even after a purge empties the table
+        {"sqlite_autoincrement": True},
+    )
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(20), nullable=False)  # appointment, barber, service
+    entity_id = Column(Integer, nullable=False)
+    action = Column(String(20), nullable=False)  # created, updated, deleted, archived
+    shop_id = Column(Integer, nullable=True)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # UTC
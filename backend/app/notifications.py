@@ -0,0 +1,61 @@
+"""
+Queued notification delivery.
+
+Emails that are a side effect of someone else's action (waitlist offers sent
+when a booking is cancelled) go through this queue so the request that
+triggered them does not wait on SMTP. A single daemon thread drains the queue;
+a full queue drops the notification with a warning rather than blocking.
+"""
+import logging
+import queue
+import threading
+from typing import Callable
+
+from app.config import settings
+from app.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationQueue:
+    def __init__(self, maxsize: int = 1000):
+        self._queue = queue.Queue(maxsize)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, func: Callable, *args) -> bool:
+        """Run func(*args) on the worker thread; returns False when the queue is full"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((func, args))
+            return True
+        except queue.Full:
+            logger.warning(f"Notification queue full, dropping {getattr(func, '__name__', func)}")
+            return False
+
+    def join(self) -> None:
+        """Block until everything queued so far has been processed"""
+        self._queue.join()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="notifications", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Notification {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+
+notification_queue = NotificationQueue(settings.notification_queue_size)
+
+
+def queue_waitlist_offer(offer_data: dict) -> bool:
+    return notification_queue.enqueue(email_service.send_waitlist_offer, offer_data)
@@ -0,0 +1,103 @@
+"""
+Token-bucket rate limiting for the expensive public endpoints.
+
+Each (rule, client) pair has its own bucket: `capacity` tokens that refill at
+`rate` tokens per second, one token per request. Buckets live in a bounded LRU,
+so a scraper rotating addresses cannot grow memory without limit; an evicted
+bucket simply starts full again.
+
+The in-process store limits each worker separately. For a shared limit across
+workers, set RATE_LIMIT_BACKEND to "package.module:factory" returning an object
+with the same `consume` method (e.g. a Redis script implementing the bucket).
+"""
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple
+
+from app.config import settings
+
+
+class RateLimitRule(NamedTuple):
+    name: str
+    method: str
+    path_pattern: str
+    per_minute: float
+    burst: int
+
+
+def default_rules() -> List[RateLimitRule]:
+    return [
+        RateLimitRule(
+            "availability", "GET", r"^/api/barbers/\d+/available-slots$",
+            settings.rate_limit_availability_per_minute, settings.rate_limit_availability_burst,
+        ),
+        RateLimitRule(
+            "next-available", "GET", r"^/api/availability/next$",
+            settings.rate_limit_availability_per_minute, settings.rate_limit_availability_burst,
+        ),
+        RateLimitRule(
+            "group-availability", "GET", r"^/api/availability/group$",
+            settings.rate_limit_availability_per_minute, settings.rate_limit_availability_burst,
+        ),
+        RateLimitRule(
+            "bootstrap", "GET", r"^/api/booking/bootstrap$",
+            settings.rate_limit_availability_per_minute, settings.rate_limit_availability_burst,
+        ),
+        RateLimitRule(
+            "booking", "POST", r"^/api/appointments$",
+            settings.rate_limit_booking_per_minute, settings.rate_limit_booking_burst,
+        ),
+        RateLimitRule(
+            "series", "POST", r"^/api/appointments/series$",
+            settings.rate_limit_booking_per_minute, settings.rate_limit_booking_burst,
+        ),
+        RateLimitRule(
+            "group", "POST", r"^/api/appointments/group$",
+            settings.rate_limit_booking_per_minute, settings.rate_limit_booking_burst,
+        ),
+        RateLimitRule(
+            "holds", "POST", r"^/api/holds$",
+            settings.rate_limit_holds_per_minute, settings.rate_limit_holds_burst,
+        ),
+    ]
+
+
+class TokenBucketStore:
+    """Thread-safe token buckets in an LRU of at most `maxsize` keys"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: Hashable, rate: float, capacity: int, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 when allowed, else seconds until enough tokens refill"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.maxsize:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens, updated = bucket
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                self._buckets.move_to_end(key)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def load_backend(spec: str):
+    if spec in ("", "memory"):
+        return TokenBucketStore(settings.rate_limit_max_clients)
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
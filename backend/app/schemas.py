@@ -1,13 +1,37 @@
 from pydantic import BaseModel, field_validator
-from typing import Optional, List
-from datetime import datetime
+from typing import Any, Dict, Optional, List
+from datetime import date, datetime
 import re
 
+# Shop schemas
+class ShopBase(BaseModel):
+    name: str
+    slug: str
+    address: Optional[str] = None
+
+class ShopCreate(ShopBase):
+    pass
+
+class ShopUpdate(ShopBase):
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    is_active: Optional[bool] = None
+
+class Shop(ShopBase):
+    id: int
+    is_active: bool
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 # Barber schemas
 class BarberBase(BaseModel):
     name: str
     description: Optional[str] = None
     working_hours: Optional[str] = None
+    shop_id: Optional[int] = None  # Defaults to the main shop on create
 
 class BarberCreate(BarberBase):
     pass
@@ -44,6 +68,7 @@ class ServiceUpdate(ServiceBase):
 class Service(ServiceBase):
     id: int
     barber_id: int
+    shop_id: Optional[int] = None
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -67,6 +92,7 @@ class AppointmentBase(BaseModel):
 class AppointmentCreate(AppointmentBase):
     barber_id: int
     service_ids: List[int]  # Changed from service_id to service_ids (list)
+    hold_token: Optional[str] = None  # from POST /holds; the held slot is booked without a conflict re-check
     
     @field_validator('client_phone')
     @classmethod
@@ -89,6 +115,9 @@ class AppointmentCreate(AppointmentBase):
         
         return v
 
+class AppointmentImportRow(AppointmentCreate):
+    status: str = "confirmed"
+
 class AppointmentUpdate(BaseModel):
     status: Optional[str] = None
     notes: Optional[str] = None
@@ -97,6 +126,7 @@ class AppointmentUpdate(BaseModel):
 class Appointment(AppointmentBase):
     id: int
     barber_id: int
+    shop_id: Optional[int] = None
     status: str
     cancellation_token: str
     created_at: datetime
@@ -106,6 +136,21 @@ class Appointment(AppointmentBase):
     class Config:
         from_attributes = True
 
+class AppointmentHistoryItem(BaseModel):
+    id: int
+    shop_id: Optional[int] = None
+    barber_id: int
+    client_name: str
+    client_email: str
+    client_phone: str
+    appointment_datetime: datetime
+    status: Optional[str] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    confirmed_at: Optional[datetime] = None
+    archived: bool
+    service_ids: List[int] = []
+
 # Response schemas with relationships
 class BarberWithServices(Barber):
     services: List[Service] = []
@@ -114,6 +159,159 @@ class AppointmentWithDetails(Appointment):
     barber: Barber
     services: List[Service]  # Changed from service to services (list)
 
+# Bulk catalog update schemas
+class BarberBulkUpdate(BarberUpdate):
+    id: int
+
+class ServiceBulkUpdate(ServiceUpdate):
+    id: int
+
+class CatalogBulkUpdate(BaseModel):
+    barbers: List[BarberBulkUpdate] = []
+    services: List[ServiceBulkUpdate] = []
+
+class CatalogBulkUpdateResult(BaseModel):
+    updated_barber_ids: List[int]
+    updated_service_ids: List[int]
+
+# Bulk import schemas
+class AppointmentImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class AppointmentImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    dry_run: bool
+    appointment_ids: List[int] = []
+    errors: List[AppointmentImportRowError] = []
+
+# Recurring series schemas
+class AppointmentSeriesCreate(AppointmentCreate):
+    frequency: str = "weekly"  # weekly | biweekly
+    occurrences: Optional[int] = None  # give either occurrences or until
+    until: Optional[date] = None
+
+class AppointmentSeriesConflict(BaseModel):
+    appointment_datetime: datetime
+    reason: str
+
+class AppointmentSeriesResult(BaseModel):
+    requested: int
+    booked: List[Appointment]
+    conflicts: List[AppointmentSeriesConflict] = []
+
+# Group booking schemas
+class GroupBookingCreate(BaseModel):
+    client_name: str
+    client_email: str
+    client_phone: str
+    notes: Optional[str] = None
+    appointment_datetime: datetime
+    party_size: int
+    service_names: List[str]  # every member gets these services, from their own barber
+    shop_id: Optional[int] = None
+    barber_ids: Optional[List[int]] = None  # preferred barbers, in order; None = any in the shop
+    
+    @field_validator('client_phone')
+    @classmethod
+    def validate_phone(cls, v: str) -> str:
+        return AppointmentCreate.validate_phone(v)
+
+class GroupBookingResult(BaseModel):
+    appointment_datetime: datetime
+    appointments: List[Appointment]
+
+# Slot hold schemas
+class SlotHoldCreate(BaseModel):
+    barber_id: int
+    service_ids: List[int]
+    appointment_datetime: datetime
+
+class SlotHold(BaseModel):
+    token: str
+    barber_id: int
+    appointment_datetime: datetime
+    duration_minutes: int
+    expires_at: datetime
+
+# Waitlist schemas
+class WaitlistEntryCreate(BaseModel):
+    barber_id: Optional[int] = None  # None = any barber
+    shop_id: Optional[int] = None
+    client_name: str
+    client_email: str
+    client_phone: str
+    earliest: datetime
+    latest: datetime
+    duration_minutes: int
+    
+    @field_validator('client_phone')
+    @classmethod
+    def validate_phone(cls, v: str) -> str:
+        return AppointmentCreate.validate_phone(v)
+
+class WaitlistEntry(BaseModel):
+    id: int
+    shop_id: int
+    barber_id: Optional[int] = None
+    client_name: str
+    client_email: str
+    client_phone: str
+    earliest: datetime
+    latest: datetime
+    duration_minutes: int
+    status: str
+    token: str
+    created_at: datetime
+    notified_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Calendar feed schema
+class CalendarFeed(BaseModel):
+    barber_id: int
+    token: str
+    feed_path: str
+
+# Change feed schemas
+class ChangeRecord(BaseModel):
+    cursor: int
+    entity: str  # appointment, barber, service
+    id: int
+    action: str  # created, updated, deleted, archived
+    shop_id: Optional[int] = None
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None  # current row, None once deleted or archived
+
+class ChangeFeed(BaseModel):
+    changes: List[ChangeRecord]
+    next_cursor: int
+    has_more: bool
+
+# Admin statistics schemas
+class StatsMetrics(BaseModel):
+    booked_count: int
+    cancelled_count: int
+    booked_minutes: int
+    revenue: float
+    utilization: Optional[float] = None
+    cancellation_rate: Optional[float] = None
+
+class StatsRow(StatsMetrics):
+    day: Optional[date] = None
+    barber_id: Optional[int] = None
+    barber_name: Optional[str] = None
+
+class StatsResponse(BaseModel):
+    start: date
+    end: date
+    group_by: str
+    totals: StatsMetrics
+    rows: List[StatsRow]
+
 # Booking availability schema
 class TimeSlot(BaseModel):
     datetime: datetime
@@ -123,6 +321,15 @@ class AvailabilityResponse(BaseModel):
     date: str
     slots: List[TimeSlot]
 
+class BarberAvailability(BaseModel):
+    barber_id: int
+    duration_minutes: int
+    days: List[AvailabilityResponse]
+
+class BookingBootstrap(BaseModel):
+    barbers: List[BarberWithServices]
+    availability: List[BarberAvailability]
+
 # Authentication schemas
 class AdminLogin(BaseModel):
     username: str
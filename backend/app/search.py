@@ -0,0 +1,149 @@
+"""
+Full-text search over appointments by client name, email and phone.
+
+SQLite: an FTS5 table `appointments_fts` (rowid = appointment id) holds the
+client name, email and phone digits. Triggers on `appointments` keep it in step
+with every insert, update and delete, including the bulk paths that bypass the
+ORM and the archive job's deletes, so archived appointments drop out of search.
+
+PostgreSQL: trigram GIN indexes (pg_trgm) on the lowered name and email and on
+the phone digits serve the same LIKE queries; the indexes maintain themselves.
+
+Every word of the query has to match the name, email or phone: as a word prefix
+on SQLite (any substring on PostgreSQL), and digits anywhere in the phone, so
+"jo smi" finds "John Smith" and "0100199" finds "+1 (555) 010-0199". Results
+are the most recently created bookings first.
+
+Per-client history uses the (client_email, appointment_datetime) and
+(client_phone, appointment_datetime) indexes instead; see crud.get_appointment_history.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import Appointment
+
+logger = logging.getLogger(__name__)
+
+# Digits of client_phone, in SQL without regex support
+PHONE_DIGITS_SQL = (
+    "replace(replace(replace(replace(replace(replace({column}, ' ', ''), '-', ''), '(', ''), ')', ''), '+', ''), '.', '')"
+)
+
+# FTS5 only matches token prefixes, so the phone is indexed as its digits and every
+# suffix of them: a number typed without country code, or its last digits, is then
+# the prefix of one of the tokens
+MAX_PHONE_SUFFIXES = 12
+
+
+def phone_tokens_sql(column: str) -> str:
+    digits = PHONE_DIGITS_SQL.format(column=column)
+    return " || ' ' || ".join([digits] + [f"substr({digits}, {start})" for start in range(2, MAX_PHONE_SUFFIXES + 1)])
+
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS appointments_fts USING fts5(
+        client_name, client_email, client_phone, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_insert AFTER INSERT ON appointments BEGIN
+        INSERT INTO appointments_fts(rowid, client_name, client_email, client_phone)
+        VALUES (new.id, new.client_name, new.client_email, {phone_tokens_sql("new.client_phone")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_update AFTER UPDATE OF client_name, client_email, client_phone ON appointments BEGIN
+        DELETE FROM appointments_fts WHERE rowid = old.id;
+        INSERT INTO appointments_fts(rowid, client_name, client_email, client_phone)
+        VALUES (new.id, new.client_name, new.client_email, {phone_tokens_sql("new.client_phone")});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS appointments_fts_delete AFTER DELETE ON appointments BEGIN
+        DELETE FROM appointments_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_client_name_trgm ON appointments USING gin (lower(client_name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_client_email_trgm ON appointments USING gin (lower(client_email) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_appointments_client_phone_trgm ON appointments "
+    "USING gin ((regexp_replace(client_phone, '[^0-9]', '', 'g')) gin_trgm_ops)",
+]
+
+
+def setup_search(engine: Engine) -> None:
+    """Create the search index for the engine's dialect; the FTS table is filled once when first created"""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            created = not conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'appointments_fts'")
+            ).first()
+            for statement in SQLITE_SETUP:
+                conn.execute(text(statement))
+            if created:
+                conn.execute(text(
+                    "INSERT INTO appointments_fts(rowid, client_name, client_email, client_phone) "
+                    f"SELECT id, client_name, client_email, {phone_tokens_sql('client_phone')} FROM appointments"
+                ))
+                logger.info("Built the appointment search index")
+        elif engine.dialect.name == "postgresql":
+            for statement in POSTGRES_SETUP:
+                conn.execute(text(statement))
+
+
+def query_terms(query: str) -> List[str]:
+    """Lowercased words of the query; punctuation separates words like the index tokenizer does"""
+    return [term for term in re.split(r"[^\w]+", query.lower()) if term]
+
+
+def search_appointment_ids(db: Session, query: str, limit: int = 50, shop_id: Optional[int] = None, status: Optional[str] = None) -> List[int]:
+    """Ids of appointments whose client matches every query word, newest bookings first"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    if db.get_bind().dialect.name == "sqlite":
+        # Walks the FTS doclist in rowid order and stops at the limit; no sort over all matches
+        filters = ""
+        params = {"match": " AND ".join(f'"{term}"*' for term in terms), "limit": limit}
+        if shop_id is not None:
+            filters += " AND appointments.shop_id = :shop_id"
+            params["shop_id"] = shop_id
+        if status:
+            filters += " AND appointments.status = :status"
+            params["status"] = status
+        return list(db.scalars(text(
+            "SELECT appointments_fts.rowid FROM appointments_fts "
+            "JOIN appointments ON appointments.id = appointments_fts.rowid "
+            f"WHERE appointments_fts MATCH :match{filters} "
+            "ORDER BY appointments_fts.rowid DESC LIMIT :limit"
+        ), params))
+    return like_search_ids(db, terms, limit, shop_id, status)
+
+
+def like_search_ids(db: Session, terms: List[str], limit: int, shop_id: Optional[int] = None, status: Optional[str] = None) -> List[int]:
+    """Substring matching for databases without FTS5, served by the trigram indexes on PostgreSQL"""
+    phone_digits = func.regexp_replace(Appointment.client_phone, "[^0-9]", "", "g")
+    statement = select(Appointment.id)
+    for term in terms:
+        matches = [
+            func.lower(Appointment.client_name).contains(term, autoescape=True),
+            func.lower(Appointment.client_email).contains(term, autoescape=True),
+        ]
+        if term.isdigit():
+            matches.append(phone_digits.contains(term, autoescape=True))
+        statement = statement.where(or_(*matches))
+    if shop_id is not None:
+        statement = statement.where(Appointment.shop_id == shop_id)
+    if status:
+        statement = statement.where(Appointment.status == status)
+    return list(db.scalars(statement.order_by(Appointment.id.desc()).limit(limit)))
@@ -1,6 +1,7 @@
 """
 Legacy seed data script - now handled by init_db.py
 This script is kept for backwards compatibility but delegates to init_db
+For large synthetic data sets use generate_data.py instead
 """
 from app.init_db import init_db
 
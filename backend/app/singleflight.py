@@ -0,0 +1,63 @@
+"""
+Single-flight call coalescing.
+
+When many threads ask for the same key at once, only the first (the leader) runs
+the function; the others wait for it and receive the same result, or the same
+exception. Once the call finishes the key is forgotten, so the next caller starts
+a fresh call; caching results is left to the caller.
+
+Used around the availability computation: when a popular barber's day opens,
+hundreds of identical requests cost one set of queries instead of hundreds.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """Coalesces concurrent calls with equal keys into one in-flight call"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (func's result, shared) where shared is True when another caller computed it"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, call.waiters > 0
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
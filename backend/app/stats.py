@@ -0,0 +1,46 @@
+"""
+Maintenance for the daily barber rollups behind GET /api/admin/stats.
+
+crud keeps `daily_barber_stats` up to date on every booking change; this job
+recomputes it from the appointment tables, for a date range or everything, after
+bulk loads, manual SQL fixes or to verify the incremental counts.
+
+Usage:
+    python -m app.stats --rebuild
+    python -m app.stats --rebuild --start 2025-01-01 --end 2025-01-31
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from app.crud import rebuild_daily_stats
+from app.database import SessionLocal
+from app.init_db import init_db
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_date(value: str):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the daily barber statistics")
+    parser.add_argument("--rebuild", action="store_true", required=True, help="recompute the rollups from appointments")
+    parser.add_argument("--start", type=_parse_date, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=_parse_date, help="last day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db(seed_sample_data=False)
+    db = SessionLocal()
+    try:
+        rows = rebuild_daily_stats(db, args.start, args.end, batch_size=args.batch_size)
+        logger.info(f"Rebuilt {rows} daily barber stats rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
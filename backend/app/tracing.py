@@ -0,0 +1,359 @@
+"""
+Lightweight per-request tracing.
+
+With TRACING_ENABLED, TracingMiddleware opens a root span for every HTTP request
+and answers with an X-Trace-Id header. Child spans are recorded around SQL
+statements (engine events), public crud functions, email rendering and SMTP
+delivery, and JSON serialization, so a slow booking can be split into conflict
+scan, insert, template rendering, SMTP and encoding after the fact.
+
+Spans are kept in memory until the request ends; then the trace is exported when
+it is sampled (TRACING_SAMPLE_RATE, or a `traceparent` header with the sampled
+flag) or slower than TRACING_SLOW_MS, and dropped otherwise. Export happens on a
+background thread: JSON lines to TRACING_FILE, or OTLP/HTTP JSON to
+TRACING_OTLP_ENDPOINT when one is configured. A full export queue drops traces
+rather than slowing requests down.
+
+Outside a traced request (jobs, the notification worker) every hook is a single
+context variable lookup. Work handed to other threads is traced when the callable
+is wrapped with bind_context.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Spans kept per trace; bulk operations beyond this are counted, not recorded
+MAX_SPANS_PER_TRACE = 1000
+
+# Longest SQL statement text stored on a span
+MAX_STATEMENT_LENGTH = 500
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "dropped", "sampled", "discard")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.dropped = 0
+        self.sampled = sampled
+        self.discard = False
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "started", "duration_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str] = None, kind: str = "internal", attributes: Optional[dict] = None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter_ns()
+        self.duration_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def child(self, name: str, kind: str = "internal", attributes: Optional[dict] = None) -> "Span":
+        return Span(self.trace, name, self.span_id, kind, attributes)
+
+    def end(self) -> None:
+        self.duration_ns = time.perf_counter_ns() - self.started
+        if len(self.trace.spans) < MAX_SPANS_PER_TRACE:
+            self.trace.spans.append(self)
+        else:
+            self.trace.dropped += 1
+
+    def to_record(self) -> dict:
+        record = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": datetime.fromtimestamp(self.start_ns / 1e9, tz=timezone.utc).isoformat(),
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current else None
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, attributes: Optional[dict] = None):
+    """Open the root span of a request; returns (span, token) for finish_trace"""
+    parent = parse_traceparent(traceparent)
+    if parent:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id, sampled = f"{random.getrandbits(128):032x}", None, False
+    root = Span(Trace(trace_id, sampled), name, parent_id, "server", attributes)
+    return root, _current_span.set(root)
+
+
+def finish_trace(root: Span, token) -> None:
+    """Close the root span and hand the trace to the exporter when it is kept"""
+    _current_span.reset(token)
+    root.end()
+    trace = root.trace
+    if trace.discard:
+        return
+    slow = settings.tracing_slow_ms and root.duration_ns >= settings.tracing_slow_ms * 1e6
+    if trace.sampled or slow or random.random() < settings.tracing_sample_rate:
+        if trace.dropped:
+            root.attributes["spans.dropped"] = trace.dropped
+        exporter.submit(trace)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Child span of the current one; does nothing outside a traced request"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    current = parent.child(name, kind, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording a span per call, named after the module and function by default"""
+    def decorate(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument(namespace: Dict[str, Any], module_name: str) -> None:
+    """Wrap the public functions a module defines (not generators) with traced()"""
+    for attribute, value in list(namespace.items()):
+        if (
+            inspect.isfunction(value) and value.__module__ == module_name
+            and not attribute.startswith("_") and not inspect.isgeneratorfunction(value)
+        ):
+            namespace[attribute] = traced()(value)
+
+
+def bind_context(func: Callable) -> Callable:
+    """Run func in the caller's context, so spans from a worker thread join the request's trace"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time: each call gets a copy
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def instrument_engine(engine) -> None:
+    """One "db" span per SQL statement executed while a request is traced"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is not None and context is not None:
+            context._trace_span = parent.child("db", "client", {
+                "db.system": engine.dialect.name,
+                "db.statement": statement[:MAX_STATEMENT_LENGTH],
+                "db.executemany": executemany,
+            })
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        current = getattr(context, "_trace_span", None)
+        if current is not None:
+            context._trace_span = None
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                current.attributes["db.rowcount"] = cursor.rowcount
+            current.end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        current = getattr(exception_context.execution_context, "_trace_span", None)
+        if current is not None:
+            exception_context.execution_context._trace_span = None
+            current.error = f"{type(exception_context.original_exception).__name__}: {exception_context.original_exception}"
+            current.end()
+
+
+class JsonlSink:
+    """Appends one JSON line per span to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, traces: List[Trace]) -> None:
+        with open(self.path, "a", encoding="utf-8") as sink:
+            for trace in traces:
+                for recorded in trace.spans:
+                    sink.write(json.dumps(recorded.to_record(), default=str) + "\n")
+
+
+OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpSink:
+    """Posts spans to an OTLP/HTTP collector in the JSON encoding (no SDK needed)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.url = endpoint if endpoint.rstrip("/").endswith("/v1/traces") else endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _span(self, recorded: Span) -> dict:
+        otlp = {
+            "traceId": recorded.trace.trace_id,
+            "spanId": recorded.span_id,
+            "name": recorded.name,
+            "kind": OTLP_KINDS[recorded.kind],
+            "startTimeUnixNano": str(recorded.start_ns),
+            "endTimeUnixNano": str(recorded.start_ns + recorded.duration_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in recorded.attributes.items()],
+        }
+        if recorded.parent_id:
+            otlp["parentSpanId"] = recorded.parent_id
+        if recorded.error:
+            otlp["status"] = {"code": 2, "message": recorded.error}
+        return otlp
+
+    def export(self, traces: List[Trace]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.tracing"},
+                    "spans": [self._span(recorded) for trace in traces for recorded in trace.spans],
+                }],
+            }],
+        }
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Exporter:
+    """Bounded queue of finished traces, written out in batches by one daemon thread"""
+
+    def __init__(self, maxsize: int = 1000, batch_size: int = 100):
+        self._queue = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._sink = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def configure(self, sink) -> None:
+        self._sink = sink
+
+    def submit(self, trace: Trace) -> bool:
+        if self._sink is None:
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self) -> None:
+        """Block until everything submitted so far has been exported"""
+        self._queue.join()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._sink.export(batch)
+            except Exception as e:
+                logger.warning(f"Trace export failed, dropping {len(batch)} traces: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+exporter = Exporter(settings.tracing_queue_size)
+
+
+def configure_from_settings(engine) -> None:
+    """Pick the sink and hook the engine; called once at startup when tracing is enabled"""
+    if settings.tracing_otlp_endpoint:
+        exporter.configure(OtlpSink(settings.tracing_otlp_endpoint, settings.tracing_service_name))
+    else:
+        exporter.configure(JsonlSink(settings.tracing_file))
+    instrument_engine(engine)
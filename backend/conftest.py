@@ -0,0 +1,67 @@
+"""
+Shared setup for the backend tests.
+
+Settings and the engine are created when `app` is first imported, so the
+environment is prepared here, before pytest imports any test module. Each test
+module then runs against its own freshly created and seeded SQLite database:
+the `database` fixture rebinds the engine, so modules never see each other's
+rows and do not depend on the order they run in.
+
+    cd backend && pytest
+"""
+import os
+import tempfile
+
+import pytest
+
+from perf.harness import prepare_environment
+
+_TEST_DIR = tempfile.mkdtemp(prefix="barbershop-test-")
+prepare_environment(os.path.join(_TEST_DIR, "test.db"), 2525)
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app import cache, database as app_database, init_db as app_init_db  # noqa: E402
+
+# Manual scripts: they need a running API server or a real SMTP account
+collect_ignore = ["test_api.py", "test_email.py"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database(request):
+    """A new seeded database for the module; yields its engine"""
+    path = os.path.join(_TEST_DIR, f"{request.module.__name__}.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    previous = app_database.engine
+    app_database.engine = app_init_db.engine = engine
+    app_database.SessionLocal.configure(bind=engine)
+    # Cached reads from the previous module's database must not leak in
+    cache.catalog_cache.clear()
+    cache.availability_cache.clear()
+    app_init_db.init_db(seed_sample_data=True)
+    try:
+        yield engine
+    finally:
+        app_database.engine = app_init_db.engine = previous
+        app_database.SessionLocal.configure(bind=previous)
+        engine.dispose()
+
+
+@pytest.fixture
+def db(database):
+    session = app_database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(database):
+    """TestClient for the app, running its startup and shutdown hooks"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
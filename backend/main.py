@@ -1,6 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
+from app import tracing
+from app.config import settings
+from app.database import engine
+from app.middleware import CacheControlMiddleware, CompressionMiddleware, RateLimitMiddleware, TracingMiddleware
 from app.init_db import init_db
 import logging
 
@@ -13,12 +20,27 @@ logger.info("Initializing database...")
 init_db()
 logger.info("Database initialization complete")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Computes uncached availability days for the booking bootstrap
+    app.state.bootstrap_pool = ThreadPoolExecutor(max_workers=settings.bootstrap_workers, thread_name_prefix="bootstrap")
+    try:
+        yield
+    finally:
+        app.state.bootstrap_pool.shutdown(wait=True)
+        del app.state.bootstrap_pool
+
 app = FastAPI(
     title="Barbershop Appointment System",
     description="API for managing barbershop appointments",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Rate limiting sits inside CORS so browsers can read the 429
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +57,16 @@ app.add_middleware(
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
+# Cache-Control per route, then compression of the final body
+app.add_middleware(CacheControlMiddleware)
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+# Tracing wraps everything else, so the root span covers the whole request
+if settings.tracing_enabled:
+    tracing.configure_from_settings(engine)
+    app.add_middleware(TracingMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
 
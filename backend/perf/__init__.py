@@ -0,0 +1 @@
+# Performance tooling: in-process harness, load tests and benchmarks
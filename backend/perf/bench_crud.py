@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the crud hot paths, with stored baselines.
+
+Each benchmark runs against databases of several sizes, described as
+BARBERSxAPPOINTMENTS_PER_BARBERxSERVICES_PER_APPOINTMENT (e.g. 20x200x2).
+Results are compared to the stored baseline and the run fails when any
+benchmark is slower than the baseline by more than the threshold.
+
+Baselines are machine specific: record them on the machine that runs the check.
+
+Examples:
+    python -m perf.bench_crud --save-baseline
+    python -m perf.bench_crud --threshold 0.15
+    python -m perf.bench_crud --size 100x1000x3 --no-compare
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+from perf.harness import prepare_environment
+
+# Keep the app away from the development database and mailbox
+prepare_environment(os.path.join(tempfile.gettempdir(), "barbershop-bench-unused.db"), 2525)
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import crud  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.email_service import email_service  # noqa: E402
+from app.models import Shop, Barber, Service, Appointment, appointment_services  # noqa: E402
+from app.schemas import AppointmentCreate  # noqa: E402
+
+DEFAULT_SIZES = ["3x20x1", "20x200x2", "50x1000x3"]
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", "0.25"))
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "crud.json")
+
+WORK_START = dtime(9, 0)
+WORK_END = dtime(18, 0)
+
+
+def parse_size(size: str):
+    barbers, appointments, services = (int(part) for part in size.lower().split("x"))
+    return barbers, appointments, services
+
+
+def build_database(path: str, barbers: int, appointments_per_barber: int, services_per_appointment: int):
+    """Create a database of the given size with bulk inserts and return a session factory"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    services_per_barber = max(4, services_per_appointment)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Shop), [{"id": 1, "name": "Bench Shop", "slug": "bench", "is_active": True}])
+        conn.execute(insert(Barber), [
+            {"id": b, "shop_id": 1, "name": f"Barber {b}", "description": "Benchmark barber", "is_active": True}
+            for b in range(1, barbers + 1)
+        ])
+        conn.execute(insert(Service), [
+            {
+                "id": (b - 1) * services_per_barber + s,
+                "shop_id": 1,
+                "barber_id": b,
+                "name": f"Service {s}",
+                "price": 20.0 + s,
+                "duration_minutes": 15 + 5 * (s % 4),
+                "is_active": True,
+            }
+            for b in range(1, barbers + 1) for s in range(1, services_per_barber + 1)
+        ])
+
+        appointment_rows, association_rows = [], []
+        appointment_id = 0
+        first_day = date.today() + timedelta(days=1)
+        for b in range(1, barbers + 1):
+            service_ids = [(b - 1) * services_per_barber + s for s in range(1, services_per_appointment + 1)]
+            duration = sum(15 + 5 * (s % 4) for s in range(1, services_per_appointment + 1))
+            step = timedelta(minutes=30 * -(-duration // 30))
+            current = datetime.combine(first_day, WORK_START)
+            for i in range(appointments_per_barber):
+                if (current + step).time() > WORK_END or (current + step).date() != current.date():
+                    current = datetime.combine(current.date() + timedelta(days=1), WORK_START)
+                appointment_id += 1
+                appointment_rows.append({
+                    "id": appointment_id,
+                    "shop_id": 1,
+                    "barber_id": b,
+                    "client_name": f"Client {appointment_id}",
+                    "client_email": f"client{appointment_id}@example.com",
+                    "client_phone": "555-0100",
+                    "appointment_datetime": current,
+                    # Every fourth booking is cancelled, like real traffic
+                    "status": "cancelled" if i % 4 == 3 else "confirmed",
+                    "cancellation_token": f"bench-{appointment_id}",
+                })
+                association_rows.extend({"appointment_id": appointment_id, "service_id": s} for s in service_ids)
+                current += step
+        if appointment_rows:
+            conn.execute(insert(Appointment), appointment_rows)
+            conn.execute(insert(appointment_services), association_rows)
+
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def measure(func, number: int, repeat: int) -> float:
+    """Median seconds per call over `repeat` rounds of `number` calls"""
+    func()  # warm-up
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    return statistics.median(rounds)
+
+
+def booking_payload(barber_id: int, service_ids, when: datetime) -> dict:
+    return {
+        "barber_id": barber_id,
+        "service_ids": service_ids,
+        "client_name": "Bench Client",
+        "client_email": "bench@example.com",
+        "client_phone": "+1 (555) 010-0199",
+        "appointment_datetime": when,
+        "notes": "benchmark",
+    }
+
+
+def email_payload() -> dict:
+    return {
+        "client_name": "Bench Client",
+        "client_email": "bench@example.com",
+        "barber_name": "Barber 1",
+        "service_name": "Service 1, Service 2",
+        "appointment_datetime": "2030-01-01 10:00",
+        "duration_minutes": 45,
+        "price": 42.0,
+        "notes": "benchmark",
+        "cancellation_token": "bench-token",
+        "cancellation_url": "http://localhost:3000/cancel/bench-token",
+        "appointment_id": 1,
+    }
+
+
+def run_size_benchmarks(size: str, workdir: str, number: int, repeat: int) -> dict:
+    """Run the database-backed hot paths against one data size"""
+    barbers, appointments_per_barber, services_per_appointment = parse_size(size)
+    engine, session_factory = build_database(
+        os.path.join(workdir, f"bench-{size}.db"), barbers, appointments_per_barber, services_per_appointment
+    )
+    services_per_barber = max(4, services_per_appointment)
+    barber_id = barbers  # the last barber, so the scan is not helped by insertion order
+    service_ids = [(barber_id - 1) * services_per_barber + s for s in range(1, services_per_appointment + 1)]
+    busy_day = date.today() + timedelta(days=1)
+    free_slot = datetime.combine(date.today() + timedelta(days=3650), dtime(10, 0))
+
+    results = {}
+    db = session_factory()
+    try:
+        results[f"check_appointment_conflict[{size}]"] = measure(
+            lambda: crud.check_appointment_conflict(db, barber_id, free_slot, 30, shop_id=1), number, repeat
+        )
+        # Time the slot computation itself, not the availability cache in front of it
+        results[f"get_available_time_slots[{size}]"] = measure(
+            lambda: crud.compute_available_time_slots(db, barber_id, busy_day, 30, shop_id=1), max(1, number // 10), repeat
+        )
+
+        next_slot = [free_slot]
+
+        def create():
+            next_slot[0] += timedelta(hours=1)
+            crud.create_appointment(db, AppointmentCreate(**booking_payload(barber_id, service_ids, next_slot[0])))
+
+        results[f"create_appointment[{size}]"] = measure(create, number, repeat)
+    finally:
+        db.close()
+        engine.dispose()
+    return results
+
+
+def run_static_benchmarks(number: int, repeat: int) -> dict:
+    """Hot paths that do not depend on data size"""
+    payload = booking_payload(1, [1, 2], datetime(2030, 1, 1, 10, 0))
+    appointment_data = email_payload()
+    return {
+        "AppointmentCreate.validate_phone": measure(lambda: AppointmentCreate(**payload), number * 10, repeat),
+        "EmailService.render_booking_confirmation": measure(
+            lambda: email_service.render_booking_confirmation(appointment_data), number, repeat
+        ),
+        "EmailService.render_cancellation_confirmation": measure(
+            lambda: email_service.render_cancellation_confirmation(appointment_data), number, repeat
+        ),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print a comparison table and return the names of regressed benchmarks"""
+    regressions = []
+    print(f"{'benchmark':60} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:60} {'-':>12} {seconds * 1e6:10.1f}us {'new':>8}")
+            continue
+        change = (seconds - base) / base
+        flag = " REGRESSED" if change > threshold else ""
+        print(f"{name:60} {base * 1e6:10.1f}us {seconds * 1e6:10.1f}us {change:+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark crud hot paths against stored baselines")
+    parser.add_argument("--size", action="append", help="BARBERSxAPPOINTMENTS_PER_BARBERxSERVICES_PER_APPOINTMENT (repeatable)")
+    parser.add_argument("--number", type=int, default=50, help="calls per timing round")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per benchmark")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing, as a fraction (default: BENCH_THRESHOLD or 0.25)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--no-compare", action="store_true", help="only print results")
+    args = parser.parse_args(argv)
+
+    results = run_static_benchmarks(args.number, args.repeat)
+    with tempfile.TemporaryDirectory(prefix="barbershop-bench-") as workdir:
+        for size in args.size or DEFAULT_SIZES:
+            results.update(run_size_benchmarks(size, workdir, args.number, args.repeat))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.no_compare or args.save_baseline:
+        for name, seconds in results.items():
+            print(f"{name:60} {seconds * 1e6:10.1f}us")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Overhead of the rate limiter: the token bucket itself and the middleware per request.
+
+The middleware is timed around a trivial ASGI app, called directly without a
+server, so the numbers are the limiter's own cost rather than network noise.
+
+Examples:
+    python -m perf.bench_ratelimit
+    python -m perf.bench_ratelimit --requests 200000 --clients 1,1000,100000
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from app.middleware import RateLimitMiddleware
+from app.ratelimit import RateLimitRule, TokenBucketStore
+
+# Generous limits: the benchmark measures the allowed path, which is what real traffic takes
+RULES = [RateLimitRule("availability", "GET", r"^/api/barbers/\d+/available-slots$", 1e9, 10**9)]
+
+
+def bench_store(clients: int, calls: int, maxsize: int) -> float:
+    """Nanoseconds per consume() when requests rotate over `clients` keys"""
+    store = TokenBucketStore(maxsize)
+    keys = [("availability", f"10.0.{i // 256}.{i % 256}") for i in range(clients)]
+    started = time.perf_counter()
+    for i in range(calls):
+        store.consume(keys[i % clients], 1e9, 10**9)
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+async def _empty_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _drive(app, requests: int, clients: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {
+            "type": "http", "method": "GET", "path": "/api/barbers/1/available-slots",
+            "headers": [], "client": (f"10.0.{i // 256}.{i % 256}", 50000),
+        }
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % clients], receive, send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def bench_middleware(requests: int, clients: int, repeat: int) -> tuple:
+    """Median microseconds per request without and with the middleware"""
+    limited = RateLimitMiddleware(_empty_app, rules=RULES, backend=TokenBucketStore(max(clients, 1)))
+    bare, wrapped = [], []
+    for _ in range(repeat):
+        bare.append(asyncio.run(_drive(_empty_app, requests, clients)))
+        wrapped.append(asyncio.run(_drive(limited, requests, clients)))
+    return statistics.median(bare), statistics.median(wrapped)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure rate limiter overhead")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--clients", default="1,1000,100000", help="comma separated distinct client counts")
+    parser.add_argument("--max-clients", type=int, default=10000, help="LRU bound for the store benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'clients':>8} {'consume ns':>11} {'bare us/req':>12} {'limited us/req':>15} {'overhead us':>12}")
+    for clients in (int(count) for count in args.clients.split(",")):
+        consume_ns = bench_store(clients, args.requests, args.max_clients)
+        bare_us, limited_us = bench_middleware(args.requests, clients, args.repeat)
+        print(f"{clients:8d} {consume_ns:11.0f} {bare_us:12.2f} {limited_us:15.2f} {limited_us - bare_us:12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark of large list pages: ORM + Pydantic response_model + stdlib json versus
+column tuples + orjson (the FastJSONResponse path).
+
+Examples:
+    python -m perf.bench_serialization
+    python -m perf.bench_serialization --pages 1000,10000 --appointments 50000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from perf.harness import prepare_environment
+
+prepare_environment(os.path.join(tempfile.mkdtemp(prefix="barbershop-bench-"), "serialization.db"), 2525)
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from app import crud, schemas  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.generate_data import generate  # noqa: E402
+from app.init_db import init_db  # noqa: E402
+from app.models import Appointment, Barber  # noqa: E402
+from app.serialization import dumps  # noqa: E402
+
+
+def timed(func, repeat: int) -> float:
+    """Median milliseconds per call"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def pydantic_appointments(page_size: int) -> bytes:
+    db = SessionLocal()
+    try:
+        appointments = db.query(Appointment).options(
+            joinedload(Appointment.barber), joinedload(Appointment.services)
+        ).order_by(Appointment.id).limit(page_size).all()
+        content = [schemas.AppointmentWithDetails.model_validate(a).model_dump(mode="json") for a in appointments]
+        return json.dumps(content).encode()
+    finally:
+        db.close()
+
+
+def fast_appointments(page_size: int) -> bytes:
+    db = SessionLocal()
+    try:
+        return dumps(crud.get_appointments_with_details(db, limit=page_size))
+    finally:
+        db.close()
+
+
+def pydantic_barbers(page_size: int) -> bytes:
+    db = SessionLocal()
+    try:
+        barbers = db.query(Barber).filter(Barber.is_active == True).limit(page_size).all()
+        for barber in barbers:
+            barber.services = crud.get_services_by_barber(db, barber.id)
+        content = [schemas.BarberWithServices.model_validate(b).model_dump(mode="json") for b in barbers]
+        db.rollback()
+        return json.dumps(content).encode()
+    finally:
+        db.close()
+
+
+def fast_barbers(page_size: int) -> bytes:
+    db = SessionLocal()
+    try:
+        # Bypass the catalog cache to time the query and encode path itself
+        crud.cache.invalidate_catalog()
+        return dumps(crud.get_catalog_barbers(db, limit=page_size))
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark list endpoint serialization")
+    parser.add_argument("--pages", default="100,1000,5000", help="comma separated page sizes")
+    parser.add_argument("--appointments", type=int, default=20000)
+    parser.add_argument("--barbers", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    init_db(seed_sample_data=False)
+    generate(barbers=args.barbers, services_per_barber=8, appointments=args.appointments)
+
+    print(f"{'endpoint':22} {'page':>6} {'pydantic ms':>12} {'fast ms':>10} {'speedup':>8}")
+    for page_size in (int(size) for size in args.pages.split(",")):
+        for name, slow, fast in (
+            ("/admin/appointments", pydantic_appointments, fast_appointments),
+            ("/barbers", pydantic_barbers, fast_barbers),
+        ):
+            slow_ms = timed(lambda: slow(page_size), args.repeat)
+            fast_ms = timed(lambda: fast(page_size), args.repeat)
+            print(f"{name:22} {page_size:6d} {slow_ms:12.1f} {fast_ms:10.1f} {slow_ms / fast_ms:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
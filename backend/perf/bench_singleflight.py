@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Request coalescing under a burst of identical availability requests.
+
+Each round empties the availability cache for one barber and releases N threads
+at once, all asking for the same (barber, date, duration) slots. Without
+coalescing every thread that misses the cache recomputes the day; with it, one
+computation serves them all, so the number of SQL statements stays flat as N grows.
+
+Examples:
+    python -m perf.bench_singleflight
+    python -m perf.bench_singleflight --concurrency 1,10,100,200 --rounds 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from perf.harness import prepare_environment
+
+# Keep the app away from the development database and mailbox
+prepare_environment(os.path.join(tempfile.gettempdir(), "barbershop-bench-unused.db"), 2525)
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from app import cache, crud  # noqa: E402
+from perf.bench_crud import build_database  # noqa: E402
+
+
+class _NoCoalescing:
+    """Stand-in for singleflight.Group that lets every caller compute"""
+
+    def do(self, key, func):
+        return func(), False
+
+
+def burst(session_factory, concurrency: int, barber_id: int, day: date, duration: int) -> float:
+    """Release `concurrency` identical requests together; returns seconds until all answered"""
+    cache.invalidate_availability([barber_id])
+    barrier = threading.Barrier(concurrency + 1)
+    errors = []
+
+    def client():
+        db = session_factory()
+        try:
+            barrier.wait()
+            crud.get_available_time_slots(db, barber_id, day, duration, shop_id=1)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure availability request coalescing")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma separated numbers of simultaneous requests")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--appointments", type=int, default=200, help="bookings per barber in the test database")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "singleflight.db")
+        build_database(path, barbers=2, appointments_per_barber=args.appointments, services_per_appointment=2)[0].dispose()
+        # One connection per thread, so the pool never limits the burst
+        engine = create_engine(f"sqlite:///{path}", poolclass=NullPool, connect_args={"check_same_thread": False})
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        statements = 0
+        lock = threading.Lock()
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            nonlocal statements
+            with lock:
+                statements += 1
+
+        day = date.today() + timedelta(days=1)
+        crud.sweep_expired_holds(session_factory(), force=True)  # the periodic sweep stays out of the counts
+        coalescing = cache.availability_flights
+
+        print(f"{'clients':>8} {'queries (off)':>14} {'queries (on)':>13} {'ms (off)':>9} {'ms (on)':>8}")
+        for concurrency in (int(count) for count in args.concurrency.split(",")):
+            results = {}
+            for mode, group in (("off", _NoCoalescing()), ("on", coalescing)):
+                cache.availability_flights = group
+                queries, timings = [], []
+                for _ in range(args.rounds):
+                    statements = 0
+                    timings.append(burst(session_factory, concurrency, 1, day, 30) * 1000)
+                    queries.append(statements)
+                results[mode] = (statistics.median(queries), statistics.median(timings))
+            cache.availability_flights = coalescing
+            (off_queries, off_ms), (on_queries, on_ms) = results["off"], results["on"]
+            print(f"{concurrency:8d} {off_queries:14.0f} {on_queries:13.0f} {off_ms:9.1f} {on_ms:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
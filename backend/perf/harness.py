@@ -0,0 +1,159 @@
+"""
+In-process test harness for performance runs.
+Boots the FastAPI app against a throwaway SQLite database and a local SMTP sink,
+so load tests and benchmarks never touch the development database or a real mailbox.
+
+The environment has to be prepared before anything under `app` is imported,
+because the engine and settings are created at import time.
+"""
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_environment(db_path: str, smtp_port: int) -> None:
+    """Point the app at a local database and SMTP sink (must run before importing app)"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(smtp_port)
+    os.environ["SMTP_USER"] = ""
+    os.environ["SMTP_PASSWORD"] = ""
+    os.environ["SMTP_USE_TLS"] = "false"
+    # Load tests drive every request from 127.0.0.1
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+
+def find_free_port() -> int:
+    """Ask the OS for a free TCP port on localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: accepts every message and discards it"""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 localhost smtp-sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 localhost")
+            elif command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                self.server.record_message()
+                self.reply("250 OK: queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL FROM, RCPT TO, RSET, NOOP
+                self.reply("250 OK")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Threaded SMTP server that counts delivered messages"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _SmtpHandler)
+        self.port = self.server_address[1]
+        self.message_count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record_message(self) -> None:
+        with self._lock:
+            self.message_count += 1
+
+    def start(self) -> "SmtpSink":
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class AppServer:
+    """Runs the real ASGI app under uvicorn in a background thread"""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="uvicorn", daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "AppServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("App server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+class Harness:
+    """
+    Context manager bundling a seeded temporary database, the SMTP sink and the app server.
+
+    Usage:
+        with Harness() as harness:
+            urlopen(harness.base_url + "/api/barbers")
+    """
+
+    def __init__(self, workdir: str = None, keep_db: bool = False):
+        self.workdir = workdir or tempfile.mkdtemp(prefix="barbershop-perf-")
+        self.db_path = os.path.join(self.workdir, "perf.db")
+        self.keep_db = keep_db
+        self.smtp = None
+        self.server = None
+
+    @property
+    def base_url(self) -> str:
+        return self.server.base_url
+
+    def __enter__(self) -> "Harness":
+        self.smtp = SmtpSink().start()
+        prepare_environment(self.db_path, self.smtp.port)
+
+        # Importing main creates the tables and seeds the sample catalog
+        import main
+
+        self.server = AppServer(main.app, find_free_port()).start()
+        logger.info("App serving %s (db: %s)", self.base_url, self.db_path)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.server:
+            self.server.stop()
+        if self.smtp:
+            self.smtp.stop()
+        if not self.keep_db and os.path.exists(self.db_path):
+            os.remove(self.db_path)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the booking flow.
+
+Boots the app in-process (see perf/harness.py) and drives client sessions that follow
+the booking funnel: browse catalog -> list services -> query slots -> book -> check -> cancel.
+Per-endpoint latency percentiles and throughput are reported as JSON so runs can be
+compared between versions.
+
+Examples:
+    python -m perf.load_test --concurrency 16 --duration 30 --output run.json
+    python -m perf.load_test --mix browse --sessions 500 --compare run.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from perf.harness import Harness
+
+logger = logging.getLogger(__name__)
+
+# Probability that a session continues to the next step of the funnel
+MIXES = {
+    "browse": {"services": 0.6, "slots": 0.5, "book": 0.05, "check": 0.5, "cancel": 0.1},
+    "default": {"services": 0.8, "slots": 0.7, "book": 0.3, "check": 0.6, "cancel": 0.2},
+    "booking": {"services": 1.0, "slots": 1.0, "book": 0.9, "check": 0.8, "cancel": 0.3},
+}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+class Recorder:
+    """Thread-safe collection of latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, status: int, elapsed: float) -> None:
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+
+    def report(self, wall_time: float) -> dict:
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            statuses = dict(self.statuses[endpoint])
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": sum(count for code, count in statuses.items() if code >= 500 or code == 0),
+                "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+                "throughput_rps": round(len(values) / wall_time, 2) if wall_time else 0.0,
+                "latency_ms": {
+                    "mean": round(sum(values) / len(values) * 1000, 3),
+                    "p50": round(percentile(values, 50) * 1000, 3),
+                    "p95": round(percentile(values, 95) * 1000, 3),
+                    "p99": round(percentile(values, 99) * 1000, 3),
+                    "max": round(values[-1] * 1000, 3),
+                },
+            }
+        total = sum(item["requests"] for item in endpoints.values())
+        return {
+            "total_requests": total,
+            "total_errors": sum(item["errors"] for item in endpoints.values()),
+            "throughput_rps": round(total / wall_time, 2) if wall_time else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class Client:
+    """Keep-alive HTTP client bound to one worker thread"""
+
+    def __init__(self, port: int, recorder: Recorder):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.recorder = recorder
+
+    def request(self, method: str, endpoint: str, path: str, body: dict = None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, "/api" + path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.recorder.record(f"{method} {endpoint}", 0, time.perf_counter() - started)
+            return 0, None
+        self.recorder.record(f"{method} {endpoint}", status, time.perf_counter() - started)
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        self.conn.close()
+
+
+def run_session(client: Client, rng: random.Random, mix: dict) -> None:
+    """Walk one client through the booking funnel"""
+    status, barbers = client.request("GET", "/barbers", "/barbers")
+    if status != 200 or not barbers:
+        return
+    barber = rng.choice(barbers)
+
+    if rng.random() >= mix["services"]:
+        return
+    status, services = client.request("GET", "/barbers/{id}/services", f"/barbers/{barber['id']}/services")
+    if status != 200 or not services:
+        return
+    chosen = rng.sample(services, k=min(len(services), rng.choice((1, 1, 2))))
+    duration = sum(service["duration_minutes"] for service in chosen)
+
+    if rng.random() >= mix["slots"]:
+        return
+    slots = []
+    for _ in range(rng.randint(1, 3)):
+        day = (date.today() + timedelta(days=rng.randint(1, 14))).isoformat()
+        status, result = client.request(
+            "GET", "/barbers/{id}/available-slots",
+            f"/barbers/{barber['id']}/available-slots?date={day}&duration_minutes={duration}",
+        )
+        if status == 200 and result["slots"]:
+            slots = result["slots"]
+    if not slots or rng.random() >= mix["book"]:
+        return
+
+    slot = rng.choice(slots)
+    client_id = rng.randint(0, 99999)
+    status, appointment = client.request("POST", "/appointments", "/appointments", {
+        "barber_id": barber["id"],
+        "service_ids": [service["id"] for service in chosen],
+        "client_name": f"Load Test {client_id}",
+        "client_email": f"load{client_id}@example.com",
+        "client_phone": f"555-{client_id:05d}",
+        "appointment_datetime": slot["datetime"],
+        "notes": "load test",
+    })
+    if status != 200:
+        return
+    token = appointment["cancellation_token"]
+
+    if rng.random() < mix["check"]:
+        client.request("GET", "/appointments/check/{token}", f"/appointments/check/{token}")
+    if rng.random() < mix["cancel"]:
+        client.request("POST", "/appointments/cancel/{token}", f"/appointments/cancel/{token}")
+
+
+def run_load(base_port: int, concurrency: int, duration: float, sessions: int, mix: dict, seed: int) -> dict:
+    """Run sessions on `concurrency` threads until the duration or session budget is spent"""
+    recorder = Recorder()
+    counter_lock = threading.Lock()
+    started_sessions = [0]
+    deadline = time.monotonic() + duration if duration else None
+
+    def next_session() -> bool:
+        if deadline and time.monotonic() >= deadline:
+            return False
+        with counter_lock:
+            if sessions and started_sessions[0] >= sessions:
+                return False
+            started_sessions[0] += 1
+            return True
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        client = Client(base_port, recorder)
+        try:
+            while next_session():
+                run_session(client, rng, mix)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    report = recorder.report(wall_time)
+    report["sessions"] = started_sessions[0]
+    report["wall_time_s"] = round(wall_time, 3)
+    return report
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Print per-endpoint p50/p95/p99 deltas against a previous run"""
+    print(f"{'endpoint':45} {'metric':6} {'before':>10} {'after':>10} {'change':>8}", file=sys.stderr)
+    for endpoint, stats in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][metric], stats["latency_ms"][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"{endpoint:45} {metric:6} {old:10.2f} {new:10.2f} {change:+7.1f}%", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the booking flow against an in-process server")
+    parser.add_argument("--concurrency", type=int, default=8, help="number of concurrent client threads")
+    parser.add_argument("--duration", type=float, default=20.0, help="run time in seconds (0 = until --sessions)")
+    parser.add_argument("--sessions", type=int, default=0, help="total client sessions (0 = until --duration)")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default", help="traffic mix")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="previous JSON report to print latency deltas against")
+    parser.add_argument("--keep-db", action="store_true", help="keep the temporary database after the run")
+    args = parser.parse_args(argv)
+
+    if not args.duration and not args.sessions:
+        parser.error("one of --duration or --sessions must be non-zero")
+
+    logging.basicConfig(level=logging.WARNING)
+    with Harness(keep_db=args.keep_db) as harness:
+        from main import app
+
+        report = run_load(harness.server.port, args.concurrency, args.duration, args.sessions, MIXES[args.mix], args.seed)
+        report.update({
+            "app_version": app.version,
+            "started_at": datetime.utcnow().isoformat(),
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+            "emails_delivered": harness.smtp.message_count,
+        })
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 1 if report["total_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
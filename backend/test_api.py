@@ -36,7 +36,7 @@ def test_create_appointment(barber_id, service_id):
     # Create appointment data
     appointment_data = {
         "barber_id": barber_id,
-        "service_id": service_id,
+        "service_ids": [service_id],
         "client_name": "API Test User",
         "client_email": "apitest@example.com",
         "client_phone": "555-0123",
@@ -52,19 +52,19 @@ def test_create_appointment(barber_id, service_id):
     
     assert response.status_code == 200
     appointment = response.json()
-    assert appointment["status"] == "pending"
-    assert "confirmation_token" in appointment
+    assert appointment["status"] == "confirmed"
+    assert "cancellation_token" in appointment
     print(f"✅ Created appointment with ID {appointment['id']}")
     return appointment
 
-def test_confirm_appointment(token):
-    """Test confirming an appointment"""
-    print(f"Testing GET /appointments/confirm/{token}...")
-    response = requests.get(f"{BASE_URL}/appointments/confirm/{token}")
+def test_check_appointment(token):
+    """Test checking an appointment by its cancellation token"""
+    print(f"Testing GET /appointments/check/{token}...")
+    response = requests.get(f"{BASE_URL}/appointments/check/{token}")
     assert response.status_code == 200
     result = response.json()
-    assert "appointment_id" in result
-    print(f"✅ Confirmed appointment {result['appointment_id']}")
+    assert result["status"] == "confirmed"
+    print(f"✅ Checked appointment {result['appointment_id']}")
 
 def test_admin_appointments():
     """Test getting all appointments (admin endpoint)"""
@@ -116,7 +116,7 @@ def run_tests():
         
         # Test appointment flow
         appointment = test_create_appointment(barbers[0]["id"], services[0]["id"])
-        test_confirm_appointment(appointment["confirmation_token"])
+        test_check_appointment(appointment["cancellation_token"])
         
         # Test admin endpoints
         test_admin_appointments()
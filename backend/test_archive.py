@@ -0,0 +1,36 @@
+"""
+Archival job tests.
+
+Archived appointments keep their ids in appointments_archive, so a booking made
+after the newest one was archived must get a fresh id.
+"""
+from datetime import datetime
+
+from app import archive, crud, schemas
+from app.models import Appointment, ArchivedAppointment, Barber, Service
+
+
+def _book(db, at, client_name):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name=client_name,
+        client_email="archive@example.com",
+        client_phone="+1 555-0144",
+        appointment_datetime=at,
+    ))
+
+
+def test_archived_newest_id_is_not_reused(db):
+    cutoff = datetime(2021, 1, 1)
+    first = _book(db, datetime(2020, 6, 1, 10, 0), "Archived First").id
+    assert db.query(Appointment.id).order_by(Appointment.id.desc()).limit(1).scalar() == first
+    assert archive.archive_batch(db, cutoff, 1000) > 0
+
+    second = _book(db, datetime(2020, 6, 2, 10, 0), "Archived Second").id
+    assert second > first
+    assert archive.archive_batch(db, cutoff, 1000) == 1
+    archived = db.query(ArchivedAppointment.client_name).filter(ArchivedAppointment.id.in_([first, second]))
+    assert sorted(name for (name,) in archived) == ["Archived First", "Archived Second"]
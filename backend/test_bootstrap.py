@@ -0,0 +1,40 @@
+"""
+Booking bootstrap tests.
+
+Uncached availability days are computed on the pool the app creates in its
+lifespan; expired holds are swept once, in the request's session, before any
+worker starts, so the workers only read.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import main
+from app import cache, crud
+from app.database import SessionLocal
+
+
+def test_pool_lives_with_the_app():
+    with TestClient(main.app) as client:
+        pool = main.app.state.bootstrap_pool
+        response = client.get("/api/booking/bootstrap", params={"days": 2})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["barbers"]
+        assert all(len(entry["days"]) == 2 for entry in body["availability"])
+    assert pool._shutdown
+    assert not hasattr(main.app.state, "bootstrap_pool")
+
+
+def test_holds_are_swept_once_before_the_workers(db, monkeypatch):
+    sweeps = []
+    monkeypatch.setattr(crud, "sweep_expired_holds", lambda session, force=False: sweeps.append(session) or 0)
+    cache.availability_cache.clear()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        computed = crud.get_booking_bootstrap(db, SessionLocal, days=3, executor=pool)
+    assert sweeps == [db]
+
+    # Without a pool the same days are computed inline
+    cache.availability_cache.clear()
+    assert crud.get_booking_bootstrap(db, SessionLocal, days=3) == computed
+    assert sweeps == [db, db]
@@ -0,0 +1,73 @@
+"""
+Cache-Control tests.
+
+Each policy class of app/middleware.py CACHE_POLICIES: public catalog lists,
+revalidated single-barber and admin catalog reads, short-lived availability,
+and private admin and token endpoints. Catalog responses carry an ETag that a
+repeated read can send back for an empty 304.
+"""
+from app.config import settings
+from app.models import Barber
+
+
+def _barber_id(db):
+    return db.query(Barber.id).filter(Barber.is_active == True).order_by(Barber.id).limit(1).scalar()
+
+
+def test_catalog_list_is_public_with_etag(client):
+    response = client.get("/api/barbers")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == (
+        f"public, max-age={settings.catalog_max_age}, "
+        f"stale-while-revalidate={settings.catalog_stale_while_revalidate}"
+    )
+    assert "Authorization" in response.headers["vary"]
+    etag = response.headers["etag"]
+
+    again = client.get("/api/barbers", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_single_barber_and_admin_reads_are_revalidated(client, db):
+    barber_id = _barber_id(db)
+    for path, headers in [
+        (f"/api/barbers/{barber_id}", {}),
+        (f"/api/barbers/{barber_id}/services", {}),
+        (f"/api/barbers/{barber_id}/services?include_inactive=true", {}),
+        ("/api/shops?include_inactive=true", {}),
+        ("/api/barbers", {"Authorization": "Bearer admin-token"}),
+    ]:
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, path
+        assert response.headers["cache-control"] == "private, no-cache", path
+        assert client.get(path, headers={**headers, "If-None-Match": response.headers["etag"]}).status_code == 304, path
+
+    # The ETag follows the body, so another body's tag does not match
+    services_etag = client.get(f"/api/barbers/{barber_id}/services").headers["etag"]
+    assert client.get(f"/api/barbers/{barber_id}", headers={"If-None-Match": services_etag}).status_code == 200
+
+
+def test_availability_is_briefly_public(client, db):
+    response = client.get(f"/api/barbers/{_barber_id(db)}/available-slots", params={"date": "2034-05-02", "duration_minutes": 30})
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == f"public, max-age={settings.availability_max_age}"
+    assert "etag" not in response.headers
+
+
+def test_private_endpoints_are_never_stored(client):
+    for response in [
+        client.get("/api/admin/appointments"),
+        client.post("/api/auth/login", json={"username": "nobody", "password": "wrong"}),
+        client.get("/api/appointments/cancel/not-a-token"),
+    ]:
+        assert response.headers["cache-control"] == "no-store"
+        assert "etag" not in response.headers
+
+
+def test_errors_are_not_cached(client):
+    response = client.get("/api/barbers/999999")
+    assert response.status_code == 404
+    assert response.headers["cache-control"] == "no-cache"
+    assert "etag" not in response.headers
@@ -0,0 +1,90 @@
+"""
+Barber calendar feed tests.
+
+The .ics body escapes text values and folds long lines at 75 octets; cancelled
+bookings leave the feed. Polls with the feed's ETag get a 304 until the
+barber's schedule changes.
+"""
+from datetime import datetime, timedelta
+
+from app import calendar_feed, crud, schemas
+from app.models import Barber, Service
+
+
+def _feed(db):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    path = f"/api/barbers/{barber.id}/calendar.ics?token={crud.get_calendar_token(db, barber.id)}"
+    return barber, service, path
+
+
+def _book(db, barber, service, at, client_name, notes=None):
+    return crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name=client_name,
+        client_email="calendar@example.com",
+        client_phone="+1 555-0188",
+        appointment_datetime=at,
+        notes=notes,
+    ))
+
+
+def _unfold(body):
+    return body.replace("\r\n ", "")
+
+
+def test_escaping_and_folding():
+    assert calendar_feed.escape_text("a,b;c\\d\ne") == "a\\,b\\;c\\\\d\\ne"
+    line = "DESCRIPTION:" + "é" * 60
+    folded = calendar_feed.fold_line(line)
+    physical = folded.split("\r\n")[:-1]
+    assert len(physical) > 1
+    assert all(len(part.encode("utf-8")) <= 75 for part in physical)
+    assert all(part.startswith(" ") for part in physical[1:])
+    assert _unfold(folded) == line + "\r\n"
+
+
+def test_feed_body(client, db):
+    barber, service, path = _feed(db)
+    start = (datetime.now() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+    notes = "Beard, then trim; bring photo " + "x" * 80
+    kept = _book(db, barber, service, start, "Ann, O'Neil", notes=notes)
+    cancelled = _book(db, barber, service, start + timedelta(hours=2), "Cancelled Client")
+    assert crud.cancel_appointment(db, cancelled.cancellation_token) is not None
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    body = response.text
+    assert body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n")
+    assert all(len(line.encode("utf-8")) <= 75 for line in body.split("\r\n"))
+
+    lines = _unfold(body).split("\r\n")
+    event = lines[lines.index(f"UID:appointment-{kept.id}@barbershop") - 1:]
+    event = event[:event.index("END:VEVENT") + 1]
+    assert f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}" in event
+    assert f"DTEND:{(start + timedelta(minutes=service.duration_minutes)).strftime('%Y%m%dT%H%M%S')}" in event
+    assert f"SUMMARY:{service.name} - Ann\\, O'Neil" in event
+    assert f"DESCRIPTION:Client: Ann\\, O'Neil\\nPhone: +1 555-0188\\nNotes: Beard\\, then trim\\; bring photo {'x' * 80}" in event
+    assert f"UID:appointment-{cancelled.id}@barbershop" not in lines
+
+
+def test_unchanged_schedule_is_not_modified(client, db):
+    barber, service, path = _feed(db)
+    first = client.get(path)
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    # A booking bumps the schedule version, so the old ETag is stale
+    _book(db, barber, service, (datetime.now() + timedelta(days=3)).replace(hour=11, minute=0, second=0, microsecond=0), "New Client")
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    assert client.get(path.split("?")[0] + "?token=wrong").status_code == 404
@@ -0,0 +1,104 @@
+"""
+Bulk catalog update tests.
+
+PUT /admin/catalog/bulk applies every barber and service update of a batch or
+none of them: one unknown id, inactive barber or missing shop in the batch
+leaves the catalog, the change log and the calendar feeds untouched.
+"""
+from sqlalchemy import func, update
+
+from app import changes, crud, schemas
+from app.models import Barber, ChangeLogEntry, Service
+
+
+def _catalog(db):
+    barbers = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).all()
+    services = db.query(Service).filter(Service.barber_id == barbers[0].id).order_by(Service.id).all()
+    return barbers, services
+
+
+def _last_change(db):
+    return db.query(func.max(ChangeLogEntry.id)).scalar() or 0
+
+
+def _admin_headers(client):
+    response = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_merged_updates_are_applied_together(db):
+    barbers, services = _catalog(db)
+    barber, service = barbers[0], services[0]
+    version = barber.schedule_version or 0
+    last_change = _last_change(db)
+
+    result = crud.bulk_update_catalog(
+        db,
+        [schemas.BarberBulkUpdate(id=barber.id, name="Renamed Barber")],
+        [
+            schemas.ServiceBulkUpdate(id=service.id, price=41.0),
+            # A later update of the same service adds to the first one
+            schemas.ServiceBulkUpdate(id=service.id, duration_minutes=50),
+            schemas.ServiceBulkUpdate(id=services[1].id, is_active=False),
+        ],
+    )
+    assert result == {"updated_barber_ids": [barber.id], "updated_service_ids": sorted([service.id, services[1].id])}
+
+    db.expire_all()
+    assert db.get(Barber, barber.id).name == "Renamed Barber"
+    assert (db.get(Service, service.id).price, db.get(Service, service.id).duration_minutes) == (41.0, 50)
+    assert db.get(Service, services[1].id).is_active is False
+    # Names and durations show in the barber's calendar feed
+    assert db.get(Barber, barber.id).schedule_version > version
+    logged = db.query(ChangeLogEntry.entity, ChangeLogEntry.entity_id).filter(ChangeLogEntry.id > last_change).all()
+    assert sorted(logged) == sorted([
+        (changes.BARBER, barber.id), (changes.SERVICE, service.id), (changes.SERVICE, services[1].id),
+    ])
+
+
+def test_one_failure_rejects_the_whole_batch(db):
+    barbers, services = _catalog(db)
+    inactive = barbers[-1]
+    db.execute(update(Barber).where(Barber.id == inactive.id).values(is_active=False))
+    db.commit()
+    prices = {service.id: service.price for service in services}
+    last_change = _last_change(db)
+
+    result = crud.bulk_update_catalog(
+        db,
+        [
+            schemas.BarberBulkUpdate(id=barbers[0].id, name="Never Applied"),
+            # Inactive barbers cannot be edited, like with the single-row update
+            schemas.BarberBulkUpdate(id=inactive.id, name="Still Inactive"),
+            schemas.BarberBulkUpdate(id=barbers[1].id, shop_id=999999),
+        ],
+        [schemas.ServiceBulkUpdate(id=service.id, price=1.0) for service in services]
+        + [schemas.ServiceBulkUpdate(id=999999, price=1.0)],
+    )
+    assert result == {"missing_barber_ids": [inactive.id], "missing_service_ids": [999999], "missing_shop_ids": [999999]}
+
+    db.expire_all()
+    assert db.get(Barber, barbers[0].id).name != "Never Applied"
+    assert db.get(Barber, inactive.id).name != "Still Inactive"
+    assert {service.id: db.get(Service, service.id).price for service in services} == prices
+    assert _last_change(db) == last_change
+
+
+def test_endpoint_reports_missing_ids(client, db):
+    barbers, services = _catalog(db)
+    headers = _admin_headers(client)
+    response = client.put("/api/admin/catalog/bulk", headers=headers, json={
+        "barbers": [{"id": barbers[0].id, "name": "Not Saved"}],
+        "services": [{"id": services[0].id, "price": 2.0}, {"id": 999999, "price": 2.0}],
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"]["missing_service_ids"] == [999999]
+    db.expire_all()
+    assert db.get(Service, services[0].id).price != 2.0
+
+    response = client.put("/api/admin/catalog/bulk", headers=headers, json={
+        "services": [{"id": services[0].id, "price": 2.0}],
+    })
+    assert response.status_code == 200
+    assert response.json() == {"updated_barber_ids": [], "updated_service_ids": [services[0].id]}
+    assert client.put("/api/admin/catalog/bulk", json={"services": []}).status_code in (401, 403)
@@ -0,0 +1,86 @@
+"""
+Schema compatibility tests for the fast JSON list responses.
+
+The column-tuple rows + orjson path used by /barbers and /admin/appointments must
+produce exactly what the Pydantic response models produce from ORM objects.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import joinedload
+
+from app import crud, schemas
+from app.database import SessionLocal
+from app.models import Appointment, Barber, Service
+from app.serialization import dumps
+
+
+@pytest.fixture(scope="module", autouse=True)
+def appointments(database):
+    """Bookings covering cancelled rows, missing notes, multiple and inactive services"""
+    db = SessionLocal()
+    try:
+        services = db.query(Service).order_by(Service.id).all()
+        services[1].is_active = False
+        start = datetime(2031, 3, 3, 9, 0)
+        for i in range(30):
+            barber_services = [s for s in services if s.barber_id == services[i % len(services)].barber_id]
+            appointment = Appointment(
+                shop_id=1,
+                barber_id=barber_services[0].barber_id,
+                client_name=f"Client {i}",
+                client_email=f"client{i}@example.com",
+                client_phone="+1 555-0100",
+                appointment_datetime=start + timedelta(hours=i),
+                status="cancelled" if i % 3 == 0 else "confirmed",
+                cancellation_token=f"token-{i}",
+                notes=None if i % 2 else "Ünïcode note ✂",
+                confirmed_at=datetime(2031, 1, 1, 12, 0, tzinfo=timezone.utc) if i % 2 else None,
+            )
+            appointment.services = barber_services[: 1 + i % 3]
+            db.add(appointment)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pydantic_json(model, objects):
+    return json.loads(json.dumps([model.model_validate(obj).model_dump(mode="json") for obj in objects]))
+
+
+def test_barbers_match_response_model(db):
+    barbers = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).all()
+    for barber in barbers:
+        barber.services = sorted(crud.get_services_by_barber(db, barber.id), key=lambda s: s.id)
+    expected = _pydantic_json(schemas.BarberWithServices, barbers)
+    db.rollback()
+    fast = json.loads(dumps(crud.get_catalog_barbers(db)))
+    assert fast == expected
+
+
+def test_admin_appointments_match_response_model(db):
+    appointments = db.query(Appointment).options(
+        joinedload(Appointment.barber), joinedload(Appointment.services)
+    ).order_by(Appointment.id).all()
+    for appointment in appointments:
+        appointment.services.sort(key=lambda s: s.id)
+    expected = _pydantic_json(schemas.AppointmentWithDetails, appointments)
+    db.rollback()
+    fast = json.loads(dumps(crud.get_appointments_with_details(db, limit=1000)))
+    assert len(fast) == 30
+    assert fast == expected
+
+
+def test_admin_appointments_filters_and_paging(db):
+    cancelled = crud.get_appointments_with_details(db, status="cancelled", limit=1000)
+    page = crud.get_appointments_with_details(db, skip=5, limit=5)
+    assert cancelled and all(a["status"] == "cancelled" for a in cancelled)
+    assert [a["client_name"] for a in page] == [f"Client {i}" for i in range(5, 10)]
+
+
+def test_utc_datetimes_use_z_suffix():
+    aware = datetime(2031, 1, 1, 12, 0, tzinfo=timezone.utc)
+    assert json.loads(dumps({"at": aware}))["at"] == schemas.AdminUser(
+        id=1, username="a", email="a@example.com", is_active=True, created_at=aware
+    ).model_dump(mode="json")["created_at"]
@@ -0,0 +1,108 @@
+"""
+Group booking tests.
+
+A party is booked with several barbers at the same start, all or nothing: when
+one requested barber is busy, or a write fails midway, no member of the party is booked.
+The availability search takes client times with a UTC offset as wall-clock time.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import changes, crud, schemas
+from app.models import Appointment, Barber, Service
+
+SERVICE_NAME = "Group Trim"
+
+
+def _group_barbers(db):
+    """Active barbers of the default shop, each offering SERVICE_NAME"""
+    barbers = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).all()
+    barbers = [barber for barber in barbers if barber.shop_id == barbers[0].shop_id]
+    for barber in barbers:
+        if not db.query(Service).filter(Service.barber_id == barber.id, Service.name == SERVICE_NAME).count():
+            crud.create_service(db, schemas.ServiceCreate(barber_id=barber.id, name=SERVICE_NAME, price=20.0, duration_minutes=30))
+    return barbers
+
+
+def _group(at, party_size, barber_ids, client_name):
+    return schemas.GroupBookingCreate(
+        client_name=client_name,
+        client_email="group@example.com",
+        client_phone="+1 555-0122",
+        appointment_datetime=at,
+        party_size=party_size,
+        service_names=[SERVICE_NAME],
+        barber_ids=barber_ids,
+    )
+
+
+def _booked(db, client_name):
+    return sorted(barber_id for (barber_id,) in db.query(Appointment.barber_id).filter(Appointment.client_name == client_name))
+
+
+def test_group_is_booked_with_preferred_barbers(db):
+    barbers = _group_barbers(db)
+    assert len(barbers) >= 3
+    preferred = [barbers[2].id, barbers[0].id, barbers[1].id]
+    appointments, chosen = crud.create_group_booking(db, _group(datetime(2034, 9, 5, 11, 0), 2, preferred, "Group Party"))
+    assert chosen == preferred[:2]
+    assert [appointment.barber_id for appointment in appointments] == preferred[:2]
+    assert {appointment.appointment_datetime for appointment in appointments} == {datetime(2034, 9, 5, 11, 0)}
+    assert _booked(db, "Group Party") == sorted(preferred[:2])
+
+
+def test_one_busy_member_books_nobody(db):
+    barbers = _group_barbers(db)
+    start = datetime(2034, 9, 6, 11, 0)
+    busy = barbers[1]
+    service = db.query(Service).filter(Service.barber_id == busy.id, Service.name == SERVICE_NAME).first()
+    crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=busy.id,
+        service_ids=[service.id],
+        client_name="Solo Client",
+        client_email="solo@example.com",
+        client_phone="+1 555-0123",
+        appointment_datetime=start,
+    ))
+
+    requested = [barbers[0].id, busy.id]
+    appointments, free = crud.create_group_booking(db, _group(start, 2, requested, "Blocked Party"))
+    assert appointments == []
+    assert free == [barbers[0].id]
+    assert _booked(db, "Blocked Party") == []
+
+    # A hold blocks a member just like a booking
+    hold_start = datetime(2034, 9, 7, 11, 0)
+    crud.create_slot_hold(db, busy.id, busy.shop_id, hold_start, 30)
+    appointments, free = crud.create_group_booking(db, _group(hold_start, 2, requested, "Held Party"))
+    assert (appointments, free) == ([], [barbers[0].id])
+    assert _booked(db, "Held Party") == []
+
+
+def test_failed_write_books_nobody(db, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("change log unavailable")
+
+    monkeypatch.setattr(changes, "record", fail)
+    barbers = _group_barbers(db)
+    with pytest.raises(RuntimeError):
+        crud.create_group_booking(db, _group(datetime(2034, 9, 8, 11, 0), 2, [barbers[0].id, barbers[1].id], "Failed Party"))
+    assert _booked(db, "Failed Party") == []
+
+
+
+def test_group_availability_accepts_timezone_aware_window(client, db):
+    barbers = _group_barbers(db)
+    start = (datetime.now() + timedelta(days=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+    response = client.get("/api/availability/group", params={
+        "party_size": 2,
+        "services": [SERVICE_NAME],
+        "shop_id": barbers[0].shop_id,
+        "start": start.replace(tzinfo=timezone.utc).isoformat(),
+        "end": (start + timedelta(days=2)).replace(tzinfo=timezone.utc).isoformat(),
+    })
+    assert response.status_code == 200
+    slots = response.json()["slots"]
+    assert slots
+    assert all(start <= datetime.fromisoformat(slot["datetime"]) < start + timedelta(days=2) for slot in slots)
@@ -0,0 +1,75 @@
+"""
+Slot hold tests.
+
+A booking made with a hold consumes it in its own transaction: a hold books at
+most one appointment, and an expired hold books none. A hold on a taken slot
+is a 409, and holds are rate limited apart from bookings.
+"""
+from datetime import datetime, timedelta
+
+from app import crud, ratelimit, schemas
+from app.config import settings
+from app.models import Appointment, Barber, Service, SlotHold
+
+
+def _hold_and_booking(db, start):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    hold = crud.create_slot_hold(db, barber.id, barber.shop_id, start, service.duration_minutes)
+    booking = schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name="Hold Client",
+        client_email="hold@example.com",
+        client_phone="+1 555-0142",
+        appointment_datetime=start,
+        hold_token=hold.token,
+    )
+    return hold.token, booking
+
+
+def _bookings_at(db, start):
+    return db.query(Appointment).filter(Appointment.appointment_datetime == start).count()
+
+
+def test_hold_books_one_appointment(db):
+    start = datetime(2033, 5, 2, 10, 0)
+    token, booking = _hold_and_booking(db, start)
+    assert crud.create_appointment(db, booking) is not None
+    assert db.query(SlotHold).filter(SlotHold.token == token).count() == 0
+
+    # A second request that passed its checks before the first committed
+    assert crud.create_appointment(db, booking) is None
+    assert _bookings_at(db, start) == 1
+
+
+def test_expired_hold_books_nothing(db):
+    start = datetime(2033, 5, 3, 10, 0)
+    token, booking = _hold_and_booking(db, start)
+    db.query(SlotHold).filter(SlotHold.token == token).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    assert crud.create_appointment(db, booking) is None
+    assert _bookings_at(db, start) == 0
+    assert crud.get_active_hold(db, token) is None
+
+
+
+def test_taken_slot_is_a_conflict(client, db):
+    start = datetime(2033, 5, 4, 10, 0)
+    _, booking = _hold_and_booking(db, start)
+    response = client.post("/api/holds", json={
+        "barber_id": booking.barber_id,
+        "service_ids": booking.service_ids,
+        "appointment_datetime": start.isoformat(),
+    })
+    assert response.status_code == 409
+
+
+def test_holds_have_their_own_rate_limit():
+    rules = {rule.name: rule for rule in ratelimit.default_rules()}
+    assert (rules["holds"].per_minute, rules["holds"].burst) == (
+        settings.rate_limit_holds_per_minute, settings.rate_limit_holds_burst
+    )
+    # Clicking through a few slots must not use up the booking allowance
+    assert rules["holds"].burst > rules["booking"].burst
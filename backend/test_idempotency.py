@@ -0,0 +1,71 @@
+"""
+Idempotency-Key tests for booking and cancellation.
+
+A retry with the same key and payload gets the stored response back, body and
+status, without the handler running again; a different payload is refused.
+"""
+from app.models import Appointment, Barber, Service
+
+
+def _booking(db, at, client_name="Retry Client"):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return {
+        "barber_id": barber.id,
+        "service_ids": [service.id],
+        "client_name": client_name,
+        "client_email": "retry@example.com",
+        "client_phone": "+1 555-0188",
+        "appointment_datetime": at,
+    }
+
+
+def _count(db, client_name):
+    return db.query(Appointment).filter(Appointment.client_name == client_name).count()
+
+
+def test_booking_replay_returns_identical_body(client, db):
+    booking = _booking(db, "2034-04-04T10:00:00", "Replay Client")
+    headers = {"Idempotency-Key": "booking-replay"}
+    first = client.post("/api/appointments", json=booking, headers=headers)
+    assert first.status_code == 200
+
+    retry = client.post("/api/appointments", json=booking, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.content == first.content
+    assert _count(db, "Replay Client") == 1
+
+    # The same key with another payload is a client bug, not a retry
+    changed = client.post("/api/appointments", json={**booking, "notes": "changed"}, headers=headers)
+    assert changed.status_code == 422
+    assert _count(db, "Replay Client") == 1
+
+
+def test_client_errors_are_replayed(client, db):
+    booking = _booking(db, "2034-04-05T10:00:00", "Taken Client")
+    assert client.post("/api/appointments", json=booking).status_code == 200
+
+    headers = {"Idempotency-Key": "booking-conflict"}
+    conflict = _booking(db, "2034-04-05T10:00:00", "Late Client")
+    first = client.post("/api/appointments", json=conflict, headers=headers)
+    assert first.status_code == 400
+    retry = client.post("/api/appointments", json=conflict, headers=headers)
+    assert (retry.status_code, retry.json()) == (first.status_code, first.json())
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert _count(db, "Late Client") == 0
+
+
+def test_cancellation_replay_returns_identical_body(client, db):
+    booked = client.post("/api/appointments", json=_booking(db, "2034-04-06T10:00:00", "Cancel Client")).json()
+    headers = {"Idempotency-Key": "cancel-replay"}
+    first = client.post(f"/api/appointments/cancel/{booked['cancellation_token']}", headers=headers)
+    assert first.status_code == 200
+
+    retry = client.post(f"/api/appointments/cancel/{booked['cancellation_token']}", headers=headers)
+    assert (retry.status_code, retry.json()) == (200, first.json())
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    # Without the key the second cancellation is a new request, and fails
+    assert client.post(f"/api/appointments/cancel/{booked['cancellation_token']}").status_code == 400
+
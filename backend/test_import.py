@@ -0,0 +1,87 @@
+"""
+Bulk appointment import tests.
+
+Covers the validation and conflict sweep of crud.bulk_import_appointments:
+timezone-aware times, repeated service ids, active holds and overlaps within
+one batch.
+"""
+from datetime import datetime, timedelta, timezone
+
+from app import crud, schemas
+from app.models import Appointment, Barber, Service
+
+
+def _row(barber_id, service_ids, at, client="Import Client"):
+    return schemas.AppointmentImportRow(
+        barber_id=barber_id,
+        service_ids=service_ids,
+        client_name=client,
+        client_email="import@example.com",
+        client_phone="+1 555-0199",
+        appointment_datetime=at,
+    )
+
+
+def _barber_and_service(db):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return barber.id, service
+
+
+def test_timezone_aware_rows_are_stored_as_wall_clock(db):
+    barber_id, service = _barber_and_service(db)
+    at = datetime(2033, 11, 2, 10, 0, tzinfo=timezone.utc)
+    created, errors = crud.bulk_import_appointments(db, [(1, _row(barber_id, [service.id], at))])
+    assert errors == {}
+    assert len(created) == 1
+    assert db.get(Appointment, created[0]).appointment_datetime == datetime(2033, 11, 2, 10, 0)
+
+    # An aware row is checked against the naive bookings already stored
+    created_again, errors = crud.bulk_import_appointments(db, [(1, _row(barber_id, [service.id], at))])
+    assert created_again == []
+    assert errors == {1: [f"Conflicts with existing appointment {created[0]}"]}
+
+
+def test_repeated_service_is_counted_once(db):
+    barber_id, service = _barber_and_service(db)
+    at = datetime(2033, 11, 3, 9, 0)
+    created, errors = crud.bulk_import_appointments(db, [
+        (1, _row(barber_id, [service.id, service.id], at)),
+        # Starts when the first booking ends, since its service only counts once
+        (2, _row(barber_id, [service.id], at + timedelta(minutes=service.duration_minutes))),
+    ])
+    assert errors == {}
+    assert len(created) == 2
+    assert [s.id for s in db.get(Appointment, created[0]).services] == [service.id]
+
+
+def test_overlap_within_batch_rejects_later_row(db):
+    barber_id, service = _barber_and_service(db)
+    at = datetime(2033, 11, 4, 9, 0)
+    rows = [
+        (1, _row(barber_id, [service.id], at.replace(tzinfo=timezone.utc), client="First")),
+        (2, _row(barber_id, [service.id], at + timedelta(minutes=1), client="Second")),
+    ]
+    created, errors = crud.bulk_import_appointments(db, rows)
+    assert errors == {2: ["Overlaps row 1"]}
+    assert [db.get(Appointment, i).client_name for i in created] == ["First"]
+
+    created, errors = crud.bulk_import_appointments(db, [
+        (1, _row(barber_id, [service.id], at + timedelta(days=1))),
+        (2, _row(barber_id, [service.id], at + timedelta(days=1, minutes=1))),
+    ], atomic=True)
+    assert created == []
+    assert list(errors) == [2]
+
+
+def test_active_hold_blocks_row(db):
+    barber_id, service = _barber_and_service(db)
+    at = datetime(2033, 11, 5, 9, 0)
+    barber = db.get(Barber, barber_id)
+    crud.create_slot_hold(db, barber_id, barber.shop_id, at + timedelta(minutes=15), service.duration_minutes)
+    created, errors = crud.bulk_import_appointments(db, [
+        (1, _row(barber_id, [service.id], at)),
+        (2, _row(barber_id, [service.id], at + timedelta(hours=3))),
+    ])
+    assert errors == {1: ["Slot is being held by another client"]}
+    assert len(created) == 1
@@ -0,0 +1,86 @@
+"""
+Lifecycle job tests.
+
+Past confirmed appointments are completed in batches; each shop's checkpoint
+limits the next run to newer rows, and a shop leased by another worker is skipped.
+"""
+from datetime import datetime, timedelta
+
+from app import changes, crud, lifecycle, schemas
+from app.models import Appointment, Barber, ChangeLogEntry, JobCheckpoint, Service
+
+
+def _book(db, at, client_name):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name=client_name,
+        client_email="lifecycle@example.com",
+        client_phone="+1 555-0155",
+        appointment_datetime=at,
+    )), barber.shop_id
+
+
+def _statuses(db, ids):
+    db.expire_all()
+    return [db.get(Appointment, appointment_id).status for appointment_id in ids]
+
+
+def test_completes_past_appointments_in_batches(db):
+    start = datetime(2020, 3, 2, 9, 0)
+    past = [_book(db, start + timedelta(hours=i), f"Past {i}")[0].id for i in range(5)]
+    cancelled, shop_id = _book(db, start + timedelta(hours=6), "Past Cancelled")
+    crud.update_appointment(db, cancelled.id, schemas.AppointmentUpdate(status="cancelled"))
+    later = _book(db, datetime(2020, 3, 4, 9, 0), "After Cutoff")[0].id
+    last_change = db.query(ChangeLogEntry.id).order_by(ChangeLogEntry.id.desc()).limit(1).scalar()
+
+    cutoff = datetime(2020, 3, 3)
+    assert lifecycle.complete_past_appointments(db, cutoff=cutoff, batch_size=2) == 5
+    assert _statuses(db, past) == ["completed"] * 5
+    assert _statuses(db, [cancelled.id, later]) == ["cancelled", "confirmed"]
+
+    # One change log row per completed appointment, written with its batch
+    logged = db.query(ChangeLogEntry.entity_id).filter(
+        ChangeLogEntry.id > last_change, ChangeLogEntry.entity == changes.APPOINTMENT
+    ).all()
+    assert sorted(entity_id for (entity_id,) in logged) == sorted(past)
+
+    checkpoint = db.get(JobCheckpoint, f"{lifecycle.JOB_NAME}:{shop_id}", populate_existing=True)
+    assert checkpoint.position == cutoff
+    assert checkpoint.lease_owner is None
+
+
+def test_checkpoint_skips_rows_before_previous_cutoff(db):
+    # Rescheduled into time an earlier run already covered
+    late, _ = _book(db, datetime(2020, 3, 2, 17, 0), "Moved Back")
+    upcoming, _ = _book(db, datetime(2020, 3, 5, 9, 0), "Upcoming")
+
+    assert lifecycle.complete_past_appointments(db, cutoff=datetime(2020, 3, 6)) == 2
+    assert _statuses(db, [late.id, upcoming.id]) == ["confirmed", "completed"]
+
+    assert lifecycle.complete_past_appointments(db, cutoff=datetime(2020, 3, 6), full=True) == 1
+    assert _statuses(db, [late.id]) == ["completed"]
+
+
+def test_leased_shop_is_skipped(db):
+    appointment, shop_id = _book(db, datetime(2020, 3, 9, 9, 0), "Leased Shop")
+    name = f"{lifecycle.JOB_NAME}:{shop_id}"
+    assert lifecycle.acquire_lease(db, name, "other-worker", 60) is not None
+    assert lifecycle.acquire_lease(db, name, "this-worker", 60) is None
+
+    assert lifecycle.complete_past_appointments(db, cutoff=datetime(2020, 3, 10), owner="this-worker") == 0
+    assert _statuses(db, [appointment.id]) == ["confirmed"]
+    # A batch by a worker that does not hold the lease writes nothing
+    assert lifecycle.complete_batch(db, shop_id, None, datetime(2020, 3, 10), 10, name, "this-worker", 60) == -1
+    assert _statuses(db, [appointment.id]) == ["confirmed"]
+
+    # An expired lease can be taken over
+    db.query(JobCheckpoint).filter(JobCheckpoint.name == name).update(
+        {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    assert lifecycle.complete_past_appointments(db, cutoff=datetime(2020, 3, 10), owner="this-worker") == 1
+    assert _statuses(db, [appointment.id]) == ["completed"]
+
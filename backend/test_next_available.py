@@ -0,0 +1,75 @@
+"""
+Next available slot search tests.
+
+GET /api/availability/next takes the window from the client, which may send
+times with a UTC offset; they are compared as shop wall-clock time. Each
+barber's free slots are merged in start order, and the search stops at the
+limit or at the end of the window, whichever comes first.
+"""
+from datetime import datetime, timedelta, timezone
+
+from app import crud, schemas
+from app.models import Barber, Service
+
+
+def test_timezone_aware_window_is_accepted(client):
+    start = (datetime.now() + timedelta(days=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+    response = client.get("/api/availability/next", params={
+        "duration_minutes": 30,
+        "start": start.replace(tzinfo=timezone.utc).isoformat(),
+        "end": (start + timedelta(days=2)).replace(tzinfo=timezone.utc).isoformat(),
+    })
+    assert response.status_code == 200
+    slots = response.json()["slots"]
+    assert slots
+    assert all(start <= datetime.fromisoformat(slot["datetime"]) < start + timedelta(days=2) for slot in slots)
+
+
+def _block_morning(db, day, free_barber_index):
+    """Book every barber of the first shop at opening except one; returns (shop_id, barbers)"""
+    barbers = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).all()
+    barbers = [barber for barber in barbers if barber.shop_id == barbers[0].shop_id]
+    for index, barber in enumerate(barbers):
+        if index == free_barber_index:
+            continue
+        service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+        crud.create_appointment(db, schemas.AppointmentCreate(
+            barber_id=barber.id,
+            service_ids=[service.id],
+            client_name="Morning Client",
+            client_email="morning@example.com",
+            client_phone="+1 555-0111",
+            appointment_datetime=datetime.combine(day, crud.WORK_START),
+        ))
+    return barbers[0].shop_id, barbers
+
+
+def test_earliest_slot_across_barbers_comes_first(db):
+    day = datetime(2034, 10, 2)
+    shop_id, barbers = _block_morning(db, day, free_barber_index=1)
+    assert len(barbers) >= 2
+    opening = datetime.combine(day, crud.WORK_START)
+
+    slots = crud.get_next_available_slots(db, day, day + timedelta(days=7), 2 * len(barbers), duration_minutes=30, shop_id=shop_id)
+    assert len(slots) == 2 * len(barbers)
+    assert (slots[0]["barber_id"], slots[0]["datetime"]) == (barbers[1].id, opening.isoformat())
+    # Merged in start order; nobody else is offered the booked opening slot
+    keys = [(slot["datetime"], slot["barber_id"]) for slot in slots]
+    assert keys == sorted(keys)
+    assert [slot["barber_id"] for slot in slots if slot["datetime"] == opening.isoformat()] == [barbers[1].id]
+
+
+def test_search_stops_at_limit_and_horizon(db):
+    day = datetime(2034, 10, 9)
+    shop_id, barbers = _block_morning(db, day, free_barber_index=0)
+    opening = datetime.combine(day, crud.WORK_START)
+
+    # Only the opening slot starts before the horizon
+    horizon = opening + timedelta(minutes=crud.SLOT_INTERVAL_MINUTES)
+    slots = crud.get_next_available_slots(db, day, horizon, 50, duration_minutes=30, shop_id=shop_id)
+    assert [(slot["barber_id"], slot["datetime"]) for slot in slots] == [(barbers[0].id, opening.isoformat())]
+
+    # The limit is honoured even when the window holds many more slots
+    slots = crud.get_next_available_slots(db, day, day + timedelta(days=30), 3, duration_minutes=30, shop_id=shop_id)
+    assert len(slots) == 3
+    assert all(datetime.fromisoformat(slot["datetime"]) < day + timedelta(days=1) for slot in slots)
@@ -0,0 +1,78 @@
+"""
+Rate limit tests.
+
+RateLimitMiddleware answers 429 with Retry-After once a client's bucket for a
+rule is empty. Buckets are kept per client and per rule, so one client or one
+endpoint running out leaves the others alone. The API's rules take their
+limits from the RATE_LIMIT_* settings.
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import ratelimit
+from app.config import settings
+from app.middleware import RateLimitMiddleware
+
+# Two requests at once, then one every 30 seconds
+RULES = [
+    ratelimit.RateLimitRule("slots", "GET", r"^/slots$", 2, 2),
+    ratelimit.RateLimitRule("book", "POST", r"^/book$", 2, 2),
+]
+
+
+def _client():
+    app = FastAPI()
+    app.get("/slots")(lambda: {"ok": True})
+    app.post("/book")(lambda: {"ok": True})
+    app.get("/other")(lambda: {"ok": True})
+    app.add_middleware(RateLimitMiddleware, rules=RULES, backend=ratelimit.TokenBucketStore())
+    return TestClient(app)
+
+
+def test_exceeding_a_rule_returns_429_with_retry_after():
+    client = _client()
+    assert [client.get("/slots").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/slots")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 30
+    # Paths without a rule, and other methods on a limited path, are not counted
+    assert client.get("/other").status_code == 200
+    assert client.post("/slots").status_code == 405
+
+
+def test_buckets_are_per_client_and_per_rule(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trust_proxy", True)
+    client = _client()
+    first = {"X-Forwarded-For": "203.0.113.1, 10.0.0.1"}
+    second = {"X-Forwarded-For": "203.0.113.2"}
+    assert [client.get("/slots", headers=first).status_code for _ in range(3)] == [200, 200, 429]
+
+    assert client.get("/slots", headers=second).status_code == 200
+    assert client.post("/book", headers=first).status_code == 200
+    assert client.get("/slots", headers=first).status_code == 429
+
+
+def test_bucket_store_refills_and_evicts():
+    store = ratelimit.TokenBucketStore(maxsize=2)
+    assert store.consume("a", 1000, 1) == 0
+    assert store.consume("a", 0.5, 1) > 0
+    store.consume("b", 1, 1)
+    store.consume("c", 1, 1)
+    assert len(store) == 2
+    # The least recently used key was dropped and starts with a full bucket
+    assert store.consume("a", 0.5, 1) == 0
+
+
+def test_configured_limits_apply_to_the_api(monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "rate_limit_holds_per_minute", 1)
+    monkeypatch.setattr(settings, "rate_limit_holds_burst", 1)
+    client = TestClient(RateLimitMiddleware(main.app, backend=ratelimit.TokenBucketStore()))
+    hold = {"barber_id": 999999, "service_ids": [1], "appointment_datetime": "2034-01-02T10:00:00"}
+    assert client.post("/api/holds", json=hold).status_code == 404
+    response = client.post("/api/holds", json=hold)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) == 60
+    # Other rules keep their own, default sized buckets
+    assert client.get("/api/availability/next", params={"duration_minutes": 30}).status_code == 200
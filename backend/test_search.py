@@ -0,0 +1,79 @@
+"""
+Appointment search tests.
+
+The FTS5 index follows every insert, update and delete on appointments through
+its triggers; words match as prefixes and phone numbers by their last digits.
+The LIKE path used without FTS5 must find the same appointments; it runs here
+with SQLite standing in for PostgreSQL's regexp_replace.
+"""
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, update
+
+from app import crud, schemas, search
+from app.models import Appointment, Barber, Service, appointment_services
+
+
+def _book(db, at, client_name, client_email, client_phone):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name=client_name,
+        client_email=client_email,
+        client_phone=client_phone,
+        appointment_datetime=at,
+    )).id
+
+
+@pytest.fixture
+def like_search(db):
+    """search.like_search_ids on SQLite, with a regexp_replace like PostgreSQL's"""
+    db.connection().connection.driver_connection.create_function(
+        "regexp_replace", 4, lambda value, pattern, replacement, flags: re.sub(pattern, replacement, value)
+    )
+    return lambda query: search.like_search_ids(db, search.query_terms(query), 50)
+
+
+def test_prefix_and_phone_suffix_matching(db, like_search):
+    first = _book(db, datetime(2034, 11, 6, 9, 0), "Johanna Smithers", "johanna@example.com", "+1 (555) 010-0199")
+    second = _book(db, datetime(2034, 11, 6, 11, 0), "John Smith", "jsmith@example.com", "+44 20 7946 0958")
+
+    for find in (lambda query: search.search_appointment_ids(db, query), like_search):
+        assert find("jo smi") == [second, first]
+        assert find("johann") == [first]
+        assert find("0100199") == [first]
+        assert find("555 0100199") == [first]
+        assert find("79460958") == [second]
+        assert find("jsmith") == [second]
+    assert search.search_appointment_ids(db, " - ") == []
+    # FTS5 matches word prefixes only, the LIKE path any substring
+    assert search.search_appointment_ids(db, "mith") == []
+    assert like_search("mith") == [second, first]
+
+
+def test_index_follows_edits_and_deletes(db, like_search):
+    appointment_id = _book(db, datetime(2034, 11, 7, 9, 0), "Edited Client", "edited@example.com", "+1 555-0170")
+    assert search.search_appointment_ids(db, "edited") == [appointment_id]
+
+    db.execute(update(Appointment).where(Appointment.id == appointment_id).values(
+        client_name="Renamed Customer", client_phone="+1 555-0171"
+    ))
+    db.commit()
+    for find in (lambda query: search.search_appointment_ids(db, query), like_search):
+        assert find("edited client") == []
+        assert find("renamed") == [appointment_id]
+        assert find("5550171") == [appointment_id]
+        assert find("5550170") == []
+        # The email was not changed and is still found
+        assert find("edited@example") == [appointment_id]
+
+    db.execute(delete(appointment_services).where(appointment_services.c.appointment_id == appointment_id))
+    db.execute(delete(Appointment).where(Appointment.id == appointment_id))
+    db.commit()
+    for find in (lambda query: search.search_appointment_ids(db, query), like_search):
+        assert find("renamed") == []
+        assert find("edited@example") == []
@@ -0,0 +1,59 @@
+"""
+Recurring appointment series tests.
+
+Occurrences that clash with a booking or a hold are reported and skipped, or,
+when the series is atomic, nothing at all is booked.
+"""
+from datetime import date, datetime, timedelta
+
+from app import crud, schemas
+from app.models import Appointment, Barber, Service
+
+
+def _series_request(barber_id, service_id, first, client_name):
+    return schemas.AppointmentCreate(
+        barber_id=barber_id,
+        service_ids=[service_id],
+        client_name=client_name,
+        client_email="series@example.com",
+        client_phone="+1 555-0166",
+        appointment_datetime=first,
+    )
+
+
+def _setup(db, first):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    starts = crud.expand_series(first, "weekly", occurrences=4)
+    # A booking in week three and a hold in week four, both overlapping by a few minutes
+    existing = crud.create_appointment(db, _series_request(barber.id, service.id, starts[2] + timedelta(minutes=15), "Existing Client"))
+    crud.create_slot_hold(db, barber.id, barber.shop_id, starts[3] - timedelta(minutes=15), service.duration_minutes)
+    return barber, service, starts, existing
+
+
+def test_expand_series():
+    first = datetime(2034, 1, 2, 9, 0)
+    assert crud.expand_series(first, "weekly", occurrences=3) == [first + timedelta(weeks=i) for i in range(3)]
+    assert crud.expand_series(first, "biweekly", until=date(2034, 1, 30)) == [first + timedelta(weeks=2 * i) for i in range(3)]
+    assert len(crud.expand_series(first, "weekly", occurrences=100, limit=52)) == 52
+
+
+def test_conflicting_occurrences_are_skipped(db):
+    barber, service, starts, existing = _setup(db, datetime(2034, 6, 5, 11, 0))
+    request = _series_request(barber.id, service.id, starts[0], "Series Client")
+    booked, conflicts = crud.create_appointment_series(db, request, starts, [service])
+    assert [appointment.appointment_datetime for appointment in booked] == starts[:2]
+    assert conflicts == [
+        (starts[2], f"Conflicts with existing appointment {existing.id}"),
+        (starts[3], "Slot is being held by another client"),
+    ]
+
+
+def test_atomic_series_books_nothing_on_conflict(db):
+    barber, service, starts, _ = _setup(db, datetime(2034, 8, 7, 11, 0))
+    request = _series_request(barber.id, service.id, starts[0], "Atomic Series Client")
+    booked, conflicts = crud.create_appointment_series(db, request, starts, [service], atomic=True)
+    assert booked == []
+    assert [start for start, _ in conflicts] == starts[2:]
+    assert db.query(Appointment).filter(Appointment.client_name == "Atomic Series Client").count() == 0
+
@@ -0,0 +1,52 @@
+"""
+Daily stats rollup tests.
+
+The rollups that crud keeps current on every write must match what
+rebuild_daily_stats recomputes, also after catalog prices change.
+"""
+from datetime import date, datetime, timedelta
+
+from app import crud, schemas
+from app.models import Barber, DailyBarberStats, Service
+
+
+def _rollup(db, start, end):
+    return {
+        (row.barber_id, row.day): (row.booked_count, row.cancelled_count, row.booked_minutes, round(row.revenue, 2))
+        for row in db.query(DailyBarberStats).filter(DailyBarberStats.day >= start, DailyBarberStats.day <= end)
+        if row.booked_count or row.cancelled_count
+    }
+
+
+def test_rollup_matches_recompute_after_price_change(db):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    booked_price = service.price
+    start = datetime(2034, 2, 6, 9, 0)
+
+    def book(at):
+        return crud.create_appointment(db, schemas.AppointmentCreate(
+            barber_id=barber.id,
+            service_ids=[service.id],
+            client_name="Stats Client",
+            client_email="stats@example.com",
+            client_phone="+1 555-0177",
+            appointment_datetime=at,
+        ))
+
+    cancelled = book(start)
+    moved = book(start + timedelta(hours=2))
+    kept = book(start + timedelta(hours=4))
+    crud.update_service(db, service.id, schemas.ServiceUpdate(price=booked_price + 25))
+
+    assert crud.cancel_appointment(db, cancelled.cancellation_token) is not None
+    crud.update_appointment(db, moved.id, schemas.AppointmentUpdate(appointment_datetime=start + timedelta(days=1)))
+    crud.update_appointment(db, kept.id, schemas.AppointmentUpdate(status="completed"))
+
+    first_day, last_day = date(2034, 2, 6), date(2034, 2, 7)
+    maintained = _rollup(db, first_day, last_day)
+    assert maintained[(barber.id, first_day)] == (1, 1, service.duration_minutes, round(booked_price, 2))
+
+    crud.rebuild_daily_stats(db, first_day, last_day)
+    assert _rollup(db, first_day, last_day) == maintained
+
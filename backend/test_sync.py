@@ -0,0 +1,95 @@
+"""
+Change log and change feed tests.
+
+A change_log row is written in the same transaction as the write it describes:
+committed writes appear in the feed exactly once, and rolled back or rejected
+writes never do.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import changes, crud, schemas
+from app.models import Appointment, Barber, ChangeLogEntry, Service, SlotHold
+
+
+def _cursor(db):
+    return db.query(ChangeLogEntry.id).order_by(ChangeLogEntry.id.desc()).limit(1).scalar() or 0
+
+
+def _logged_since(db, cursor):
+    return [
+        (entity, entity_id, action)
+        for entity, entity_id, action in db.query(ChangeLogEntry.entity, ChangeLogEntry.entity_id, ChangeLogEntry.action)
+        .filter(ChangeLogEntry.id > cursor).order_by(ChangeLogEntry.id)
+    ]
+
+
+def _booking(db, at, client_name):
+    barber = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).first()
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    return schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name=client_name,
+        client_email="sync@example.com",
+        client_phone="+1 555-0111",
+        appointment_datetime=at,
+    )
+
+
+def test_committed_writes_are_logged_once(db):
+    cursor = _cursor(db)
+    appointment = crud.create_appointment(db, _booking(db, datetime(2034, 10, 3, 10, 0), "Synced Client"))
+    crud.update_appointment(db, appointment.id, schemas.AppointmentUpdate(notes="Window seat"))
+    assert _logged_since(db, cursor) == [
+        (changes.APPOINTMENT, appointment.id, "created"),
+        (changes.APPOINTMENT, appointment.id, "updated"),
+    ]
+
+    # The feed keeps only the latest change per entity, with its current row
+    feed = crud.get_changes(db, since=cursor)
+    assert [(change["entity"], change["id"], change["action"]) for change in feed["changes"]] == [
+        (changes.APPOINTMENT, appointment.id, "updated")
+    ]
+    assert feed["changes"][0]["data"]["notes"] == "Window seat"
+    assert feed["changes"][0]["shop_id"] == appointment.shop_id
+    assert crud.get_changes(db, since=feed["next_cursor"])["changes"] == []
+
+
+def test_rejected_writes_are_not_logged(db):
+    cursor = _cursor(db)
+
+    # An expired hold is refused before anything is written
+    booking = _booking(db, datetime(2034, 10, 4, 10, 0), "Expired Hold")
+    barber = db.get(Barber, booking.barber_id)
+    token = crud.create_slot_hold(db, barber.id, barber.shop_id, booking.appointment_datetime, 30).token
+    db.query(SlotHold).filter(SlotHold.token == token).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert crud.create_appointment(db, booking.model_copy(update={"hold_token": token})) is None
+
+    # An atomic import with one bad row writes none of them
+    rows = [
+        (1, schemas.AppointmentImportRow(**_booking(db, datetime(2034, 10, 5, 10, 0), "Import Row").model_dump(exclude={"hold_token"}))),
+        (2, schemas.AppointmentImportRow(**_booking(db, datetime(2034, 10, 5, 10, 0), "Import Row").model_dump(exclude={"hold_token"}))),
+    ]
+    assert crud.bulk_import_appointments(db, rows, atomic=True)[0] == []
+
+    assert _logged_since(db, cursor) == []
+
+
+def test_rolled_back_write_is_not_logged(db, monkeypatch):
+    record = changes.record
+
+    def record_then_fail(*args, **kwargs):
+        record(*args, **kwargs)
+        raise RuntimeError("commit never reached")
+
+    cursor = _cursor(db)
+    monkeypatch.setattr(changes, "record", record_then_fail)
+    with pytest.raises(RuntimeError):
+        crud.create_appointment(db, _booking(db, datetime(2034, 10, 6, 10, 0), "Rolled Back"))
+    db.rollback()
+    assert db.query(Appointment).filter(Appointment.client_name == "Rolled Back").count() == 0
+    assert _logged_since(db, cursor) == []
+
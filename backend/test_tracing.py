@@ -0,0 +1,122 @@
+"""
+Request tracing tests.
+
+Spans opened inside a trace nest under the current span, crud functions wrapped
+by tracing.instrument keep their signatures and results, and the JSON lines sink
+writes one valid record per span.
+"""
+import inspect
+import json
+
+import pytest
+
+from app import crud, tracing
+from app.models import Barber
+
+SAMPLED = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class ListSink:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, traces):
+        self.traces.extend(traces)
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    """A fresh exporter for the test, collecting traces in memory"""
+    exporter = tracing.Exporter()
+    collected = ListSink()
+    exporter.configure(collected)
+    monkeypatch.setattr(tracing, "exporter", exporter)
+    return collected
+
+
+def _traced(name, body, traceparent=SAMPLED):
+    root, token = tracing.start_trace(name, traceparent)
+    try:
+        result = body()
+    finally:
+        tracing.finish_trace(root, token)
+    tracing.exporter.flush()
+    return root, result
+
+
+def test_spans_nest_under_the_current_span(sink):
+    def body():
+        with tracing.span("outer", step=1):
+            with tracing.span("inner"):
+                assert tracing.current_trace_id() == "0af7651916cd43dd8448eb211c80319c"
+            with pytest.raises(ValueError), tracing.span("failing"):
+                raise ValueError("boom")
+
+    root, _ = _traced("GET /test", body)
+    assert tracing.current_trace_id() is None
+    assert root.parent_id == "b7ad6b7169203331"
+    [trace] = sink.traces
+    spans = {recorded.name: recorded for recorded in trace.spans}
+    assert spans["outer"].parent_id == root.span_id
+    assert spans["inner"].parent_id == spans["outer"].span_id
+    assert spans["failing"].parent_id == spans["outer"].span_id
+    assert spans["failing"].error == "ValueError: boom"
+    assert spans["outer"].attributes == {"step": 1}
+    # Children end first; the root is recorded last
+    assert [recorded.name for recorded in trace.spans] == ["inner", "failing", "outer", "GET /test"]
+
+
+def test_unsampled_trace_is_dropped(sink, monkeypatch):
+    monkeypatch.setattr(tracing.settings, "tracing_sample_rate", 0)
+    monkeypatch.setattr(tracing.settings, "tracing_slow_ms", 0)
+    _traced("GET /quiet", lambda: None, traceparent=None)
+    assert sink.traces == []
+    # Outside a trace a span is a no-op
+    with tracing.span("nothing") as current:
+        assert current is None
+
+
+def test_instrumented_crud_keeps_signature_and_result(db, sink, database):
+    namespace = dict(vars(crud))
+    tracing.instrument(namespace, crud.__name__)
+    for name in ("create_appointment", "get_barber", "bulk_update_catalog", "search_appointments"):
+        assert namespace[name] is not getattr(crud, name)
+        assert inspect.signature(namespace[name]) == inspect.signature(getattr(crud, name))
+        assert namespace[name].__doc__ == getattr(crud, name).__doc__
+    # Private helpers and generators are left alone
+    assert namespace["_merge_intervals"] is crud._merge_intervals
+    assert namespace["iter_calendar_appointments"] is crud.iter_calendar_appointments
+
+    barber_id = db.query(Barber.id).order_by(Barber.id).limit(1).scalar()
+    assert namespace["get_barber"](db, barber_id) is crud.get_barber(db, barber_id)
+
+    tracing.instrument_engine(database)
+    root, barber = _traced("GET /barber", lambda: namespace["get_barber"](db, barber_id))
+    assert barber.id == barber_id
+    spans = {recorded.name: recorded for recorded in sink.traces[0].spans}
+    assert spans["crud.get_barber"].parent_id == root.span_id
+    statements = [recorded for recorded in sink.traces[0].spans if recorded.name == "db"]
+    assert statements and all(recorded.parent_id == spans["crud.get_barber"].span_id for recorded in statements)
+
+
+def test_jsonl_sink_writes_one_record_per_span(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.Exporter()
+    exporter.configure(tracing.JsonlSink(str(path)))
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    def body():
+        with tracing.span("work", rows=3):
+            pass
+
+    root, _ = _traced("POST /api/appointments", body)
+    _traced("GET /api/barbers", lambda: None)
+
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [record["name"] for record in records] == ["work", "POST /api/appointments", "GET /api/barbers"]
+    work = records[0]
+    assert work["trace_id"] == root.trace.trace_id
+    assert work["parent_id"] == root.span_id
+    assert work["attributes"] == {"rows": 3}
+    assert work["kind"] == "internal" and records[1]["kind"] == "server"
+    assert all(record["duration_ms"] >= 0 and record["start"].endswith("+00:00") for record in records)
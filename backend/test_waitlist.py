@@ -0,0 +1,92 @@
+"""
+Waitlist and offer queue tests.
+
+A cancellation offers the freed time to matching waiting clients, oldest first
+and at most WAITLIST_OFFERS_PER_SLOT of them; offers are sent from the
+notification queue, which drops work instead of blocking when it is full.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from app import crud, notifications, schemas
+from app.config import settings
+from app.models import Barber, Service, WaitlistEntry
+
+
+def _entry(barber_id, shop_id, earliest, latest, duration_minutes, client):
+    return schemas.WaitlistEntryCreate(
+        barber_id=barber_id,
+        shop_id=shop_id,
+        client_name=client,
+        client_email=f"{client.lower().replace(' ', '.')}@example.com",
+        client_phone="+1 555-0133",
+        earliest=earliest,
+        latest=latest,
+        duration_minutes=duration_minutes,
+    )
+
+
+def test_cancellation_offers_freed_slot_oldest_first(db, monkeypatch):
+    offers = []
+    monkeypatch.setattr(notifications, "queue_waitlist_offer", offers.append)
+    barbers = db.query(Barber).filter(Barber.is_active == True).order_by(Barber.id).limit(2).all()
+    barber, other_barber = barbers
+    service = db.query(Service).filter(Service.barber_id == barber.id, Service.is_active == True).order_by(Service.id).first()
+    start = datetime(2034, 3, 7, 10, 0)
+    appointment = crud.create_appointment(db, schemas.AppointmentCreate(
+        barber_id=barber.id,
+        service_ids=[service.id],
+        client_name="Booked Client",
+        client_email="booked@example.com",
+        client_phone="+1 555-0134",
+        appointment_datetime=start,
+    ))
+
+    window = (start - timedelta(hours=1), start + timedelta(hours=2))
+    created = [
+        crud.create_waitlist_entry(db, _entry(barber.id, barber.shop_id, *window, service.duration_minutes, f"Waiting {i}"), barber.shop_id)
+        for i in range(settings.waitlist_offers_per_slot + 1)
+    ]
+    elsewhere = crud.create_waitlist_entry(
+        db, _entry(other_barber.id, other_barber.shop_id, *window, service.duration_minutes, "Other Barber"), other_barber.shop_id
+    )
+    other_day = crud.create_waitlist_entry(
+        db, _entry(barber.id, barber.shop_id, window[0] + timedelta(days=1), window[1] + timedelta(days=1), service.duration_minutes, "Other Day"),
+        barber.shop_id,
+    )
+    ids = [entry.id for entry in created]
+
+    assert crud.cancel_appointment(db, appointment.cancellation_token) is not None
+    statuses = dict(db.query(WaitlistEntry.id, WaitlistEntry.status).filter(
+        WaitlistEntry.id.in_(ids + [elsewhere.id, other_day.id])
+    ).all())
+    offered = ids[:settings.waitlist_offers_per_slot]
+    assert [statuses[entry_id] for entry_id in offered] == ["notified"] * len(offered)
+    assert statuses[ids[-1]] == statuses[elsewhere.id] == statuses[other_day.id] == "waiting"
+    assert [offer["client_name"] for offer in offers] == [f"Waiting {i}" for i in range(len(offered))]
+    assert {offer["barber_name"] for offer in offers} == {barber.name}
+
+    # Notified entries are not offered the same time again
+    offers.clear()
+    assert crud.offer_freed_slot(db, barber.id, barber.shop_id, start, start + timedelta(minutes=service.duration_minutes)) == 1
+    assert [offer["client_name"] for offer in offers] == [f"Waiting {len(offered)}"]
+
+
+def test_notification_queue_drops_when_full():
+    queue = notifications.NotificationQueue(maxsize=1)
+    started, release = threading.Event(), threading.Event()
+    done = []
+
+    def blocking(label):
+        started.set()
+        release.wait(5)
+        done.append(label)
+
+    assert queue.enqueue(blocking, "first")
+    assert started.wait(5)
+    assert queue.enqueue(done.append, "second")
+    assert not queue.enqueue(done.append, "dropped")
+    release.set()
+    queue.join()
+    assert done == ["first", "second"]
+
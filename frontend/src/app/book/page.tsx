@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useForm } from 'react-hook-form';
 import Link from 'next/link';
 import api from '@/lib/api';
@@ -21,6 +21,18 @@ interface Service {
   duration_minutes: number;
 }
 
+interface TimeSlot {
+  time: string;
+  datetime: string;
+  available: boolean;
+}
+
+interface BarberAvailability {
+  barber_id: number;
+  duration_minutes: number;
+  days: Array<{ date: string; slots: TimeSlot[] }>;
+}
+
 interface BookingForm {
   barber_id: number;
   service_ids: number[];
@@ -59,9 +71,15 @@ export default function BookingPage() {
   const [currentStep, setCurrentStep] = useState(1);
   const [countryCode, setCountryCode] = useState('+383');
   const [selectedDate, setSelectedDate] = useState('');
-  const [availableSlots, setAvailableSlots] = useState<Array<{ time: string; datetime: string; available: boolean }>>([]);
+  const [availableSlots, setAvailableSlots] = useState<TimeSlot[]>([]);
   const [loadingSlots, setLoadingSlots] = useState(false);
   const [selectedSlot, setSelectedSlot] = useState('');
+  // Hold on the selected slot while the form is filled in
+  const holdRef = useRef<{ token: string; datetime: string } | null>(null);
+  // Slots from the bootstrap response by "barber|date|duration", each used once before refetching
+  const prefetchedSlotsRef = useRef<Map<string, TimeSlot[]>>(new Map());
+  // Kept across network failures so a resubmit cannot book twice
+  const idempotencyKeyRef = useRef<string | null>(null);
 
   const { register, handleSubmit, formState: { errors }, setValue, watch } = useForm<BookingForm>({
     defaultValues: {
@@ -113,8 +131,16 @@ export default function BookingPage() {
 
   const fetchBarbers = async () => {
     try {
-      const response = await api.get('/barbers');
-      setBarbers(response.data);
+      // Catalog and the first days of availability in one request
+      const response = await api.get('/booking/bootstrap');
+      const prefetched = new Map<string, TimeSlot[]>();
+      response.data.availability.forEach((barber: BarberAvailability) => {
+        barber.days.forEach(day => {
+          prefetched.set(`${barber.barber_id}|${day.date}|${barber.duration_minutes}`, day.slots);
+        });
+      });
+      prefetchedSlotsRef.current = prefetched;
+      setBarbers(response.data.barbers);
     } catch (error) {
       console.error('Error fetching barbers:', error);
     } finally {
@@ -125,9 +151,17 @@ export default function BookingPage() {
   const fetchAvailableSlots = async (date: string) => {
     if (!selectedBarber || selectedServices.length === 0) return;
     
+    const totalDuration = selectedServices.reduce((sum, s) => sum + s.duration_minutes, 0);
+    const prefetchKey = `${selectedBarber.id}|${date}|${totalDuration}`;
+    const prefetched = prefetchedSlotsRef.current.get(prefetchKey);
+    if (prefetched) {
+      prefetchedSlotsRef.current.delete(prefetchKey);
+      setAvailableSlots(prefetched);
+      return;
+    }
+
     setLoadingSlots(true);
     try {
-      const totalDuration = selectedServices.reduce((sum, s) => sum + s.duration_minutes, 0);
       const response = await api.get(`/barbers/${selectedBarber.id}/available-slots`, {
         params: {
           date: date,
@@ -144,7 +178,32 @@ export default function BookingPage() {
     }
   };
 
+  // Live slot updates: drop slots as they are taken, refetch when something frees up
+  useEffect(() => {
+    if (!selectedBarber || !selectedDate || selectedServices.length === 0) return;
+    const baseURL = api.defaults.baseURL || 'http://localhost:8000/api';
+    const source = new EventSource(`${baseURL}/barbers/${selectedBarber.id}/slot-events?date=${selectedDate}`);
+    const totalDuration = selectedServices.reduce((sum, s) => sum + s.duration_minutes, 0);
+    source.addEventListener('slots', (message) => {
+      const event = JSON.parse((message as MessageEvent).data);
+      if (event.type === 'taken') {
+        const takenStart = new Date(event.start).getTime();
+        const takenEnd = new Date(event.end).getTime();
+        setAvailableSlots(slots => slots.filter(slot => {
+          if (slot.datetime === holdRef.current?.datetime) return true;  // our own hold
+          const start = new Date(slot.datetime).getTime();
+          return !(start < takenEnd && start + totalDuration * 60000 > takenStart);
+        }));
+      } else {
+        fetchAvailableSlots(selectedDate);
+      }
+    });
+    return () => source.close();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [selectedBarber, selectedDate, selectedServices]);
+
   const handleDateChange = (date: string) => {
+    releaseHold();
     setSelectedDate(date);
     setSelectedSlot('');
     setAvailableSlots([]);
@@ -153,14 +212,42 @@ export default function BookingPage() {
     }
   };
 
-  const handleSlotSelect = (slotDatetime: string) => {
+  const releaseHold = () => {
+    if (holdRef.current) {
+      api.delete(`/holds/${holdRef.current.token}`).catch(() => undefined);
+      holdRef.current = null;
+    }
+  };
+
+  const handleSlotSelect = async (slotDatetime: string) => {
+    releaseHold();
     // Allow unselecting by clicking the same slot
     if (selectedSlot === slotDatetime) {
       setSelectedSlot('');
       setValue('appointment_datetime', '');
-    } else {
-      setSelectedSlot(slotDatetime);
-      setValue('appointment_datetime', slotDatetime);
+      return;
+    }
+    setSelectedSlot(slotDatetime);
+    setValue('appointment_datetime', slotDatetime);
+    try {
+      const response = await api.post('/holds', {
+        barber_id: selectedBarber?.id,
+        service_ids: selectedServices.map(s => s.id),
+        appointment_datetime: slotDatetime,
+      });
+      holdRef.current = { token: response.data.token, datetime: slotDatetime };
+    } catch (error: unknown) {
+      const status = error && typeof error === 'object' && 'response' in error
+        ? (error as { response?: { status?: number } }).response?.status
+        : undefined;
+      // Someone else got there first
+      if (status === 409) {
+        showWarning('That time was just taken. Please pick another slot.');
+        setSelectedSlot('');
+        setValue('appointment_datetime', '');
+        if (selectedDate) fetchAvailableSlots(selectedDate);
+      }
+      // Rate limited or unreachable: keep the slot, the booking is checked without a hold
     }
   };
 
@@ -175,12 +262,22 @@ export default function BookingPage() {
       const appointmentData = {
         ...data,
         client_phone: fullPhoneNumber,
-        appointment_datetime: selectedSlot
+        appointment_datetime: selectedSlot,
+        hold_token: holdRef.current?.datetime === selectedSlot ? holdRef.current.token : undefined
       };
-      await api.post('/appointments', appointmentData);
+      idempotencyKeyRef.current = idempotencyKeyRef.current || crypto.randomUUID();
+      await api.post('/appointments', appointmentData, {
+        headers: { 'Idempotency-Key': idempotencyKeyRef.current }
+      });
+      holdRef.current = null;
+      idempotencyKeyRef.current = null;
       setSuccess(true);
     } catch (error: unknown) {
       console.error('Error creating appointment:', error);
+      if (error && typeof error === 'object' && 'response' in error && (error as { response?: unknown }).response) {
+        // The server answered, so the next attempt is a new request
+        idempotencyKeyRef.current = null;
+      }
       
       // Extract error message from backend
       let errorMessage = 'Failed to book appointment. Please try again.';